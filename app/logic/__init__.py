@@ -3,8 +3,12 @@
 """
 from .flash_logic_sideload import SideloadFlashLogic
 from .flash_logic_miflash import MiFlashLogic
+from .flash_logic_pipeline import PayloadFlashLogic
+from .flash_logic_restore import BackupRestoreLogic
 
 __all__ = [
     'SideloadFlashLogic',
     'MiFlashLogic',
+    'PayloadFlashLogic',
+    'BackupRestoreLogic',
 ]
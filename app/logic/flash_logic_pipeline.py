@@ -0,0 +1,310 @@
+"""
+流水线刷机逻辑
+后台线程逐个准备分区镜像（payload 解包、备份解压等）放入有界队列，
+刷机线程从队列取出后立即 fastboot flash，刷完即删除临时镜像。
+"""
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+
+class PipelineFlashLogic:
+    """流水线刷机执行器：镜像准备与 fastboot 刷入重叠进行"""
+
+    def __init__(
+        self,
+        log_callback: Callable[[str], None],
+        fastboot_path: str = None,
+        progress_callback: Optional[Callable[[int, int, int], None]] = None,
+        queue_size: int = 2,
+    ):
+        """
+        初始化
+        :param log_callback: 日志回调函数
+        :param fastboot_path: fastboot 可执行文件路径
+        :param progress_callback: 进度回调 (已刷分区数, 分区总数, 百分比)
+        :param queue_size: 已解包待刷入的镜像数上限（限制临时磁盘占用）
+        """
+        self.log = log_callback
+        self.progress = progress_callback
+        self._fastboot = fastboot_path or self._resolve_fastboot()
+        self._queue_size = max(1, int(queue_size))
+        self._stop_flag = False
+        self._process = None
+
+    def stop(self):
+        """停止当前操作"""
+        self._stop_flag = True
+        if self._process and self._process.poll() is None:
+            try:
+                self._process.terminate()
+            except Exception:
+                pass
+
+    def _resolve_fastboot(self) -> str:
+        """解析 fastboot 路径"""
+        try:
+            from app.services import adb_service
+            fb = getattr(adb_service, 'FASTBOOT_BIN', None)
+            if fb and fb.exists():
+                return str(fb)
+        except Exception:
+            pass
+        return 'fastboot'
+
+    def _popen_kwargs(self) -> dict:
+        if os.name == 'nt':
+            si = subprocess.STARTUPINFO()
+            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            return {'startupinfo': si, 'creationflags': subprocess.CREATE_NO_WINDOW}
+        return {}
+
+    # ---------- fastboot ----------
+    def _run_fastboot(self, args: list, timeout: int = 600) -> bool:
+        try:
+            self._process = subprocess.Popen(
+                [self._fastboot] + args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                encoding='utf-8',
+                errors='replace',
+                **self._popen_kwargs()
+            )
+            out, _ = self._process.communicate(timeout=timeout)
+            for line in (out or '').splitlines():
+                if line.strip():
+                    self.log(line.strip())
+            return self._process.returncode == 0
+        except subprocess.TimeoutExpired:
+            try:
+                self._process.kill()
+            except Exception:
+                pass
+            self.log(f"超时: fastboot {' '.join(args)}")
+            return False
+        except Exception as e:
+            self.log(f"执行失败: {e}")
+            return False
+        finally:
+            self._process = None
+
+    def _device_mode(self) -> str:
+        try:
+            result = subprocess.run(
+                [self._fastboot, 'getvar', 'is-userspace'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=5,
+                **self._popen_kwargs()
+            )
+            if result.returncode != 0 and 'is-userspace' not in result.stdout:
+                return 'unknown'
+            return 'fastbootd' if 'yes' in result.stdout.lower() else 'bootloader'
+        except Exception:
+            return 'unknown'
+
+    def _ensure_mode(self, target_mode: str) -> bool:
+        current = self._device_mode()
+        if current == target_mode:
+            return True
+        self.log(f"当前模式: {current}，需要切换到: {target_mode}")
+        arg = 'fastboot' if target_mode == 'fastbootd' else 'bootloader'
+        if not self._run_fastboot(['reboot', arg], timeout=60):
+            return False
+        time.sleep(3)
+        for _ in range(30):
+            if self._stop_flag:
+                return False
+            if self._device_mode() == target_mode:
+                self.log(f"已进入 {target_mode} 模式")
+                return True
+            time.sleep(1)
+        self.log(f"切换到 {target_mode} 超时")
+        return False
+
+    # ---------- 流水线 ----------
+    def _prepare_loop(self, jobs: list, prepare: Callable, work_dir: Path, q: queue.Queue):
+        """准备线程：逐个生成待刷镜像并放入队列；结束时放入 None，出错时放入异常"""
+        try:
+            for job in jobs:
+                if self._stop_flag:
+                    break
+                t0 = time.perf_counter()
+                img, temporary = prepare(job, work_dir)
+                self.log(f"[准备] {job['name']} 就绪，用时 {time.perf_counter() - t0:.1f}s")
+                while not self._stop_flag:
+                    try:
+                        q.put((job, Path(img), temporary), timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+            q.put(None)
+        except Exception as e:
+            q.put(e)
+
+    def run_pipeline(
+        self,
+        jobs: List[dict],
+        prepare: Callable[[dict, Path], Tuple[str, bool]],
+        wipe: bool = False,
+        work_dir: str = None,
+    ) -> bool:
+        """
+        流水线刷入：后台线程依次准备镜像（解包/解压），当前线程边取边 fastboot flash
+        :param jobs: 待刷分区 [{name, size, logical}]
+        :param prepare: prepare(job, work_dir) -> (镜像路径, 是否为刷完即删的临时文件)
+        :param wipe: 刷完后是否执行 fastboot -w
+        :param work_dir: 临时镜像目录，None 则使用系统临时目录
+        :return: 成功返回 True，失败返回 False
+        """
+        if not jobs:
+            self.log("错误: 没有需要刷入的分区")
+            return False
+        # 物理分区先在 bootloader 刷完，再统一切到 fastbootd 刷逻辑分区，只切换一次模式
+        jobs = sorted(jobs, key=lambda j: bool(j.get('logical')))
+        total = len(jobs)
+        total_bytes = sum(int(j.get('size') or 0) for j in jobs) or 1
+        self.log(f"共 {total} 个分区待刷入: {', '.join(j['name'] for j in jobs)}")
+
+        own_dir = work_dir is None
+        tmp = Path(tempfile.mkdtemp(prefix='toba_flash_')) if own_dir else Path(work_dir)
+        tmp.mkdir(parents=True, exist_ok=True)
+        q: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        worker = threading.Thread(target=self._prepare_loop, args=(jobs, prepare, tmp, q), daemon=True)
+        worker.start()
+
+        done = 0
+        done_bytes = 0
+        ok = True
+        t_start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    item = q.get(timeout=0.5)
+                except queue.Empty:
+                    if self._stop_flag:
+                        self.log("已取消")
+                        ok = False
+                        break
+                    continue
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    self.log(f"错误: 准备镜像失败: {item}")
+                    ok = False
+                    break
+                job, img, temporary = item
+                name = job['name']
+                target = 'fastbootd' if job.get('logical') else 'bootloader'
+                if not self._ensure_mode(target):
+                    self.log(f"错误: 无法切换到 {target}，终止刷入")
+                    ok = False
+                    break
+                self.log(f"[刷入] {name} ({int(job.get('size') or 0) / 1048576:.1f} MB)")
+                success = self._run_fastboot(['flash', name, str(img)])
+                if temporary:
+                    try:
+                        img.unlink()
+                    except Exception:
+                        pass
+                if not success:
+                    self.log(f"错误: 刷入 {name} 失败")
+                    ok = False
+                    break
+                done += 1
+                done_bytes += int(job.get('size') or 0)
+                if self.progress:
+                    self.progress(done, total, int(done_bytes * 100 / total_bytes))
+                if self._stop_flag:
+                    self.log("已取消")
+                    ok = False
+                    break
+        finally:
+            if not ok:
+                self._stop_flag = True
+            # 准备线程可能阻塞在 put 上，排空队列直到其退出
+            while worker.is_alive():
+                try:
+                    q.get(timeout=0.2)
+                except queue.Empty:
+                    pass
+            worker.join()
+            if own_dir:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+        if not ok:
+            return False
+        if wipe:
+            self.log("清除数据 (fastboot -w)...")
+            if not self._run_fastboot(['-w']):
+                self.log("警告: 清除数据失败")
+        self.log(f"全部 {total} 个分区刷入完成，用时 {time.perf_counter() - t_start:.1f}s")
+        return True
+
+
+class PayloadFlashLogic(PipelineFlashLogic):
+    """payload.bin 边解包边刷入"""
+
+    def flash_payload(
+        self,
+        source: str,
+        partitions: Optional[Iterable[str]] = None,
+        skip: Optional[Iterable[str]] = None,
+        wipe: bool = False,
+        work_dir: str = None,
+    ) -> bool:
+        """
+        从 payload.bin（或包含它的 OTA ZIP）直接刷入分区
+        :param source: payload.bin / OTA ZIP 路径
+        :param partitions: 只刷入这些分区，None 表示全部
+        :param skip: 跳过的分区
+        :param wipe: 刷完后是否执行 fastboot -w
+        :param work_dir: 临时镜像目录，None 则使用系统临时目录
+        :return: 成功返回 True，失败返回 False
+        """
+        from app.services import payload_service
+
+        self._stop_flag = False
+        try:
+            self.log("读取 payload 清单...")
+            manifest = payload_service.load_operations(source)
+        except Exception as e:
+            self.log(f"错误: 读取 payload 失败: {e}")
+            return False
+        if manifest.get('incremental'):
+            self.log("错误: 这是增量 OTA 包，无法直接刷入，请使用全量包")
+            return False
+
+        wanted = {p.strip() for p in partitions or [] if p.strip()}
+        skipped = {p.strip() for p in skip or [] if p.strip()}
+        parts = [
+            p for p in manifest['partitions']
+            if (not wanted or p['name'] in wanted) and p['name'] not in skipped
+        ]
+
+        reader = payload_service.open_reader(source)
+
+        def _prepare(part: dict, tmp: Path):
+            out = tmp / f"{part['name']}.img"
+            payload_service.extract_partition(
+                reader,
+                manifest['data_offset'],
+                manifest['block_size'],
+                part,
+                str(out),
+                should_stop=lambda: self._stop_flag,
+            )
+            return out, True
+
+        try:
+            return self.run_pipeline(parts, _prepare, wipe=wipe, work_dir=work_dir)
+        finally:
+            reader.close()
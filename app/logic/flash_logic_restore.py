@@ -0,0 +1,235 @@
+"""
+分区备份恢复逻辑
+读取备份清单（目录 / ZIP / 增量快照），跳过与设备当前内容一致的分区，
+其余分区交给流水线执行器：后台解压校验，前台按 bootloader / fastbootd 分组刷入。
+"""
+import subprocess
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from app.logic.flash_logic_pipeline import PipelineFlashLogic
+
+
+# bootloader 不支持 getvar is-logical 时按名称判断的动态分区
+_LOGICAL_HINTS = {
+    "system", "system_ext", "vendor", "product", "odm", "mi_ext",
+    "vendor_dlkm", "odm_dlkm", "system_dlkm",
+}
+
+
+class BackupRestoreLogic(PipelineFlashLogic):
+    """从分区备份恢复"""
+
+    def __init__(self, log_callback, adb_path: str = None, **kwargs):
+        """
+        初始化
+        :param log_callback: 日志回调函数
+        :param adb_path: adb 可执行文件路径
+        """
+        super().__init__(log_callback, **kwargs)
+        self._adb = adb_path or self._resolve_adb()
+        self.device_mismatch = ''  # 最近一次恢复时备份与设备不一致的原因
+
+    def _resolve_adb(self) -> str:
+        try:
+            from app.services import adb_service
+            if adb_service.ADB_BIN.exists():
+                return str(adb_service.ADB_BIN)
+        except Exception:
+            pass
+        return 'adb'
+
+    def _is_logical(self, name: str) -> bool:
+        try:
+            result = subprocess.run(
+                [self._fastboot, 'getvar', f'is-logical:{name}'],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                timeout=5,
+                **self._popen_kwargs()
+            )
+            for line in result.stdout.splitlines():
+                if line.startswith(f'is-logical:{name}:'):
+                    return line.rsplit(':', 1)[1].strip().lower() == 'yes'
+        except Exception:
+            pass
+        return name.rsplit('_', 1)[0] in _LOGICAL_HINTS if name.endswith(('_a', '_b')) else name in _LOGICAL_HINTS
+
+    def _current_identity(self, mode: str, serial: str) -> dict:
+        """当前设备的机型代号 / 型号 / 序列号，取不到的字段为空"""
+        ident = {'device': '', 'model': '', 'serialno': ''}
+        try:
+            if mode == 'system':
+                result = subprocess.run(
+                    [self._adb, '-s', serial, 'shell',
+                     'getprop ro.product.device; getprop ro.product.model; getprop ro.serialno'],
+                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+                    timeout=10, **self._popen_kwargs()
+                )
+                lines = [ln.strip() for ln in (result.stdout or '').splitlines()] + ['', '', '']
+                ident = {'device': lines[0], 'model': lines[1].replace(' ', '_'), 'serialno': lines[2]}
+            else:
+                # fastboot 下的序列号即 ro.serialno，product 即机型代号
+                ident['serialno'] = serial
+                result = subprocess.run(
+                    [self._fastboot, '-s', serial, 'getvar', 'product'],
+                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                    timeout=5, **self._popen_kwargs()
+                )
+                for line in result.stdout.splitlines():
+                    if line.startswith('product:'):
+                        ident['device'] = line.split(':', 1)[1].strip()
+                        break
+        except Exception:
+            pass
+        return ident
+
+    def _check_device(self, manifest: dict, mode: str, serial: str) -> str:
+        """比对备份清单与当前设备，一致返回空字符串，否则返回原因"""
+        current = self._current_identity(mode, serial)
+        # 旧备份只记录了 adb 序列号；无线调试的 host:port 不能用来比对
+        backup_serial = manifest.get('serialno') or manifest.get('serial', '')
+        if ':' in backup_serial:
+            backup_serial = ''
+        checks = (
+            ('机型代号', manifest.get('device', ''), current['device']),
+            ('型号', manifest.get('model', ''), current['model']),
+            ('序列号', backup_serial, current['serialno']),
+        )
+        compared = 0
+        diffs = []
+        for label, want, got in checks:
+            if not want or not got:
+                continue
+            compared += 1
+            if want.lower() != got.lower():
+                diffs.append(f"{label}：备份为 {want}，当前设备为 {got}")
+        if diffs:
+            return '；'.join(diffs)
+        if not compared:
+            return '无法确认备份是否来自当前设备（缺少可比对的机型或序列号）'
+        return ''
+
+    def _filter_unchanged(self, serial: str, source, entries: list) -> list:
+        """系统模式下在设备端计算分区哈希，去掉与备份一致的分区"""
+        from app.services import backup_service, partition_service
+
+        by_name = source.manifest.get('by_name', '')
+        if not by_name:
+            try:
+                by_name = partition_service.scan_partitions(self._adb, serial)['by_name']
+            except Exception as e:
+                self.log(f"无法读取分区表，跳过一致性比对: {e}")
+                return entries
+        comparable = [e for e in entries if e.get('sha256') or e.get('device_sha256')]
+        if not comparable:
+            return entries
+        self.log(f"在设备端比对 {len(comparable)} 个分区的哈希...")
+        try:
+            current = backup_service.device_partition_hashes(
+                self._adb, serial, by_name, [e['name'] for e in comparable]
+            )
+        except Exception as e:
+            self.log(f"设备端哈希计算失败，全部恢复: {e}")
+            return entries
+        remaining = []
+        for e in entries:
+            expect = e.get('device_sha256') or e.get('sha256')
+            if expect and current.get(e['name']) == expect:
+                self.log(f"[跳过] {e['name']} 与备份一致")
+                continue
+            remaining.append(e)
+        return remaining
+
+    def _reboot_to_bootloader(self, serial: str) -> bool:
+        self.log("重启到 Bootloader...")
+        try:
+            subprocess.run(
+                [self._adb, '-s', serial, 'reboot', 'bootloader'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                timeout=15, **self._popen_kwargs()
+            )
+        except Exception as e:
+            self.log(f"错误: 重启失败: {e}")
+            return False
+        for _ in range(60):
+            if self._stop_flag:
+                return False
+            if self._device_mode() != 'unknown':
+                return True
+            time.sleep(1)
+        self.log("错误: 等待 Fastboot 设备超时")
+        return False
+
+    def restore(
+        self,
+        path: str,
+        partitions: Optional[Iterable[str]] = None,
+        skip_matching: bool = True,
+        work_dir: str = None,
+        allow_other_device: bool = False,
+    ) -> bool:
+        """
+        从备份恢复分区
+        :param path: 备份目录、backup_manifest.json、备份 ZIP 或增量快照 json
+        :param partitions: 只恢复这些分区，None 表示全部
+        :param skip_matching: 设备处于系统模式且已 Root 时，跳过哈希与备份一致的分区
+        :param work_dir: 临时镜像目录，None 则使用系统临时目录
+        :param allow_other_device: 备份与当前设备不一致时仍然恢复（需用户明确确认）
+        :return: 成功返回 True，失败返回 False；因设备不一致被拒绝时 device_mismatch 为原因
+        """
+        from app.services import adb_service, backup_service
+
+        self._stop_flag = False
+        self.device_mismatch = ''
+        try:
+            source = backup_service.BackupSource(path)
+        except Exception as e:
+            self.log(f"错误: 读取备份失败: {e}")
+            return False
+
+        try:
+            wanted = {p.strip() for p in partitions or [] if p.strip()}
+            entries = [e for e in source.entries if not wanted or e['name'] in wanted]
+            if not entries:
+                self.log("错误: 备份中没有可恢复的分区")
+                return False
+            model = source.manifest.get('model')
+            if model:
+                self.log(f"备份机型: {model}")
+
+            mode, serial = adb_service.detect_connection_mode()
+            if mode not in ('system', 'bootloader', 'fastbootd'):
+                self.log("错误: 请将设备连接到系统（已 Root）、Bootloader 或 Fastbootd 模式")
+                return False
+
+            reason = self._check_device(source.manifest, mode, serial)
+            if reason:
+                if not allow_other_device:
+                    self.device_mismatch = reason
+                    self.log(f"错误: 备份与当前设备不一致，已停止恢复：{reason}")
+                    return False
+                self.log(f"警告: 备份与当前设备不一致（{reason}），已确认继续恢复")
+
+            if mode == 'system':
+                if skip_matching and source.kind != 'snapshot':
+                    entries = self._filter_unchanged(serial, source, entries)
+                    if not entries:
+                        self.log("所有分区均与备份一致，无需恢复")
+                        return True
+                if self._stop_flag or not self._reboot_to_bootloader(serial):
+                    return False
+
+            jobs = [
+                {'name': e['name'], 'size': e.get('size', 0), 'logical': self._is_logical(e['name']), 'entry': e}
+                for e in entries
+            ]
+
+            def _prepare(job: dict, tmp: Path):
+                return source.prepare(job['entry'], str(tmp))
+
+            return self.run_pipeline(jobs, _prepare, work_dir=work_dir)
+        finally:
+            source.close()
@@ -1,11 +1,14 @@
+import os
 import subprocess
 import re
+import shlex
 from typing import Dict, List, Tuple
 from pathlib import Path
 
 
 ROOT_DIR = Path(__file__).resolve().parents[2]
 BIN_DIR = ROOT_DIR / "bin"
+CACHE_DIR = ROOT_DIR / "cache"
 ADB_BIN = BIN_DIR / "adb.exe" if (BIN_DIR / "adb.exe").exists() else BIN_DIR / "adb"
 FASTBOOT_BIN = BIN_DIR / "fastboot.exe" if (BIN_DIR / "fastboot.exe").exists() else BIN_DIR / "fastboot"
 
@@ -509,10 +512,17 @@ def reboot_to(target: str) -> Tuple[bool, str]:
 # -------- ADB File Ops --------
 def list_dir(path: str) -> Tuple[List[Dict[str, str]], str]:
     """List directory on device. Returns (items, err).
-    Each item: {name, size, type: 'dir'|'file'}
+    Each item: {name, size, type: 'dir'|'file'}; items from the sync service also carry mode/mtime
     """
     adb = str(ADB_BIN) if ADB_BIN.exists() else "adb"
     p = path or "/"
+    # 优先走 sync LIST：名称、大小、类型精确，不受文件名中空格影响；
+    # 不存在或不可读时抛出异常，由 ls 给出具体错误，空目录直接返回
+    try:
+        from app.services import adb_sync
+        return adb_sync.list_dir(p), ""
+    except Exception:
+        pass
     out = _run([adb, "shell", "ls", "-l", p], timeout=10)
     if out is None:
         out = ""
@@ -579,35 +589,104 @@ def is_dir(path: str) -> bool:
     return out.strip().startswith('d')
 
 
+# 批量操作：整批编译为一个 shell 脚本、一次 adb shell 执行，每项之后输出带编号的返回码标记
+_BATCH_SCRIPT_MAX = 16 * 1024  # 单次 shell 命令长度上限，超出则分多次执行
+_BATCH_MARK_RE = re.compile(r"@@BATCH_([0-9a-f]{8})_(\d+)_(\d+)@@")
+
+
+def _batch_command(op: tuple, made_dirs: set) -> str:
+    kind, src = op[0], op[1]
+    q = shlex.quote
+    if kind == 'mkdir':
+        made_dirs.add(src)
+        return f"mkdir -p -- {q(src)}"
+    if kind == 'delete':
+        return f"rm -rf -- {q(src)}"
+    if kind == 'shell':
+        return src
+    if kind == 'rename':
+        parent = src.rsplit('/', 1)[0] if '/' in src.rstrip('/') else ''
+        return f"mv -- {q(src)} {q((parent or '') + '/' + op[2])}"
+    if kind in ('move', 'copy'):
+        dst = op[2]
+        # 同一目标目录只创建一次
+        prefix = '' if dst in made_dirs else f"mkdir -p -- {q(dst)} && "
+        made_dirs.add(dst)
+        target = q(dst.rstrip('/') + '/')
+        if kind == 'move':
+            return f"{prefix}mv -- {q(src)} {target}"
+        return f"{prefix}{{ cp -r -- {q(src)} {target} || toybox cp -r -- {q(src)} {target}; }}"
+    raise ValueError(f"未知的操作: {kind}")
+
+
+def batch_ops(ops: List[tuple], timeout: int = 120, serial: str = "") -> List[Tuple[bool, str]]:
+    """
+    批量执行设备端操作，返回与 ops 一一对应的 [(ok, 输出)]
+    :param ops: ('mkdir', 路径) | ('delete', 路径) | ('move', 源, 目标目录) | ('copy', 源, 目标目录) | ('rename', 源, 新名称)
+                | ('shell', 命令)
+    :param timeout: 每次 adb shell 调用的超时秒数
+    :param serial: 设备序列号，空字符串表示唯一连接的设备
+    """
+    results: List[Tuple[bool, str]] = [(False, "未执行（adb 无输出）")] * len(ops)
+    token = os.urandom(4).hex()
+    made_dirs: set = set()
+    chunks: List[List[str]] = [[]]
+    size = 0
+    for i, op in enumerate(ops):
+        try:
+            cmd = _batch_command(op, made_dirs)
+        except (ValueError, IndexError) as e:
+            results[i] = (False, str(e))
+            continue
+        # 每项在子 shell 中执行，互不影响；失败不会中断后续各项
+        line = f"( {cmd} ) 2>&1; echo \"@@BATCH_{token}_{i}_$?@@\""
+        if size + len(line) > _BATCH_SCRIPT_MAX and chunks[-1]:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(line)
+        size += len(line) + 1
+    for chunk in chunks:
+        if not chunk:
+            continue
+        script = "\n".join(chunk)
+        if serial:
+            out = _run([_adb_bin(), "-s", serial, "shell", script], timeout=timeout)
+        else:
+            out = _adb_shell([script], timeout=timeout)
+        buf: List[str] = []
+        for text in out.splitlines():
+            m = _BATCH_MARK_RE.search(text)
+            if not m or m.group(1) != token:
+                buf.append(text)
+                continue
+            if text[:m.start()]:
+                buf.append(text[:m.start()])
+            idx, rc = int(m.group(2)), int(m.group(3))
+            if 0 <= idx < len(results):
+                results[idx] = (rc == 0, "\n".join(buf).strip())
+            buf = []
+    return results
+
+
 def mkdir_p(path: str) -> Tuple[bool, str]:
-    out = _adb_shell(["mkdir", "-p", path], timeout=8)
-    ok = True if (out is None or out.strip() == "") else True
-    return ok, out or ""
+    return batch_ops([('mkdir', path)], timeout=8)[0]
 
 
 def delete_path(path: str) -> Tuple[bool, str]:
-    out = _adb_shell(["rm", "-rf", path], timeout=20)
-    return True, out or ""
+    return batch_ops([('delete', path)], timeout=20)[0]
 
 
 def move_path(src: str, dst_dir: str) -> Tuple[bool, str]:
-    # Ensure target directory exists
-    mkdir_p(dst_dir)
-    out = _adb_shell(["sh", "-c", f"mv '{src}' '{dst_dir}/'"], timeout=30)
-    return True, out or ""
+    return batch_ops([('move', src, dst_dir)], timeout=30)[0]
 
 
 def copy_path(src: str, dst_dir: str) -> Tuple[bool, str]:
     # Try cp -r, fallback to toybox cp -r
-    mkdir_p(dst_dir)
-    out = _adb_shell(["sh", "-c", f"cp -r '{src}' '{dst_dir}/' || toybox cp -r '{src}' '{dst_dir}/'"], timeout=120)
-    return True, out or ""
+    return batch_ops([('copy', src, dst_dir)], timeout=120)[0]
 
 
 def rename_path(src: str, new_name: str) -> Tuple[bool, str]:
-    parent = src.rsplit('/', 1)[0] if '/' in src else '/'
-    out = _adb_shell(["sh", "-c", f"mv '{src}' '{parent}/{new_name}'"], timeout=15)
-    return True, out or ""
+    return batch_ops([('rename', src, new_name)], timeout=15)[0]
 
 
 def stat_path(path: str) -> dict:
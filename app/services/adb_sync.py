@@ -0,0 +1,389 @@
+"""
+adb sync 协议客户端
+直接连接本机 adb server（127.0.0.1:5037），通过 sync: 服务的 STAT / LIST / RECV / SEND
+传输文件：大缓冲区读写、按字节回报进度，取消时只需关闭套接字，无需结束 adb 进程。
+并发队列见 transfer_queue。
+"""
+import os
+import socket
+import stat as stat_mod
+import struct
+from typing import Callable, List, Optional, Tuple
+
+from app.services import adb_service
+
+
+ADB_HOST = "127.0.0.1"
+ADB_PORT = 5037
+SYNC_DATA_MAX = 64 * 1024  # 协议规定单个 DATA 包上限
+SOCKET_BUFFER = 4 * 1024 * 1024
+
+
+class SyncError(RuntimeError):
+    pass
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        n = sock.recv_into(view[pos:], size - pos)
+        if n == 0:
+            raise SyncError("连接被 adb server 关闭")
+        pos += n
+    return bytes(buf)
+
+
+class SyncEntry:
+    __slots__ = ("name", "mode", "size", "mtime")
+
+    def __init__(self, name: str, mode: int, size: int, mtime: int):
+        self.name = name
+        self.mode = mode
+        self.size = size
+        self.mtime = mtime
+
+    @property
+    def is_dir(self) -> bool:
+        return stat_mod.S_ISDIR(self.mode)
+
+    @property
+    def is_link(self) -> bool:
+        return stat_mod.S_ISLNK(self.mode)
+
+    @property
+    def exists(self) -> bool:
+        return self.mode != 0
+
+
+class SyncConnection:
+    """一条 sync 会话；非线程安全，每个传输线程使用自己的连接"""
+
+    def __init__(self, serial: str = "", timeout: float = 10.0):
+        self.serial = serial
+        self._sock: Optional[socket.socket] = None
+        self._features: set = set()
+        self._open(timeout)
+
+    # ---------- 连接 ----------
+    def _connect(self, timeout: float) -> socket.socket:
+        try:
+            sock = socket.create_connection((ADB_HOST, ADB_PORT), timeout=timeout)
+        except ConnectionRefusedError:
+            # adb server 未运行时先拉起
+            adb_service.adb_start_server()
+            sock = socket.create_connection((ADB_HOST, ADB_PORT), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        for opt in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, opt, SOCKET_BUFFER)
+            except OSError:
+                pass
+        return sock
+
+    def _host_request(self, sock: socket.socket, request: str):
+        data = request.encode("utf-8")
+        sock.sendall(b"%04x" % len(data) + data)
+        status = self._recv_exact(4, sock)
+        if status != b"OKAY":
+            length = int(self._recv_exact(4, sock), 16)
+            raise SyncError(self._recv_exact(length, sock).decode("utf-8", errors="replace"))
+
+    def _query_features(self, timeout: float) -> set:
+        sock = self._connect(timeout)
+        try:
+            target = f"host-serial:{self.serial}:features" if self.serial else "host:features"
+            self._host_request(sock, target)
+            length = int(self._recv_exact(4, sock), 16)
+            return set(self._recv_exact(length, sock).decode("utf-8", errors="ignore").split(","))
+        except Exception:
+            return set()
+        finally:
+            sock.close()
+
+    def _open(self, timeout: float):
+        self._features = self._query_features(timeout)
+        sock = self._connect(timeout)
+        try:
+            self._host_request(sock, f"host:transport:{self.serial}" if self.serial else "host:transport-any")
+            self._host_request(sock, "sync:")
+        except Exception:
+            sock.close()
+            raise
+        # 传输期间允许长时间无数据（如设备端读取慢速存储）
+        sock.settimeout(None)
+        self._sock = sock
+
+    def close(self):
+        sock, self._sock = self._sock, None
+        if sock is None:
+            return
+        try:
+            sock.sendall(b"QUIT" + struct.pack("<I", 0))
+        except OSError:
+            pass
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def abort(self):
+        """从其他线程调用：立即断开，阻塞中的读写会抛出异常"""
+        sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def features(self) -> set:
+        return self._features
+
+    # ---------- 底层读写 ----------
+    def _recv_exact(self, size: int, sock: socket.socket = None) -> bytes:
+        sock = sock or self._sock
+        if sock is None:
+            raise SyncError("连接已关闭")
+        return _recv_exact(sock, size)
+
+    def _send_request(self, cmd: bytes, path: str):
+        data = path.encode("utf-8")
+        self._sock.sendall(cmd + struct.pack("<I", len(data)) + data)
+
+    # ---------- STAT / LIST ----------
+    def stat(self, path: str) -> SyncEntry:
+        """返回 SyncEntry；路径不存在时 mode 为 0"""
+        if "stat_v2" in self._features:
+            self._send_request(b"STA2", path)
+            resp = self._recv_exact(72)
+            if resp[:4] != b"STA2":
+                raise SyncError(f"STA2 响应异常: {resp[:4]!r}")
+            _, err, _dev, _ino, mode, _nlink, _uid, _gid, size, _atime, mtime, _ctime = struct.unpack(
+                "<4sIQQIIIIQqqq", resp
+            )
+            if err:
+                return SyncEntry(os.path.basename(path), 0, 0, 0)
+            return SyncEntry(os.path.basename(path), mode, size, mtime)
+        self._send_request(b"STAT", path)
+        resp = self._recv_exact(16)
+        if resp[:4] != b"STAT":
+            raise SyncError(f"STAT 响应异常: {resp[:4]!r}")
+        mode, size, mtime = struct.unpack("<III", resp[4:])
+        return SyncEntry(os.path.basename(path), mode, size, mtime)
+
+    def list(self, path: str, strict: bool = False) -> List[SyncEntry]:
+        """列出目录（lstat 语义，符号链接不跟随）；设备支持 ls_v2 时用 LIS2 取 64 位大小
+
+        adbd 打不开目录（无权限等）时只回 DONE，而可读的空目录至少有 "." 与 ".."；
+        strict 为 True 时前一种情况抛出 SyncError，而不是当作空目录返回。
+        """
+        if "ls_v2" in self._features:
+            return self._list_v2(path, strict)
+        self._send_request(b"LIST", path)
+        entries: List[SyncEntry] = []
+        records = 0
+        while True:
+            head = self._recv_exact(20)
+            if head[:4] == b"DONE":
+                if strict and not records:
+                    raise SyncError(f"无法读取目录: {path}")
+                return entries
+            records += 1
+            if head[:4] != b"DENT":
+                raise SyncError(f"LIST 响应异常: {head[:4]!r}")
+            mode, size, mtime, namelen = struct.unpack("<IIII", head[4:])
+            name = self._recv_exact(namelen).decode("utf-8", errors="replace")
+            if name in (".", ".."):
+                continue
+            entries.append(SyncEntry(name, mode, size, mtime))
+
+    def _list_v2(self, path: str, strict: bool = False) -> List[SyncEntry]:
+        self._send_request(b"LIS2", path)
+        entries: List[SyncEntry] = []
+        records = 0
+        while True:
+            head = self._recv_exact(76)
+            if head[:4] == b"DONE":
+                if strict and not records:
+                    raise SyncError(f"无法读取目录: {path}")
+                return entries
+            records += 1
+            if head[:4] != b"DNT2":
+                raise SyncError(f"LIS2 响应异常: {head[:4]!r}")
+            (_, err, _dev, _ino, mode, _nlink, _uid, _gid,
+             size, _atime, mtime, _ctime, namelen) = struct.unpack("<4sIQQIIIIQqqqI", head)
+            name = self._recv_exact(namelen).decode("utf-8", errors="replace")
+            if err or name in (".", ".."):
+                continue
+            entries.append(SyncEntry(name, mode, size, mtime))
+
+    # ---------- RECV / SEND ----------
+    def pull_file(
+        self,
+        remote: str,
+        local: str,
+        progress: Optional[Callable[[int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+        mtime: int = 0,
+    ) -> int:
+        """接收单个文件，返回字节数；progress(本次新增字节数)"""
+        self._send_request(b"RECV", remote)
+        received = 0
+        tmp = local + ".part"
+        try:
+            with open(tmp, "wb", buffering=SOCKET_BUFFER) as f:
+                while True:
+                    head = self._recv_exact(8)
+                    tag = head[:4]
+                    length = struct.unpack("<I", head[4:])[0]
+                    if tag == b"DATA":
+                        data = self._recv_exact(length)
+                        f.write(data)
+                        received += length
+                        if progress:
+                            progress(length)
+                        if should_stop and should_stop():
+                            raise InterruptedError("已取消")
+                    elif tag == b"DONE":
+                        break
+                    elif tag == b"FAIL":
+                        raise SyncError(self._recv_exact(length).decode("utf-8", errors="replace"))
+                    else:
+                        raise SyncError(f"RECV 响应异常: {tag!r}")
+            os.replace(tmp, local)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        if mtime:
+            try:
+                os.utime(local, (mtime, mtime))
+            except OSError:
+                pass
+        return received
+
+    def push_file(
+        self,
+        local: str,
+        remote: str,
+        mode: int = 0o644,
+        progress: Optional[Callable[[int], None]] = None,
+        should_stop: Optional[Callable[[], bool]] = None,
+    ) -> int:
+        """发送单个文件（设备端自动创建上级目录），返回字节数"""
+        self._send_request(b"SEND", f"{remote},{stat_mod.S_IFREG | (mode & 0o777)}")
+        sent = 0
+        with open(local, "rb", buffering=SOCKET_BUFFER) as f:
+            while True:
+                if should_stop and should_stop():
+                    raise InterruptedError("已取消")
+                data = f.read(SYNC_DATA_MAX)
+                if not data:
+                    break
+                self._sock.sendall(b"DATA" + struct.pack("<I", len(data)) + data)
+                sent += len(data)
+                if progress:
+                    progress(len(data))
+        mtime = int(os.path.getmtime(local))
+        self._sock.sendall(b"DONE" + struct.pack("<I", mtime))
+        head = self._recv_exact(8)
+        if head[:4] == b"FAIL":
+            length = struct.unpack("<I", head[4:])[0]
+            raise SyncError(self._recv_exact(length).decode("utf-8", errors="replace"))
+        if head[:4] != b"OKAY":
+            raise SyncError(f"SEND 响应异常: {head[:4]!r}")
+        return sent
+
+
+def current_serial(timeout: float = 3.0) -> str:
+    """当前唯一连接设备的序列号（host:get-serialno），失败返回空字符串"""
+    try:
+        sock = socket.create_connection((ADB_HOST, ADB_PORT), timeout=timeout)
+    except OSError:
+        return ""
+    try:
+        data = b"host:get-serialno"
+        sock.sendall(b"%04x" % len(data) + data)
+        if _recv_exact(sock, 4) != b"OKAY":
+            return ""
+        length = int(_recv_exact(sock, 4), 16)
+        return _recv_exact(sock, length).decode("utf-8", errors="ignore")
+    except Exception:
+        return ""
+    finally:
+        sock.close()
+
+
+def join_remote(parent: str, name: str) -> str:
+    return (parent.rstrip("/") + "/" + name) if parent.rstrip("/") else "/" + name
+
+
+def remote_tree(
+    conn: SyncConnection, root: str, unreadable: Optional[List[str]] = None,
+) -> Tuple[List[Tuple[str, SyncEntry]], List[str]]:
+    """
+    递归列出远端目录，返回 ([(相对路径, 文件条目)], [相对目录])；符号链接不跟随
+    :param unreadable: 传入列表时严格列目录，读不了的子目录（根目录为 ""）记入其中而不是当作空目录
+    """
+    files: List[Tuple[str, SyncEntry]] = []
+    dirs: List[str] = []
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        path = join_remote(root, rel) if rel else root
+        if unreadable is None:
+            entries = conn.list(path)
+        else:
+            try:
+                entries = conn.list(path, strict=True)
+            except SyncError:
+                unreadable.append(rel)
+                continue
+        for e in entries:
+            child = f"{rel}/{e.name}" if rel else e.name
+            if e.is_dir:
+                dirs.append(child)
+                stack.append(child)
+            elif stat_mod.S_ISREG(e.mode):
+                files.append((child, e))
+    return files, dirs
+
+
+def list_entries(conn: SyncConnection, path: str) -> List[dict]:
+    """在已有连接上列出远端目录，返回 [{name, size, type: 'dir'|'file', mode, mtime}]，目录在前、按名称排序。
+    目录不存在或不可读时抛出 SyncError，空目录返回空列表。
+
+    指向目录的符号链接（如 /sdcard）在设备支持 stat_v2 时解析为 'dir'。
+    """
+    st = conn.stat(path)
+    if not st.exists:
+        raise SyncError(f"路径不存在: {path}")
+    items = []
+    for e in conn.list(path, strict=True):
+        is_dir = e.is_dir
+        if e.is_link and "stat_v2" in conn.features:
+            is_dir = conn.stat(join_remote(path, e.name)).is_dir
+        items.append({
+            "name": e.name,
+            "size": "-" if is_dir else str(e.size),
+            "type": "dir" if is_dir else "file",
+            "mode": e.mode,
+            "mtime": e.mtime,
+        })
+    items.sort(key=lambda it: (it["type"] != "dir", it["name"].lower()))
+    return items
+
+
+def list_dir(path: str, serial: str = "") -> List[dict]:
+    with SyncConnection(serial) as conn:
+        return list_entries(conn, path)
@@ -0,0 +1,297 @@
+"""
+批量安装 APK
+按清单中的包名把所选文件分组（同一应用的基础包与拆分包为一组，.apks / .xapk 包解开后同样分组），
+经并发传输队列推送到设备端暂存目录；每组推送完成后立即用 pm install-create / install-write / install-commit
+会话安装，推送与安装同时进行。每组的结果单独返回，某一组失败不影响其他组。
+"""
+import os
+import posixpath
+import re
+import shlex
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from app.services import adb_service, apk_resources
+from app.services.transfer_queue import DEFAULT_CONCURRENCY, TransferItem, TransferQueue
+
+
+STAGING_ROOT = "/data/local/tmp"
+INSTALL_WORKERS = 2  # 设备端安装本身是串行提交的，多开意义不大
+INSTALL_TIMEOUT = 600
+BUNDLE_EXTS = (".apks", ".xapk", ".apkm")
+
+_SESSION_RE = re.compile(r"\[(\d+)\]")
+_NO_SESSION = "@@NO_SESSION@@"
+
+
+class InstallGroup:
+    """一次安装：一个应用的基础 APK 与全部拆分 APK"""
+
+    __slots__ = ("name", "package", "files", "has_base", "remote_dir", "pushed", "failed_push", "result")
+
+    def __init__(self, name: str, package: str, files: List[str]):
+        self.name = name
+        self.package = package
+        self.files = files
+        self.has_base = False
+        self.remote_dir = ""
+        self.pushed = 0
+        self.failed_push: List[str] = []
+        self.result: Optional[dict] = None
+
+
+def _manifest_of(path: str) -> tuple:
+    try:
+        with zipfile.ZipFile(path) as z:
+            return apk_resources.manifest_package(z.read("AndroidManifest.xml"))
+    except (OSError, KeyError, zipfile.BadZipFile, apk_resources.ApkFormatError, ValueError):
+        return "", ""
+
+
+def _bundle_members(names: List[str]) -> List[str]:
+    """
+    选出要安装的 APK。bundletool 生成的 .apks 同时带有 splits/（基础包 + 拆分包）、
+    standalones/（按 ABI / 密度各一个完整包，供旧系统使用）与 universal.apk，
+    它们都是基础包，全部安装会把同一应用装多遍：有 splits/ 时只取 splits/，否则有 universal.apk 只取它。
+    其余格式（.xapk / .apkm / SAI 导出的 .apks）的 APK 在根目录，全部安装。
+    """
+    apks = [n for n in names if n.lower().endswith(".apk")]
+    splits = [n for n in apks if n.startswith("splits/")]
+    if splits:
+        return splits
+    universal = [n for n in apks if posixpath.basename(n) == "universal.apk"]
+    if universal:
+        return universal[:1]
+    return [n for n in apks if not n.startswith("standalones/")] or apks[:1]
+
+
+def _expand_bundle(path: str, tmp_root: str) -> List[str]:
+    """把 .apks / .xapk 包中需要安装的 APK 解到临时目录，返回解出的文件"""
+    dest = tempfile.mkdtemp(prefix="bundle_", dir=tmp_root)
+    out = []
+    with zipfile.ZipFile(path) as z:
+        wanted = set(_bundle_members([i.filename for i in z.infolist() if not i.is_dir()]))
+        for info in z.infolist():
+            if info.filename not in wanted:
+                continue
+            target = os.path.join(dest, f"{len(out)}_{os.path.basename(info.filename)}")
+            with z.open(info) as src, open(target, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            out.append(target)
+    return out
+
+
+def group_apks(paths: List[str], tmp_root: str) -> List[InstallGroup]:
+    """
+    按包名分组；无法解析清单的文件各自成组（交给 pm 报告具体错误）
+    :param paths: 本地 .apk / .apks / .xapk 文件
+    :param tmp_root: 解开安装包用的临时目录
+    """
+    groups: Dict[tuple, InstallGroup] = {}
+    order: List[InstallGroup] = []
+    for path in paths:
+        files = [path]
+        bundle = path.lower().endswith(BUNDLE_EXTS)
+        if bundle:
+            try:
+                files = _expand_bundle(path, tmp_root)
+            except (OSError, zipfile.BadZipFile):
+                files = []
+            if not files:
+                g = InstallGroup(os.path.basename(path), "", [])
+                g.result = {"name": g.name, "package": "", "files": 0, "ok": False, "message": "安装包中没有 APK"}
+                order.append(g)
+                continue
+        for f in files:
+            package, split = _manifest_of(f)
+            # 安装包内的文件只与同一包内的合并；单独选择的 APK 按包名合并
+            key = (path if bundle else "", package or f)
+            g = groups.get(key)
+            if g is None or (not split and g.has_base):
+                # 同一应用选了多个基础包时各自安装
+                g = groups[key] = InstallGroup(os.path.basename(path if bundle else f), package, [])
+                order.append(g)
+            # 基础包放在最前
+            if split:
+                g.files.append(f)
+            else:
+                g.files.insert(0, f)
+                g.has_base = True
+                if not bundle:
+                    g.name = os.path.basename(f)
+    return order
+
+
+def _parse_result(out: str) -> tuple:
+    lines = [ln.strip() for ln in out.splitlines() if ln.strip()]
+    for ln in lines:
+        if ln.startswith("Failure") or ln.startswith("Error"):
+            return False, ln
+    if lines and lines[-1].startswith("Success"):
+        return True, "Success"
+    return False, lines[-1] if lines else "设备无输出"
+
+
+class BatchInstaller:
+    """批量安装；run() 阻塞直到全部完成，可从其他线程 cancel()"""
+
+    def __init__(
+        self,
+        serial: str = "",
+        replace: bool = True,
+        downgrade: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        progress: Optional[Callable[[dict], None]] = None,
+        log_callback: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        :param serial: 设备序列号，空字符串表示唯一连接的设备
+        :param replace: 覆盖安装（-r）
+        :param downgrade: 允许降级（-d）
+        :param concurrency: 并发推送流数
+        :param progress: 进度回调，transfer_queue 的字段外加 installed / install_total
+        :param log_callback: 日志回调
+        """
+        self.serial = serial
+        self.replace = replace or downgrade
+        self.downgrade = downgrade
+        self.concurrency = concurrency
+        self._progress = progress
+        self.log = log_callback or (lambda msg: None)
+        self._queue: Optional[TransferQueue] = None
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._installed = 0
+        self._groups: List[InstallGroup] = []
+        self._by_file: Dict[str, InstallGroup] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._push_info: dict = {}
+
+    def cancel(self):
+        self._stopped = True
+        if self._queue is not None:
+            self._queue.cancel()
+
+    def _emit(self, push_info: Optional[dict] = None):
+        if push_info is not None:
+            self._push_info = push_info
+        if self._progress:
+            info = dict(self._push_info)
+            with self._lock:
+                info["installed"] = self._installed
+            info["install_total"] = len(self._groups)
+            self._progress(info)
+
+    def _shell(self, script: str) -> str:
+        args = (["-s", self.serial] if self.serial else []) + ["shell", script]
+        rc, out = adb_service.run_adb(args, timeout=INSTALL_TIMEOUT)
+        if rc in (124, 127):
+            raise RuntimeError(out)
+        return out
+
+    def _install_group(self, g: InstallGroup) -> dict:
+        remote = [posixpath.join(g.remote_dir, os.path.basename(f)) for f in g.files]
+        opts = (" -r" if self.replace else "") + (" -d" if self.downgrade else "")
+        total = sum(os.path.getsize(f) for f in g.files)
+        q = shlex.quote
+        writes = " && ".join(
+            f"pm install-write -S {os.path.getsize(f)} $sid {i}_{q(os.path.basename(f))} {q(r)}"
+            for i, (f, r) in enumerate(zip(g.files, remote))
+        )
+        script = (
+            f"sid=$(pm install-create{opts} -S {total} 2>&1); echo \"$sid\"; "
+            f"sid=$(echo \"$sid\" | sed -n 's/.*\\[\\([0-9][0-9]*\\)\\].*/\\1/p'); "
+            f"if [ -z \"$sid\" ]; then echo {_NO_SESSION}; else "
+            f"{{ {writes} && pm install-commit $sid; }} 2>&1 || pm install-abandon $sid >/dev/null 2>&1; "
+            f"rm -rf {q(g.remote_dir)}; fi"
+        )
+        out = self._shell(script)
+        if _NO_SESSION in out:
+            # 不支持安装会话的旧系统：单个 APK 退回 pm install
+            if len(g.files) > 1:
+                reason = next((ln.strip() for ln in out.splitlines() if ln.strip() and _NO_SESSION not in ln), "")
+                return {"ok": False, "message": reason or "设备不支持拆分 APK 安装会话"}
+            out = self._shell(f"pm install{opts} {q(remote[0])} 2>&1; rm -rf {q(g.remote_dir)}")
+        else:
+            out = "\n".join(ln for ln in out.splitlines() if not _SESSION_RE.search(ln) or "Failure" in ln)
+        ok, msg = _parse_result(out)
+        return {"ok": ok, "message": msg}
+
+    def _finish_group(self, g: InstallGroup, ok: bool, message: str):
+        g.result = {"name": g.name, "package": g.package, "files": len(g.files), "ok": ok, "message": message}
+        with self._lock:
+            self._installed += 1
+        self.log(f"{'安装成功' if ok else '安装失败'}：{g.name}" + ("" if ok else f"（{message}）"))
+        self._emit()
+
+    def _run_install(self, g: InstallGroup):
+        if self._stopped:
+            return
+        try:
+            res = self._install_group(g)
+        except Exception as e:
+            res = {"ok": False, "message": str(e)}
+        self._finish_group(g, res["ok"], res["message"])
+
+    def run(self, paths: List[str]) -> List[dict]:
+        """
+        安装全部文件，返回每组的结果 [{name, package, files, ok, message}]；取消时抛出 InterruptedError
+        :param paths: 本地 .apk / .apks / .xapk 文件
+        """
+        self._stopped = False
+        tmp_root = tempfile.mkdtemp(prefix="tobatools_install_")
+        staging = posixpath.join(STAGING_ROOT, f"tobatools_install_{os.urandom(4).hex()}")
+        try:
+            self._groups = group_apks(paths, tmp_root)
+            todo = [g for g in self._groups if g.result is None]
+            self.log(f"共 {len(self._groups)} 个应用，{sum(len(g.files) for g in todo)} 个 APK")
+
+            self._by_file = {}
+            self._queue = TransferQueue(
+                serial=self.serial, concurrency=self.concurrency, progress=self._emit, item_callback=self._on_item,
+            )
+            for i, g in enumerate(todo):
+                g.remote_dir = posixpath.join(staging, str(i))
+                for f in g.files:
+                    self._by_file[f] = g
+                    self._queue.add_push(f, g.remote_dir)
+
+            with ThreadPoolExecutor(max_workers=INSTALL_WORKERS, thread_name_prefix="apk-install") as self._pool:
+                try:
+                    self._queue.run()
+                finally:
+                    if self._stopped:
+                        self._pool.shutdown(wait=True, cancel_futures=True)
+            if self._stopped:
+                raise InterruptedError("已取消")
+            # 推送失败的组
+            for g in todo:
+                if g.result is None:
+                    reason = "; ".join(g.failed_push) or "推送失败"
+                    self._finish_group(g, False, reason)
+            return [g.result for g in self._groups]
+        finally:
+            self._queue = None
+            self._pool = None
+            shutil.rmtree(tmp_root, ignore_errors=True)
+            try:
+                adb_service.run_adb((["-s", self.serial] if self.serial else []) + ["shell", f"rm -rf {shlex.quote(staging)}"], timeout=30)
+            except Exception:
+                pass
+
+    def _on_item(self, item: TransferItem):
+        g = self._by_file.get(item.src)
+        if g is None or item.status not in ("done", "failed"):
+            return
+        with self._lock:
+            if item.status == "failed":
+                g.failed_push.append(f"{os.path.basename(item.src)}: {item.error}")
+            g.pushed += 1
+            complete = g.pushed == len(g.files)
+        # 一组全部推送成功即开始安装，不等其他组
+        if complete and not g.failed_push and not self._stopped:
+            self._pool.submit(self._run_install, g)
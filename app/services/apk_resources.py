@@ -0,0 +1,340 @@
+"""
+APK 资源的最小解析
+只处理取应用名称与图标所需的部分：ZIP 中央目录、二进制 AndroidManifest.xml（AXML）与 resources.arsc。
+输入均为已读出的字节，不依赖 aapt，便于只从设备上按区间读取 APK 中用到的几段。
+"""
+import struct
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+
+EOCD_SIG = b"PK\x05\x06"
+EOCD_MIN = 22
+EOCD_SEARCH = 0xFFFF + EOCD_MIN  # 注释最长 65535 字节
+LOCAL_HEADER_SLACK = 1024  # 本地文件头的扩展字段长度可能与中央目录不同，多读一些
+
+ATTR_LABEL = 0x01010001
+ATTR_ICON = 0x01010002
+ATTR_DRAWABLE = 0x01010199
+
+_RES_STRING_POOL = 0x0001
+_RES_TABLE = 0x0002
+_RES_XML = 0x0003
+_RES_XML_START_ELEMENT = 0x0102
+_RES_XML_RESOURCE_MAP = 0x0180
+_RES_TABLE_PACKAGE = 0x0200
+_RES_TABLE_TYPE = 0x0201
+
+_TYPE_REFERENCE = 0x01
+_TYPE_STRING = 0x03
+_NO_INDEX = 0xFFFFFFFF
+_TYPE_FLAG_SPARSE = 0x01
+_TYPE_FLAG_OFFSET16 = 0x02
+
+_DENSITY_ANY = 0xFFFE
+_DENSITY_NONE = 0xFFFF
+
+
+class ApkFormatError(ValueError):
+    pass
+
+
+class ZipEntry:
+    __slots__ = ("name", "offset", "method", "csize", "usize")
+
+    def __init__(self, name: str, offset: int, method: int, csize: int, usize: int):
+        self.name = name
+        self.offset = offset
+        self.method = method
+        self.csize = csize
+        self.usize = usize
+
+    @property
+    def read_length(self) -> int:
+        """从本地文件头开始需要读取的字节数"""
+        return 30 + len(self.name.encode("utf-8")) + LOCAL_HEADER_SLACK + self.csize
+
+
+# ---------- ZIP ----------
+def find_central_directory(tail: bytes) -> Tuple[int, int]:
+    """从文件末尾的字节中找到 EOCD，返回 (中央目录偏移, 中央目录大小)"""
+    pos = tail.rfind(EOCD_SIG)
+    if pos < 0 or len(tail) - pos < EOCD_MIN:
+        raise ApkFormatError("找不到 ZIP 目录结尾")
+    cd_size, cd_offset = struct.unpack("<II", tail[pos + 12:pos + 20])
+    if cd_offset == 0xFFFFFFFF:
+        raise ApkFormatError("不支持 ZIP64")
+    return cd_offset, cd_size
+
+
+def parse_central_directory(data: bytes) -> Dict[str, ZipEntry]:
+    entries: Dict[str, ZipEntry] = {}
+    pos = 0
+    while pos + 46 <= len(data) and data[pos:pos + 4] == b"PK\x01\x02":
+        (method, csize, usize, n_len, e_len, c_len, offset) = struct.unpack(
+            "<H8xIIHHH8xI", data[pos + 10:pos + 46]
+        )
+        name = data[pos + 46:pos + 46 + n_len].decode("utf-8", errors="replace")
+        entries[name] = ZipEntry(name, offset, method, csize, usize)
+        pos += 46 + n_len + e_len + c_len
+    if not entries:
+        raise ApkFormatError("ZIP 中央目录为空")
+    return entries
+
+
+def entry_data(blob: bytes, entry: ZipEntry) -> bytes:
+    """blob 为从本地文件头开始读出的字节，返回解压后的内容"""
+    if blob[:4] != b"PK\x03\x04":
+        raise ApkFormatError(f"本地文件头无效: {entry.name}")
+    n_len, e_len = struct.unpack("<HH", blob[26:30])
+    start = 30 + n_len + e_len
+    raw = blob[start:start + entry.csize]
+    if len(raw) < entry.csize:
+        raise ApkFormatError(f"数据不完整: {entry.name}")
+    if entry.method == 0:
+        return raw
+    if entry.method == 8:
+        return zlib.decompress(raw, -15)
+    raise ApkFormatError(f"不支持的压缩方式 {entry.method}: {entry.name}")
+
+
+# ---------- 字符串池 ----------
+def _string_pool(data: bytes, pos: int) -> List[str]:
+    _typ, header_size, _size, count, _styles, flags, strings_start = struct.unpack(
+        "<HHIIIII", data[pos:pos + 24]
+    )
+    utf8 = bool(flags & 0x100)
+    offsets = struct.unpack(f"<{count}I", data[pos + header_size:pos + header_size + 4 * count])
+    base = pos + strings_start
+    result = []
+    for off in offsets:
+        p = base + off
+        try:
+            if utf8:
+                # UTF-16 长度（忽略）与 UTF-8 字节数，各 1 或 2 字节
+                p += 2 if data[p] & 0x80 else 1
+                n = data[p]
+                if n & 0x80:
+                    n = ((n & 0x7F) << 8) | data[p + 1]
+                    p += 1
+                p += 1
+                result.append(data[p:p + n].decode("utf-8", errors="replace"))
+            else:
+                n = struct.unpack("<H", data[p:p + 2])[0]
+                p += 2
+                if n & 0x8000:
+                    n = ((n & 0x7FFF) << 16) | struct.unpack("<H", data[p:p + 2])[0]
+                    p += 2
+                result.append(data[p:p + n * 2].decode("utf-16-le", errors="replace"))
+        except (IndexError, struct.error):
+            result.append("")
+    return result
+
+
+# ---------- 二进制 XML ----------
+def xml_attributes(data: bytes, elements: Tuple[str, ...], attrs: tuple) -> Dict[object, Tuple[int, int, str]]:
+    """
+    读取二进制 XML 中第一个匹配元素上的属性
+    :param elements: 元素名，按出现顺序取第一个命中的
+    :param attrs: 属性的资源 ID（如 ATTR_LABEL），或没有资源 ID 的属性名（如 "package"）
+    :return: {属性 ID 或属性名: (值类型, 值, 原始字符串)}
+    """
+    if len(data) < 8 or struct.unpack("<H", data[:2])[0] != _RES_XML:
+        raise ApkFormatError("不是二进制 XML")
+    strings: List[str] = []
+    res_map: List[int] = []
+    pos = struct.unpack("<H", data[2:4])[0]
+    while pos + 8 <= len(data):
+        typ, header_size, size = struct.unpack("<HHI", data[pos:pos + 8])
+        if size < 8:
+            break
+        if typ == _RES_STRING_POOL:
+            strings = _string_pool(data, pos)
+        elif typ == _RES_XML_RESOURCE_MAP:
+            res_map = list(struct.unpack(f"<{(size - header_size) // 4}I", data[pos + header_size:pos + size]))
+        elif typ == _RES_XML_START_ELEMENT:
+            ext = pos + header_size
+            _ns, name_idx, attr_start, attr_size, attr_count = struct.unpack("<IIHHH", data[ext:ext + 14])
+            name = strings[name_idx] if name_idx < len(strings) else ""
+            if name in elements:
+                found = {}
+                for i in range(attr_count):
+                    a = ext + attr_start + i * attr_size
+                    _ans, a_name, raw, _vsize, _res0, vtype, value = struct.unpack("<IIIHBBI", data[a:a + 20])
+                    rid = res_map[a_name] if a_name < len(res_map) else 0
+                    key = rid if rid in attrs else (strings[a_name] if a_name < len(strings) else "")
+                    if key in attrs:
+                        raw_s = strings[raw] if raw != _NO_INDEX and raw < len(strings) else ""
+                        found[key] = (vtype, value, raw_s)
+                return found
+        pos += size
+    return {}
+
+
+# ---------- resources.arsc ----------
+class ResourceTable:
+    """只解析取值所需的部分：全局字符串池与各配置下的条目值"""
+
+    def __init__(self, data: bytes):
+        if len(data) < 12 or struct.unpack("<H", data[:2])[0] != _RES_TABLE:
+            raise ApkFormatError("不是资源表")
+        self._data = data
+        self._strings: List[str] = []
+        # (包 ID, 类型 ID) -> [(配置字节, 条目起始, 条目数, 偏移表位置, 标志)]
+        self._types: Dict[Tuple[int, int], list] = {}
+        pos = struct.unpack("<H", data[2:4])[0]
+        while pos + 8 <= len(data):
+            typ, _hs, size = struct.unpack("<HHI", data[pos:pos + 8])
+            if size < 8:
+                break
+            if typ == _RES_STRING_POOL and not self._strings:
+                self._strings = _string_pool(data, pos)
+            elif typ == _RES_TABLE_PACKAGE:
+                self._parse_package(pos, size)
+            pos += size
+
+    def _parse_package(self, pos: int, size: int):
+        data = self._data
+        header_size = struct.unpack("<H", data[pos + 2:pos + 4])[0]
+        pkg_id = struct.unpack("<I", data[pos + 8:pos + 12])[0]
+        p, end = pos + header_size, pos + size
+        while p + 8 <= end:
+            typ, hs, sz = struct.unpack("<HHI", data[p:p + 8])
+            if sz < 8:
+                break
+            if typ == _RES_TABLE_TYPE:
+                type_id, flags = data[p + 8], data[p + 9]
+                entry_count, entries_start = struct.unpack("<II", data[p + 12:p + 20])
+                cfg_size = struct.unpack("<I", data[p + 20:p + 24])[0]
+                config = data[p + 20:p + 20 + cfg_size]
+                self._types.setdefault((pkg_id, type_id), []).append(
+                    (config, p + entries_start, entry_count, p + hs, flags)
+                )
+            p += sz
+
+    def _entry_offset(self, offsets_at: int, count: int, flags: int, index: int) -> Optional[int]:
+        data = self._data
+        if flags & _TYPE_FLAG_SPARSE:
+            # 稀疏类型：按条目编号排序的 (编号, 偏移/4) 对
+            lo, hi = 0, count
+            while lo < hi:
+                mid = (lo + hi) // 2
+                idx, off = struct.unpack("<HH", data[offsets_at + mid * 4:offsets_at + mid * 4 + 4])
+                if idx == index:
+                    return off * 4
+                if idx < index:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return None
+        if index >= count:
+            return None
+        if flags & _TYPE_FLAG_OFFSET16:
+            off = struct.unpack("<H", data[offsets_at + index * 2:offsets_at + index * 2 + 2])[0]
+            return None if off == 0xFFFF else off * 4
+        off = struct.unpack("<I", data[offsets_at + index * 4:offsets_at + index * 4 + 4])[0]
+        return None if off == _NO_INDEX else off
+
+    def values(self, res_id: int) -> List[Tuple[bytes, int, int]]:
+        """资源在各配置下的取值 [(配置字节, 值类型, 值)]，复杂（bag）条目跳过"""
+        pkg_id, type_id, index = res_id >> 24, (res_id >> 16) & 0xFF, res_id & 0xFFFF
+        result = []
+        data = self._data
+        # 共享库的包 ID 在表中记为 0
+        chunks = self._types.get((pkg_id, type_id)) or self._types.get((0, type_id), [])
+        for config, entries_at, count, offsets_at, flags in chunks:
+            off = self._entry_offset(offsets_at, count, flags, index)
+            if off is None:
+                continue
+            e = entries_at + off
+            esize, eflags = struct.unpack("<HH", data[e:e + 4])
+            if eflags & 0x0008:
+                # 紧凑条目：值类型在 flags 高字节，值紧随其后
+                result.append((config, eflags >> 8, struct.unpack("<I", data[e + 4:e + 8])[0]))
+                continue
+            if eflags & 0x0001:
+                continue
+            _vsize, _res0, vtype, value = struct.unpack("<HBBI", data[e + esize:e + esize + 8])
+            result.append((config, vtype, value))
+        return result
+
+    def string(self, index: int) -> str:
+        return self._strings[index] if 0 <= index < len(self._strings) else ""
+
+    def resolve_string(self, res_id: int, languages: Tuple[str, ...] = ("zh",), depth: int = 0) -> str:
+        """按语言偏好取字符串资源：首选 languages 中的语言，其次默认配置"""
+        candidates = self.values(res_id)
+        if not candidates or depth > 4:
+            return ""
+
+        def rank(item):
+            lang = _config_language(item[0])
+            if lang in languages:
+                return languages.index(lang)
+            return len(languages) if not lang else len(languages) + 1
+
+        for config, vtype, value in sorted(candidates, key=rank):
+            if vtype == _TYPE_STRING:
+                return self.string(value)
+            if vtype == _TYPE_REFERENCE and value:
+                s = self.resolve_string(value, languages, depth + 1)
+                if s:
+                    return s
+        return ""
+
+    def resolve_files(self, res_id: int, depth: int = 0) -> List[str]:
+        """图标等文件资源：返回各配置下的文件路径，位图按密度从高到低排在前面，XML 排在最后"""
+        found: List[Tuple[int, str]] = []
+        if depth > 4:
+            return []
+        for config, vtype, value in self.values(res_id):
+            if vtype == _TYPE_STRING:
+                path = self.string(value)
+                density = _config_density(config)
+                if path.endswith(".xml"):
+                    found.append((-1, path))
+                else:
+                    found.append((0 if density in (_DENSITY_ANY, _DENSITY_NONE) else density, path))
+            elif vtype == _TYPE_REFERENCE and value:
+                found.extend((0, p) for p in self.resolve_files(value, depth + 1))
+        seen, result = set(), []
+        for _, path in sorted(found, key=lambda x: -x[0]):
+            if path not in seen:
+                seen.add(path)
+                result.append(path)
+        return result
+
+
+def _config_language(config: bytes) -> str:
+    # ResTable_config: size(4) mcc(2) mnc(2) language(2) country(2) ...
+    lang = config[8:10]
+    if len(lang) < 2 or lang == b"\x00\x00" or lang[0] & 0x80:
+        return ""
+    return lang.decode("ascii", errors="ignore")
+
+
+def _config_density(config: bytes) -> int:
+    # ... orientation(1) touchscreen(1) density(2)
+    if len(config) < 16:
+        return 0
+    return struct.unpack("<H", config[14:16])[0]
+
+
+def manifest_label_icon(manifest: bytes) -> Tuple[Tuple[int, int, str], Tuple[int, int, str]]:
+    """返回 application 元素的 (label, icon) 属性，缺失时为 (0, 0, "")"""
+    found = xml_attributes(manifest, ("application",), (ATTR_LABEL, ATTR_ICON))
+    empty = (0, 0, "")
+    return found.get(ATTR_LABEL, empty), found.get(ATTR_ICON, empty)
+
+
+def adaptive_icon_foreground(xml: bytes) -> int:
+    """自适应图标 XML 中 foreground 的 drawable 资源 ID，没有返回 0"""
+    found = xml_attributes(xml, ("foreground",), (ATTR_DRAWABLE,))
+    vtype, value, _ = found.get(ATTR_DRAWABLE, (0, 0, ""))
+    return value if vtype == _TYPE_REFERENCE else 0
+
+
+def manifest_package(manifest: bytes) -> Tuple[str, str]:
+    """返回 manifest 元素上的 (包名, 拆分名)，基础 APK 的拆分名为空"""
+    found = xml_attributes(manifest, ("manifest",), ("package", "split"))
+    return found.get("package", (0, 0, ""))[2], found.get("split", (0, 0, ""))[2]
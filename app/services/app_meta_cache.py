@@ -0,0 +1,228 @@
+"""
+应用名称与图标的持久缓存
+按 包名 + versionCode 存入本地 SQLite，与设备无关：同一版本的应用在任何设备、任何一次启动都直接命中。
+未命中的应用在后台线程池中解析：只从设备上按区间读取 APK 的 ZIP 目录、AndroidManifest.xml、
+resources.arsc 与图标文件，不拉取整个 APK。
+"""
+import io
+import shlex
+import sqlite3
+import struct
+import subprocess
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services import adb_service, apk_resources
+from app.services.adb_service import CACHE_DIR, _silent_kwargs
+
+
+META_DB = CACHE_DIR / "app_meta.db"
+ICON_SIZE = 64
+MAX_ARSC_BYTES = 32 * 1024 * 1024  # 资源表超过此大小时只取清单中的字面名称
+WORKERS = 4
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS apps (
+    package TEXT NOT NULL,
+    version TEXT NOT NULL,
+    label   TEXT NOT NULL,
+    icon    BLOB,
+    failed  INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    PRIMARY KEY (package, version)
+);
+"""
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="app-meta")
+_lock = threading.Lock()
+_generation = 0
+_inflight: set = set()
+
+
+def _connect() -> sqlite3.Connection:
+    META_DB.parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(str(META_DB), timeout=30)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript(_SCHEMA)
+    return db
+
+
+def _version_key(info: dict) -> str:
+    # 旧系统拿不到 versionCode 时以 APK 路径区分版本（更新后路径会变化）
+    return str(info.get("version_code") or info.get("apk") or "")
+
+
+def lookup(infos: List[dict]) -> Dict[str, Tuple[str, Optional[bytes]]]:
+    """
+    查询缓存，返回 {包名: (名称, 图标 PNG 字节或 None)}；解析失败过的同一版本也会返回（名称为空），不再重试
+    :param infos: package_service 清单条目，至少含 package 与 version_code / apk
+    """
+    wanted = {(i["package"], _version_key(i)) for i in infos if i.get("package")}
+    result: Dict[str, Tuple[str, Optional[bytes]]] = {}
+    if not wanted:
+        return result
+    pkgs = sorted({p for p, _ in wanted})
+    with closing(_connect()) as db:
+        for i in range(0, len(pkgs), 500):
+            chunk = pkgs[i:i + 500]
+            rows = db.execute(
+                f"SELECT package, version, label, icon FROM apps WHERE package IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for pkg, version, label, icon in rows:
+                if (pkg, version) in wanted:
+                    result[pkg] = (label, bytes(icon) if icon else None)
+    return result
+
+
+def _store(package: str, version: str, label: str, icon: Optional[bytes], failed: bool):
+    with closing(_connect()) as db:
+        # 同一包的旧版本不再需要
+        db.execute("DELETE FROM apps WHERE package = ? AND version != ?", (package, version))
+        db.execute(
+            "INSERT OR REPLACE INTO apps(package, version, label, icon, failed, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            (package, version, label, icon, int(failed), time.time()),
+        )
+        db.commit()
+
+
+# ---------- 从设备读取 APK 片段 ----------
+def _exec_out(serial: str, script: str, timeout: int = 60) -> bytes:
+    adb = str(adb_service.ADB_BIN) if adb_service.ADB_BIN.exists() else "adb"
+    cmd = [adb] + (["-s", serial] if serial else []) + ["exec-out", script]
+    return subprocess.run(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout, **_silent_kwargs()
+    ).stdout
+
+
+def _read_ranges(serial: str, apk: str, ranges: List[Tuple[int, int]]) -> List[bytes]:
+    """一次 exec-out 读取同一文件的多个 (偏移, 长度) 区间"""
+    q = shlex.quote(apk)
+    script = "; ".join(f"tail -c +{off + 1} {q} | head -c {n}" for off, n in ranges)
+    out = _exec_out(serial, script)
+    parts, pos = [], 0
+    for _, n in ranges:
+        parts.append(out[pos:pos + n])
+        pos += n
+    return parts
+
+
+def _shrink_icon(data: bytes) -> bytes:
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            im.thumbnail((ICON_SIZE, ICON_SIZE))
+            buf = io.BytesIO()
+            im.convert("RGBA").save(buf, "PNG")
+            return buf.getvalue()
+    except Exception:
+        return data
+
+
+def extract(serial: str, apk: str) -> Tuple[str, Optional[bytes]]:
+    """从设备上的 APK 取应用名称与图标（PNG 字节），取不到的部分为空"""
+    tail = _exec_out(serial, f"tail -c {apk_resources.EOCD_SEARCH} {shlex.quote(apk)}")
+    if not tail:
+        raise OSError(f"无法读取 {apk}")
+    cd_offset, cd_size = apk_resources.find_central_directory(tail)
+    entries = apk_resources.parse_central_directory(_read_ranges(serial, apk, [(cd_offset, cd_size)])[0])
+
+    def read(*names: str) -> List[bytes]:
+        found = [entries[n] for n in names]
+        blobs = _read_ranges(serial, apk, [(e.offset, e.read_length) for e in found])
+        return [apk_resources.entry_data(b, e) for b, e in zip(blobs, found)]
+
+    manifest = entries.get("AndroidManifest.xml")
+    if manifest is None:
+        raise apk_resources.ApkFormatError("APK 中没有 AndroidManifest.xml")
+    arsc = entries.get("resources.arsc")
+    if arsc is not None and arsc.csize <= MAX_ARSC_BYTES:
+        manifest_data, arsc_data = read(manifest.name, arsc.name)
+        table = apk_resources.ResourceTable(arsc_data)
+    else:
+        manifest_data, = read(manifest.name)
+        table = None
+
+    (l_type, l_value, l_raw), (i_type, i_value, _) = apk_resources.manifest_label_icon(manifest_data)
+    label = l_raw
+    if table is not None and l_type == 0x01 and l_value:
+        label = table.resolve_string(l_value) or label
+
+    icon = None
+    if table is not None and i_type == 0x01 and i_value:
+        files = [f for f in table.resolve_files(i_value) if f in entries]
+        bitmaps = [f for f in files if not f.endswith(".xml")]
+        if not bitmaps:
+            # 只有自适应图标时取其前景层
+            for xml in (f for f in files if f.endswith(".xml")):
+                fg = apk_resources.adaptive_icon_foreground(read(xml)[0])
+                bitmaps = [f for f in table.resolve_files(fg) if f in entries and not f.endswith(".xml")] if fg else []
+                if bitmaps:
+                    break
+        if bitmaps:
+            icon = _shrink_icon(read(bitmaps[0])[0])
+    return label.strip(), icon
+
+
+# ---------- 后台解析 ----------
+def cancel_pending():
+    """放弃尚未开始的解析（如切换了设备）"""
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+def request(serial: str, infos: List[dict], callback: Callable[[str, str, Optional[bytes]], None]):
+    """
+    后台解析未缓存的应用，完成一个回调一个
+    :param serial: 设备序列号，空字符串表示唯一连接的设备
+    :param infos: package_service 清单条目，需含 package、apk 与 version_code
+    :param callback: callback(包名, 名称, 图标 PNG 字节或 None)，在后台线程调用
+    """
+    with _lock:
+        gen = _generation
+    for info in infos:
+        key = (info.get("package"), _version_key(info))
+        if not key[0] or not info.get("apk"):
+            continue
+        with _lock:
+            if key in _inflight:
+                continue
+            _inflight.add(key)
+        _pool.submit(_run, serial, dict(info), gen, callback)
+
+
+def _run(serial: str, info: dict, gen: int, callback):
+    pkg, version = info["package"], _version_key(info)
+    try:
+        if gen != _generation:
+            return
+        try:
+            label, icon = extract(serial, info["apk"])
+            failed = not label and not icon
+        except (apk_resources.ApkFormatError, struct.error, zlib.error, IndexError):
+            # 格式无法解析：记下失败，同一版本不再重试
+            label, icon, failed = "", None, True
+        except Exception:
+            # 读取失败（设备断开、超时等）不缓存，下次刷新重试
+            return
+        try:
+            _store(pkg, version, label, icon, failed)
+        except sqlite3.Error:
+            pass
+        if gen == _generation:
+            try:
+                callback(pkg, label, icon)
+            except RuntimeError:
+                # 界面已关闭
+                pass
+    finally:
+        with _lock:
+            _inflight.discard((pkg, version))
@@ -0,0 +1,735 @@
+"""
+分区备份传输
+通过 adb exec-out 把设备端 dd 的输出直接流式写入电脑端文件，
+不在设备存储上生成临时镜像，也不再需要与分区等大的剩余空间。
+接收的同时可写成 Android sparse 镜像或 gzip / zstd 压缩流。
+"""
+import gzip
+import hashlib
+import json
+import os
+import queue
+import shutil
+import struct
+import subprocess
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from app.services.adb_service import BIN_DIR, _silent_kwargs
+
+
+DEFAULT_BLOCK_SIZE = 4 * 1024 * 1024
+READ_CHUNK = 1024 * 1024
+HASH_CHUNK = 8 * 1024 * 1024
+DEVICE_TMP = "/data/local/tmp"
+MANIFEST_NAME = "backup_manifest.json"
+
+FORMAT_RAW = "raw"
+FORMAT_GZIP = "gzip"
+FORMAT_SPARSE = "sparse"
+FORMAT_ZSTD = "zstd"
+FORMAT_EXT = {
+    FORMAT_RAW: ".img",
+    FORMAT_GZIP: ".img.gz",
+    FORMAT_SPARSE: ".sparse.img",
+    FORMAT_ZSTD: ".img.zst",
+}
+
+SPARSE_MAGIC = 0xED26FF3A
+SPARSE_BLOCK = 4096
+_CHUNK_RAW = 0xCAC1
+_CHUNK_FILL = 0xCAC2
+_ZERO_BLOCK = bytes(SPARSE_BLOCK)
+
+
+# -------- Sinks --------
+class _RawSink:
+    """原样写入 .img"""
+
+    def __init__(self, path: str):
+        self._f = open(path, "wb")
+
+    def write(self, data: bytes):
+        self._f.write(data)
+
+    def close(self):
+        self._f.close()
+
+
+class _GzipSink:
+    """边接收边 gzip 压缩（level 1，优先速度）"""
+
+    def __init__(self, path: str, level: int = 1):
+        self._f = gzip.open(path, "wb", compresslevel=level)
+
+    def write(self, data: bytes):
+        self._f.write(data)
+
+    def close(self):
+        self._f.close()
+
+
+class _SparseSink:
+    """写 Android sparse 镜像：全零 / 单一 4 字节图案的块记为 FILL，其余为 RAW。
+
+    文件头中的块数与 chunk 数在 close() 时回填。
+    """
+
+    MAX_RAW_BLOCKS = 1024  # 单个 RAW chunk 最多缓存 4 MB
+
+    def __init__(self, path: str):
+        self._f = open(path, "wb")
+        self._f.write(bytes(28))
+        self._pending = b""
+        self._total_blocks = 0
+        self._chunks = 0
+        self._raw: List[bytes] = []
+        self._fill_value: Optional[bytes] = None
+        self._fill_count = 0
+
+    def _flush_raw(self):
+        if self._raw:
+            data = b"".join(self._raw)
+            self._f.write(struct.pack("<HHII", _CHUNK_RAW, 0, len(self._raw), 12 + len(data)))
+            self._f.write(data)
+            self._chunks += 1
+            self._raw = []
+
+    def _flush_fill(self):
+        if self._fill_count:
+            self._f.write(struct.pack("<HHII", _CHUNK_FILL, 0, self._fill_count, 16))
+            self._f.write(self._fill_value)
+            self._chunks += 1
+            self._fill_count = 0
+            self._fill_value = None
+
+    def _add_block(self, block: bytes):
+        self._total_blocks += 1
+        pattern = None
+        if block == _ZERO_BLOCK:
+            pattern = b"\0\0\0\0"
+        elif block[:4] == block[-4:] and block == block[:4] * (SPARSE_BLOCK // 4):
+            pattern = block[:4]
+        if pattern is not None:
+            if self._fill_count and pattern != self._fill_value:
+                self._flush_fill()
+            self._flush_raw()
+            self._fill_value = pattern
+            self._fill_count += 1
+            return
+        self._flush_fill()
+        self._raw.append(block)
+        if len(self._raw) >= self.MAX_RAW_BLOCKS:
+            self._flush_raw()
+
+    def write(self, data: bytes):
+        if self._pending:
+            data = self._pending + data
+        end = len(data) - len(data) % SPARSE_BLOCK
+        mv = memoryview(data)
+        for pos in range(0, end, SPARSE_BLOCK):
+            self._add_block(bytes(mv[pos:pos + SPARSE_BLOCK]))
+        self._pending = bytes(mv[end:])
+
+    def close(self):
+        if self._pending:
+            # 分区大小不是 4K 对齐时补零（原始大小记录在备份索引里）
+            self._add_block(self._pending.ljust(SPARSE_BLOCK, b"\0"))
+            self._pending = b""
+        self._flush_raw()
+        self._flush_fill()
+        self._f.seek(0)
+        self._f.write(struct.pack(
+            "<IHHHHIIII", SPARSE_MAGIC, 1, 0, 28, 12,
+            SPARSE_BLOCK, self._total_blocks, self._chunks, 0,
+        ))
+        self._f.close()
+
+
+class _ZstdSink:
+    """zstd 压缩：优先用 zstandard 模块，否则通过管道交给 bin/zstd.exe"""
+
+    def __init__(self, path: str, level: int = 3):
+        self._proc = None
+        self._f = None
+        try:
+            import zstandard
+            self._f = open(path, "wb")
+            self._writer = zstandard.ZstdCompressor(level=level, threads=-1).stream_writer(self._f)
+        except ImportError:
+            self._proc = subprocess.Popen(
+                [zstd_binary(), f"-{level}", "-T0", "-q", "-f", "-o", path, "-"],
+                stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                **_silent_kwargs()
+            )
+            self._writer = self._proc.stdin
+
+    def write(self, data: bytes):
+        self._writer.write(data)
+
+    def close(self):
+        if self._proc is None:
+            self._writer.close()
+            return
+        try:
+            self._writer.close()
+        except Exception:
+            pass
+        if self._proc.wait() != 0:
+            err = self._proc.stderr.read().decode("utf-8", errors="replace").strip()
+            raise RuntimeError(f"zstd 压缩失败: {err}")
+
+
+def zstd_binary() -> str:
+    exe = BIN_DIR / "zstd.exe"
+    if os.name == "nt" and exe.exists():
+        return str(exe)
+    return shutil.which("zstd") or str(exe)
+
+
+def open_sink(path: str, fmt: str = FORMAT_RAW):
+    if fmt == FORMAT_GZIP:
+        return _GzipSink(path)
+    if fmt == FORMAT_SPARSE:
+        return _SparseSink(path)
+    if fmt == FORMAT_ZSTD:
+        return _ZstdSink(path)
+    return _RawSink(path)
+
+
+def backup_file_name(partition: str, fmt: str = FORMAT_RAW) -> str:
+    return f"{partition}{FORMAT_EXT.get(fmt, '.img')}"
+
+
+def dd_command(device_path: str, block_size: int = DEFAULT_BLOCK_SIZE, hash_token: str = "") -> str:
+    # su 与 dd 的 stderr 都丢弃：exec-out 没有独立的错误通道，任何提示文字都会混进镜像
+    dd = f"dd if={device_path} bs={int(block_size)} 2>/dev/null"
+    if not hash_token:
+        return f"su -c '{dd}' 2>/dev/null"
+    # 同一次读取经 tee 分流到 FIFO，由设备端 sha256sum 计算源分区哈希并写入 <token>.h；
+    # 设备缺少 sha256sum 或 mkfifo 时退化为普通 dd
+    script = (
+        f"if command -v sha256sum >/dev/null && mkfifo {hash_token}.p 2>/dev/null; then "
+        f"sha256sum < {hash_token}.p > {hash_token}.h & {dd} | tee {hash_token}.p 2>/dev/null; "
+        f"wait; rm -f {hash_token}.p; else {dd}; fi"
+    )
+    return f"su -c '{script}' 2>/dev/null"
+
+
+def _read_device_hash(adb_path: str, serial: str, hash_token: str) -> str:
+    try:
+        out = subprocess.run(
+            [adb_path, "-s", serial, "shell", f"su -c 'cat {hash_token}.h 2>/dev/null; rm -f {hash_token}.h {hash_token}.p'"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=15, **_silent_kwargs()
+        ).stdout.decode("utf-8", errors="ignore").strip()
+    except Exception:
+        return ""
+    token = out.split(" ")[0].lower() if out else ""
+    return token if len(token) == 64 else ""
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(HASH_CHUNK)
+            if not data:
+                break
+            h.update(data)
+    return h.hexdigest()
+
+
+def stream_partition(
+    adb_path: str,
+    serial: str,
+    device_path: str,
+    dest_path: str,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    fmt: str = FORMAT_RAW,
+    expected_size: int = 0,
+    progress: Optional[Callable[[int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    device_hash: bool = True,
+) -> dict:
+    """把设备分区通过 exec-out 流式备份到 dest_path。
+
+    返回 {size, sha256, device_sha256, file_sha256}：sha256 为接收数据的哈希，
+    device_sha256 为设备端对同一次读取计算的哈希（不可用时为空），file_sha256 为落盘文件的哈希。
+    失败（adb 异常退出、无数据、大小不符、哈希不一致、取消）时删除不完整的文件并抛出异常。
+    """
+    token = f"{DEVICE_TMP}/.toba_{uuid.uuid4().hex[:12]}" if device_hash else ""
+    cmd = [adb_path, "-s", serial, "exec-out", dd_command(device_path, block_size, token)]
+    digest = hashlib.sha256()
+    sink = open_sink(dest_path, fmt)
+    # adb 自身的错误（设备断开、协议错误等）走 stderr，留作失败原因；输出很少，读完 stdout 后再取不会阻塞
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0, **_silent_kwargs())
+    sink_open = True
+    total = 0
+    ok = False
+    try:
+        while True:
+            if should_stop and should_stop():
+                raise InterruptedError("已取消")
+            chunk = proc.stdout.read(READ_CHUNK)
+            if not chunk:
+                break
+            sink.write(chunk)
+            digest.update(chunk)
+            total += len(chunk)
+            if progress:
+                progress(total)
+        err = proc.stderr.read().decode("utf-8", errors="replace").strip()
+        rc = proc.wait()
+        sink_open = False
+        sink.close()
+        if rc != 0:
+            raise RuntimeError(f"adb 传输异常退出（{rc}）: {err or '无错误信息'}，已接收 {total} 字节")
+        if total == 0:
+            raise RuntimeError("未读取到任何数据（Root 授权被拒绝或分区不可读）")
+        if expected_size and total != expected_size:
+            raise RuntimeError(f"数据不完整: {total} / {expected_size} 字节")
+        sha = digest.hexdigest()
+        dev_sha = _read_device_hash(adb_path, serial, token) if token else ""
+        if dev_sha and dev_sha != sha:
+            raise RuntimeError("接收数据与设备端哈希不一致")
+        ok = True
+        return {
+            "size": total,
+            "sha256": sha,
+            "device_sha256": dev_sha,
+            "file_sha256": sha if fmt == FORMAT_RAW else file_sha256(dest_path),
+        }
+    finally:
+        if proc.poll() is None:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        for stream in (proc.stdout, proc.stderr):
+            try:
+                stream.close()
+            except Exception:
+                pass
+        if sink_open:
+            try:
+                sink.close()
+            except Exception:
+                pass
+        if not ok:
+            try:
+                os.remove(dest_path)
+            except OSError:
+                pass
+            if token:
+                _read_device_hash(adb_path, serial, token)  # 顺带清理设备端临时文件
+
+
+# -------- 压缩包 --------
+class ArchiveStage:
+    """与传输并行的 ZIP 写入线程：每个分区文件一传完就加入压缩包，条目写入并回读校验 CRC 后立即删除散文件。
+
+    gzip / zstd 已经压缩过，直接 STORED；raw / sparse 用 DEFLATED（默认 level 1，跟得上 USB 速度）。
+    磁盘占用峰值约为压缩包加上正在写入的几个散文件；校验失败的散文件保留，原因见 errors。
+    """
+
+    STORED_FORMATS = (FORMAT_GZIP, FORMAT_ZSTD)
+
+    def __init__(self, zip_path: str, arc_root: str, level: int = 1,
+                 log: Optional[Callable[[str], None]] = None):
+        self.zip_path = zip_path
+        self.arc_root = arc_root
+        self.level = level
+        self.log = log
+        self.errors: List[str] = []
+        self.moved: List[str] = []  # 已校验写入压缩包并删除的散文件
+        self._zf = zipfile.ZipFile(zip_path, "w", allowZip64=True)
+        self._q: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def add(self, path: str, fmt: str = FORMAT_RAW, remove: bool = True):
+        self._q.put((path, fmt, remove))
+
+    def _entry_ok(self, info: zipfile.ZipInfo) -> bool:
+        """从磁盘回读刚写入的条目，核对 CRC 与写入时从源文件算出的一致"""
+        self._zf.fp.flush()
+        with open(self.zip_path, "rb") as f:
+            f.seek(info.header_offset)
+            header = f.read(30)
+            if len(header) != 30 or header[:4] != b"PK\x03\x04":
+                return False
+            name_len, extra_len = struct.unpack("<HH", header[26:30])
+            f.seek(name_len + extra_len, os.SEEK_CUR)
+            dec = zlib.decompressobj(-15) if info.compress_type == zipfile.ZIP_DEFLATED else None
+            crc = 0
+            remaining = info.compress_size
+            while remaining:
+                data = f.read(min(HASH_CHUNK, remaining))
+                if not data:
+                    return False
+                remaining -= len(data)
+                crc = zlib.crc32(dec.decompress(data) if dec else data, crc)
+            if dec:
+                crc = zlib.crc32(dec.flush(), crc)
+        return crc == info.CRC
+
+    def _loop(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                break
+            path, fmt, remove = item
+            name = os.path.basename(path)
+            arcname = f"{self.arc_root}/{name}"
+            try:
+                t0 = time.perf_counter()
+                if fmt in self.STORED_FORMATS:
+                    self._zf.write(path, arcname, compress_type=zipfile.ZIP_STORED)
+                else:
+                    self._zf.write(path, arcname, compress_type=zipfile.ZIP_DEFLATED, compresslevel=self.level)
+                if not self._entry_ok(self._zf.getinfo(arcname)):
+                    self.errors.append(f"{name}: 压缩包中的数据校验失败，散文件已保留")
+                    continue
+                if remove:
+                    os.remove(path)
+                    self.moved.append(path)
+                if self.log and fmt is not None:
+                    self.log(f"  - 已加入压缩包: {name}（{time.perf_counter() - t0:.1f}s）")
+            except Exception as e:
+                self.errors.append(f"{name}: {e}")
+
+    def close(self):
+        """等待队列写完并关闭压缩包；出错的条目见 errors，对应散文件仍在原处"""
+        self._q.put(None)
+        self._thread.join()
+        try:
+            self._zf.close()
+        except Exception as e:
+            self.errors.append(f"关闭压缩包: {e}")
+
+    def abort(self):
+        """放弃压缩包；已有散文件移入压缩包时保留它，否则删除"""
+        self.close()
+        if self.moved:
+            return
+        try:
+            os.remove(self.zip_path)
+        except OSError:
+            pass
+
+
+# -------- 备份索引 --------
+def write_manifest(backup_dir: str, info: dict, entries: List[dict]) -> str:
+    """写 backup_manifest.json；entries 每项含 name / file / format / size / stored_size"""
+    data = dict(info)
+    data.setdefault("created", time.strftime("%Y-%m-%d %H:%M:%S"))
+    data["partitions"] = entries
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def load_manifest(backup_dir: str) -> dict:
+    with open(os.path.join(backup_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _hash_stream(f) -> str:
+    h = hashlib.sha256()
+    while True:
+        data = f.read(HASH_CHUNK)
+        if not data:
+            break
+        h.update(data)
+    return h.hexdigest()
+
+
+def verify_backup(
+    path: str,
+    workers: int = 4,
+    progress: Optional[Callable[[str, bool, str], None]] = None,
+) -> List[dict]:
+    """按 backup_manifest.json 校验备份目录或 ZIP，返回每个分区的 {name, ok, reason}。
+
+    多个文件由线程池并行读取（hashlib 在大块数据上会释放 GIL）；ZIP 中的成员顺序读取。
+    """
+    results: List[dict] = []
+
+    def _check(name: str, expect: str, opener) -> dict:
+        if not expect:
+            res = {"name": name, "ok": False, "reason": "清单中没有哈希"}
+        else:
+            try:
+                with opener() as f:
+                    actual = _hash_stream(f)
+                res = {"name": name, "ok": actual == expect, "reason": "" if actual == expect else "哈希不一致"}
+            except FileNotFoundError:
+                res = {"name": name, "ok": False, "reason": "文件缺失"}
+            except Exception as e:
+                res = {"name": name, "ok": False, "reason": str(e)}
+        if progress:
+            progress(res["name"], res["ok"], res["reason"])
+        return res
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = zf.namelist()
+            manifest_name = next((n for n in names if n.endswith(MANIFEST_NAME)), None)
+            if not manifest_name:
+                raise RuntimeError("压缩包中没有 backup_manifest.json")
+            prefix = manifest_name[: -len(MANIFEST_NAME)]
+            manifest = json.loads(zf.read(manifest_name).decode("utf-8"))
+            for e in manifest.get("partitions", []):
+                member = prefix + e["file"]
+                if member not in names:
+                    res = {"name": e["name"], "ok": False, "reason": "文件缺失"}
+                    if progress:
+                        progress(res["name"], False, res["reason"])
+                    results.append(res)
+                    continue
+                results.append(_check(e["name"], e.get("file_sha256", ""), lambda m=member: zf.open(m)))
+        return results
+
+    manifest = load_manifest(path)
+    entries = manifest.get("partitions", [])
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(
+                _check, e["name"], e.get("file_sha256", ""),
+                lambda fp=os.path.join(path, e["file"]): open(fp, "rb"),
+            )
+            for e in entries
+        ]
+        for fut in futures:
+            results.append(fut.result())
+    return results
+
+
+# -------- 恢复 --------
+class _HashingReader:
+    """读取时顺带计算存储文件的 SHA-256，供解压后与清单中的 file_sha256 比对"""
+
+    def __init__(self, f):
+        self._f = f
+        self.hash = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        self.hash.update(data)
+        return data
+
+    def drain(self):
+        while self.read(HASH_CHUNK):
+            pass
+
+
+def _decompress_zstd(src, dest_path: str):
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+    if zstandard is not None:
+        with open(dest_path, "wb") as out:
+            reader = zstandard.ZstdDecompressor().stream_reader(src, read_across_frames=True)
+            shutil.copyfileobj(reader, out, READ_CHUNK)
+        return
+    proc = subprocess.Popen(
+        [zstd_binary(), "-d", "-q", "-f", "-o", dest_path, "-"],
+        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        **_silent_kwargs()
+    )
+    try:
+        shutil.copyfileobj(src, proc.stdin, READ_CHUNK)
+    except BrokenPipeError:
+        pass
+    finally:
+        try:
+            proc.stdin.close()
+        except Exception:
+            pass
+    if proc.wait() != 0:
+        err = proc.stderr.read().decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"zstd 解压失败: {err}")
+
+
+class BackupSource:
+    """恢复用的备份来源：备份目录、ZIP 或增量快照清单（TobaSnapshots/*/snapshots/*.json）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.kind = ""
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._prefix = ""
+        self._store = None
+        if os.path.isdir(path):
+            self.kind = "dir"
+            self.manifest = load_manifest(path)
+        elif os.path.basename(path) == MANIFEST_NAME:
+            self.kind = "dir"
+            self.path = os.path.dirname(path)
+            self.manifest = load_manifest(self.path)
+        elif zipfile.is_zipfile(path):
+            self.kind = "zip"
+            self._zip = zipfile.ZipFile(path)
+            manifest_name = next((n for n in self._zip.namelist() if n.endswith(MANIFEST_NAME)), None)
+            if not manifest_name:
+                self._zip.close()
+                raise RuntimeError("压缩包中没有 backup_manifest.json")
+            self._prefix = manifest_name[: -len(MANIFEST_NAME)]
+            self.manifest = json.loads(self._zip.read(manifest_name).decode("utf-8"))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if "chunk_size" not in data:
+                raise RuntimeError("无法识别的备份文件")
+            self.kind = "snapshot"
+            self._store = Path(path).resolve().parent.parent
+            self.manifest = data
+        self.entries = self._entries()
+
+    def _entries(self) -> List[dict]:
+        if self.kind == "snapshot":
+            return [
+                {"name": name, "size": p["size"], "format": "snapshot"}
+                for name, p in self.manifest.get("partitions", {}).items()
+            ]
+        return list(self.manifest.get("partitions", []))
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+    def prepare(self, entry: dict, work_dir: str, verify: bool = True):
+        """得到可直接 fastboot flash 的镜像，返回 (路径, 是否为临时文件)。
+
+        目录中的 raw / sparse 备份直接使用原文件；其余解压到 work_dir。
+        verify 为 True 时按清单中的 file_sha256 校验存储文件，不一致抛出 RuntimeError。
+        """
+        name = entry["name"]
+        dest = os.path.join(work_dir, f"{name}.img")
+        if self.kind == "snapshot":
+            from app.services import snapshot_service
+            snapshot_service.export_partition(self._store, self.manifest, name, dest)
+            return dest, True
+
+        fmt = entry.get("format", FORMAT_RAW)
+        expect = entry.get("file_sha256", "") if verify else ""
+        if self.kind == "dir" and fmt in (FORMAT_RAW, FORMAT_SPARSE):
+            src = os.path.join(self.path, entry["file"])
+            if expect and file_sha256(src) != expect:
+                raise RuntimeError(f"{name}: 备份文件哈希不一致")
+            return src, False
+
+        if self.kind == "zip":
+            opener = lambda: self._zip.open(self._prefix + entry["file"])
+        else:
+            opener = lambda: open(os.path.join(self.path, entry["file"]), "rb")
+        try:
+            with opener() as raw:
+                src = _HashingReader(raw)
+                if fmt == FORMAT_GZIP:
+                    with gzip.GzipFile(fileobj=src, mode="rb") as g, open(dest, "wb") as out:
+                        shutil.copyfileobj(g, out, READ_CHUNK)
+                elif fmt == FORMAT_ZSTD:
+                    _decompress_zstd(src, dest)
+                else:
+                    with open(dest, "wb") as out:
+                        shutil.copyfileobj(src, out, READ_CHUNK)
+                src.drain()
+            if expect and src.hash.hexdigest() != expect:
+                raise RuntimeError(f"{name}: 备份文件哈希不一致")
+        except Exception:
+            try:
+                os.remove(dest)
+            except OSError:
+                pass
+            raise
+        return dest, True
+
+
+def device_partition_hashes(adb_path: str, serial: str, by_name: str, names: List[str], timeout: int = 3600) -> dict:
+    """在设备端一次 su 调用计算若干分区的 SHA-256，返回 {分区名: 哈希}；失败的分区不在结果中"""
+    if not names:
+        return {}
+    script = f"cd {by_name} && for p in {' '.join(names)}; do echo \"$p $(sha256sum $p 2>/dev/null)\"; done"
+    out = subprocess.run(
+        [adb_path, "-s", serial, "shell", f"su -c '{script}'"],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout, **_silent_kwargs()
+    ).stdout.decode("utf-8", errors="ignore")
+    hashes = {}
+    for line in out.splitlines():
+        parts = line.split()
+        if len(parts) >= 2 and len(parts[1]) == 64:
+            hashes[parts[0]] = parts[1].lower()
+    return hashes
+
+
+# -------- 刷机脚本 --------
+def _bat_gunzip(src: str, dst: str) -> str:
+    return (
+        "powershell -NoProfile -Command \""
+        f"$i=[IO.File]::OpenRead('{src}');$o=[IO.File]::Create('{dst}');"
+        "$g=New-Object IO.Compression.GZipStream($i,[IO.Compression.CompressionMode]::Decompress);"
+        "$g.CopyTo($o);$g.Close();$o.Close()\"\n"
+    )
+
+
+def write_flash_scripts(backup_dir: str, entries: List[dict]):
+    """按备份索引生成 flash_all.bat / flash_all.sh。
+
+    raw 与 sparse 镜像由 fastboot 直接刷入；gzip / zstd 先解压为临时 .img，刷完删除。
+    用到 zstd 时把 zstd.exe 一并复制到备份目录。
+    """
+    if any(e.get("format") == FORMAT_ZSTD for e in entries):
+        exe = BIN_DIR / "zstd.exe"
+        if exe.exists():
+            shutil.copy2(exe, os.path.join(backup_dir, "zstd.exe"))
+
+    bat_path = os.path.join(backup_dir, "flash_all.bat")
+    with open(bat_path, "w", encoding="utf-8") as f:
+        f.write("@echo off\n")
+        f.write("echo Waiting for device in fastboot...\n")
+        f.write("fastboot devices\n")
+        f.write("pause\n")
+        for e in entries:
+            part, name, fmt = e["name"], e["file"], e.get("format", FORMAT_RAW)
+            f.write(f"echo Flashing {part}...\n")
+            if fmt in (FORMAT_GZIP, FORMAT_ZSTD):
+                tmp = f"{part}.tmp.img"
+                if fmt == FORMAT_GZIP:
+                    f.write(_bat_gunzip(name, tmp))
+                else:
+                    f.write(f"zstd.exe -d -q -f {name} -o {tmp}\n")
+                f.write(f"fastboot flash {part} {tmp}\n")
+                f.write(f"del /q {tmp}\n")
+            else:
+                f.write(f"fastboot flash {part} {name}\n")
+        f.write("echo Done!\n")
+        f.write("pause\n")
+
+    sh_path = os.path.join(backup_dir, "flash_all.sh")
+    with open(sh_path, "w", encoding="utf-8") as f:
+        f.write("#!/bin/bash\n")
+        f.write("echo 'Waiting for device...'\n")
+        f.write("fastboot devices\n")
+        for e in entries:
+            part, name, fmt = e["name"], e["file"], e.get("format", FORMAT_RAW)
+            f.write(f"echo 'Flashing {part}...'\n")
+            if fmt in (FORMAT_GZIP, FORMAT_ZSTD):
+                tmp = f"{part}.tmp.img"
+                if fmt == FORMAT_GZIP:
+                    f.write(f"gzip -dc {name} > {tmp} && fastboot flash {part} {tmp}\n")
+                else:
+                    f.write(f"zstd -d -q -f {name} -o {tmp} && fastboot flash {part} {tmp}\n")
+                f.write(f"rm -f {tmp}\n")
+            else:
+                f.write(f"fastboot flash {part} {name}\n")
+        f.write("echo 'Done!'\n")
@@ -0,0 +1,439 @@
+"""
+电脑与设备之间的文件夹同步
+按 大小 + 修改时间（可选 SHA-256）比较两侧文件，生成最小传输计划，交给并发传输队列执行。
+每次同步后把两侧一致的文件状态保存为索引：下次同步据此区分"哪一侧改了"、"哪一侧删了"，
+只传输变化的部分，哈希也只对变化过的文件重新计算。
+读不了的子目录视为"未知"而非"已删除"：其中的文件既不传输也不删除。
+"""
+import hashlib
+import json
+import os
+import posixpath
+import shlex
+import stat as stat_mod
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services import adb_service
+from app.services.adb_service import CACHE_DIR
+from app.services.adb_sync import SyncConnection, SyncError, current_serial, join_remote, remote_tree
+from app.services.transfer_queue import DEFAULT_CONCURRENCY, TransferItem, TransferQueue
+
+
+SYNC_INDEX_DIR = CACHE_DIR / "folder_sync"
+MTIME_TOLERANCE = 2  # 秒；FAT/exFAT 存储卡的时间精度为 2 秒
+HASH_BATCH = 64  # 设备端每次 sha256sum 的文件数，避免命令行过长
+
+# 同步方向
+PUSH = "push"  # 电脑 → 设备
+PULL = "pull"  # 设备 → 电脑
+BOTH = "both"  # 双向
+
+# 计划中的操作
+OP_PUSH = "push"
+OP_PULL = "pull"
+OP_DELETE_LOCAL = "delete_local"
+OP_DELETE_REMOTE = "delete_remote"
+
+
+class SyncAction:
+    __slots__ = ("op", "rel", "size", "reason")
+
+    def __init__(self, op: str, rel: str, size: int = 0, reason: str = ""):
+        self.op = op
+        self.rel = rel
+        self.size = size
+        self.reason = reason
+
+
+class SyncPlan:
+    def __init__(self):
+        self.actions: List[SyncAction] = []
+        self.conflicts: List[str] = []  # 两侧都改过，按修改时间较新的一侧处理
+        self.unchanged = 0
+        self.skipped = 0  # 位于读不了的目录中、本次不处理的文件
+        self.unreadable_local: List[str] = []  # 读不了的目录（相对路径）
+        self.unreadable_remote: List[str] = []
+        self.local: Dict[str, Tuple[int, int]] = {}
+        self.remote: Dict[str, Tuple[int, int]] = {}
+        self.hashes: Dict[str, str] = {}
+
+    def count(self, op: str) -> int:
+        return sum(1 for a in self.actions if a.op == op)
+
+    @property
+    def deletes(self) -> List[SyncAction]:
+        return [a for a in self.actions if a.op in (OP_DELETE_LOCAL, OP_DELETE_REMOTE)]
+
+    def is_unknown(self, rel: str) -> bool:
+        """rel 位于某一侧读不了的目录中"""
+        return _under(rel, self.unreadable_local) or _under(rel, self.unreadable_remote)
+
+    @property
+    def transfer_bytes(self) -> int:
+        return sum(a.size for a in self.actions if a.op in (OP_PUSH, OP_PULL))
+
+    def summary(self) -> str:
+        parts = [
+            f"推送 {self.count(OP_PUSH)}",
+            f"拉取 {self.count(OP_PULL)}",
+        ]
+        deletes = self.count(OP_DELETE_LOCAL) + self.count(OP_DELETE_REMOTE)
+        if deletes:
+            parts.append(f"删除 {deletes}")
+        parts.append(f"未变化 {self.unchanged}")
+        if self.conflicts:
+            parts.append(f"冲突 {len(self.conflicts)}")
+        if self.skipped:
+            parts.append(f"无法读取而跳过 {self.skipped}")
+        return "，".join(parts)
+
+
+def _under(rel: str, dirs: List[str]) -> bool:
+    return any(d == "" or rel == d or rel.startswith(d + "/") for d in dirs)
+
+
+def _index_path(serial: str, local_root: str, remote_root: str):
+    key = f"{serial}|{os.path.abspath(local_root)}|{remote_root.rstrip('/')}"
+    return SYNC_INDEX_DIR / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.json"
+
+
+def load_index(serial: str, local_root: str, remote_root: str) -> Dict[str, dict]:
+    """上次同步后两侧一致的文件 {相对路径: {size, mtime, rmtime, sha256?}}，mtime / rmtime 分别为电脑端与设备端时间"""
+    try:
+        data = json.loads(_index_path(serial, local_root, remote_root).read_text(encoding="utf-8"))
+        return data.get("files", {})
+    except Exception:
+        return {}
+
+
+def save_index(serial: str, local_root: str, remote_root: str, files: Dict[str, dict]):
+    try:
+        SYNC_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        data = {
+            "serial": serial,
+            "local": os.path.abspath(local_root),
+            "remote": remote_root,
+            "files": files,
+        }
+        path = _index_path(serial, local_root, remote_root)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+    except Exception:
+        pass
+
+
+def _same(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    return a[0] == b[0] and abs(a[1] - b[1]) <= MTIME_TOLERANCE
+
+
+def _scan_local(root: str, unreadable: List[str]) -> Dict[str, Tuple[int, int]]:
+    """列出电脑端文件；读不了的子目录记入 unreadable（根目录不存在由调用方判断）"""
+    files: Dict[str, Tuple[int, int]] = {}
+    if not os.path.isdir(root):
+        return files
+
+    def _onerror(err: OSError):
+        rel = os.path.relpath(err.filename or root, root)
+        unreadable.append("" if rel == "." else rel.replace(os.sep, "/"))
+
+    for dirpath, _, filenames in os.walk(root, onerror=_onerror):
+        rel_dir = os.path.relpath(dirpath, root)
+        for fn in filenames:
+            if fn.endswith(".part"):  # 未完成的拉取
+                continue
+            path = os.path.join(dirpath, fn)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if not stat_mod.S_ISREG(st.st_mode):
+                continue
+            rel = fn if rel_dir == "." else posixpath.join(rel_dir.replace(os.sep, "/"), fn)
+            files[rel] = (st.st_size, int(st.st_mtime))
+    return files
+
+
+def _scan_remote(conn: SyncConnection, root: str, unreadable: List[str]) -> Dict[str, Tuple[int, int]]:
+    """列出设备端文件；读不了的子目录记入 unreadable，不当作空目录"""
+    if not conn.stat(root).is_dir:
+        return {}
+    files, _ = remote_tree(conn, root, unreadable)
+    return {rel: (e.size, e.mtime) for rel, e in files}
+
+
+def _local_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _adb_args(serial: str) -> list:
+    return ["-s", serial] if serial else []
+
+
+def _remote_sha256(serial: str, root: str, rels: List[str]) -> Dict[str, str]:
+    """在设备端批量计算 sha256，返回 {相对路径: 哈希}；算不出的文件不出现在结果中"""
+    result: Dict[str, str] = {}
+    for i in range(0, len(rels), HASH_BATCH):
+        batch = rels[i:i + HASH_BATCH]
+        script = f"cd {shlex.quote(root)} && sha256sum -- " + " ".join(shlex.quote(r) for r in batch)
+        _, out = adb_service.run_adb(_adb_args(serial) + ["shell", script], timeout=300)
+        for line in out.splitlines():
+            digest, _, name = line.partition("  ")
+            if len(digest) == 64 and name:
+                result[name.strip()] = digest.lower()
+    return result
+
+
+def _remote_delete(serial: str, paths: List[str]) -> Tuple[bool, str]:
+    for i in range(0, len(paths), HASH_BATCH):
+        script = "rm -f -- " + " ".join(shlex.quote(p) for p in paths[i:i + HASH_BATCH])
+        rc, out = adb_service.run_adb(_adb_args(serial) + ["shell", script], timeout=60)
+        if rc != 0:
+            return False, out
+    return True, ""
+
+
+class FolderSync:
+    """一对 电脑目录 / 设备目录 的同步；scan() 生成计划，execute() 执行，可从其他线程 cancel()"""
+
+    def __init__(
+        self,
+        local_root: str,
+        remote_root: str,
+        serial: str = "",
+        direction: str = BOTH,
+        delete: bool = False,
+        use_hash: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        progress: Optional[Callable[[dict], None]] = None,
+        log_callback: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        :param local_root: 电脑端目录
+        :param remote_root: 设备端目录
+        :param serial: 设备序列号，空字符串表示唯一连接的设备
+        :param direction: push / pull / both
+        :param delete: 传播删除：单向时删除目标侧多余的文件，双向时删除对侧已删的文件
+        :param use_hash: 大小相同但修改时间不同时用 SHA-256 判断内容是否真的变了
+        :param concurrency: 并发传输流数
+        :param progress: 传输进度回调，字段与 transfer_queue 相同
+        :param log_callback: 日志回调函数
+        """
+        self.local_root = os.path.abspath(local_root)
+        self.remote_root = remote_root.rstrip("/") or "/"
+        # 索引按序列号区分设备，未指定时取当前唯一连接的设备
+        self.serial = serial or current_serial()
+        self.direction = direction
+        self.delete = delete
+        self.use_hash = use_hash
+        self.concurrency = concurrency
+        self._progress = progress
+        self._log = log_callback or (lambda _msg: None)
+        self._queue: Optional[TransferQueue] = None
+        self._stopped = False
+
+    def cancel(self):
+        self._stopped = True
+        if self._queue is not None:
+            self._queue.cancel()
+
+    def _check_stop(self):
+        if self._stopped:
+            raise InterruptedError("已取消")
+
+    # ---------- 比较 ----------
+    def _content_equal(self, plan: SyncPlan, index: Dict[str, dict], rels: List[str]) -> set:
+        """对大小相同、时间不同的文件比较哈希，返回内容一致的相对路径"""
+        if not self.use_hash or not rels:
+            return set()
+        self._log(f"计算 {len(rels)} 个文件的哈希...")
+        local_hash: Dict[str, str] = {}
+        for rel in rels:
+            self._check_stop()
+            cached = index.get(rel)
+            # 本地文件与索引记录一致时直接沿用上次的哈希
+            if cached and cached.get("sha256") and _same(plan.local[rel], (cached["size"], cached["mtime"])):
+                local_hash[rel] = cached["sha256"]
+                continue
+            try:
+                local_hash[rel] = _local_sha256(os.path.join(self.local_root, *rel.split("/")))
+            except OSError:
+                pass
+        remote_hash = _remote_sha256(self.serial, self.remote_root, rels)
+        equal = {rel for rel in rels if local_hash.get(rel) and local_hash[rel] == remote_hash.get(rel)}
+        for rel in equal:
+            plan.hashes[rel] = local_hash[rel]
+        return equal
+
+    def _check_roots(self, plan: SyncPlan, index: Dict[str, dict]):
+        """任一侧根目录读不了，或上次同步有文件而这次为空/不存在（选错目录、存储卡未挂载）时中止"""
+        if "" in plan.unreadable_local:
+            raise RuntimeError(f"无法读取电脑端目录: {self.local_root}")
+        if "" in plan.unreadable_remote:
+            raise RuntimeError(f"无法读取设备端目录: {self.remote_root}")
+        if not index:
+            return
+        for side, files, root in (("电脑端", plan.local, self.local_root), ("设备端", plan.remote, self.remote_root)):
+            if not files:
+                raise RuntimeError(
+                    f"{side}目录 {root} 为空或不存在，但上次同步时有 {len(index)} 个文件；"
+                    f"为避免误删已停止同步，请确认目录是否正确、存储是否已挂载"
+                )
+
+    def scan(self) -> SyncPlan:
+        plan = SyncPlan()
+        self._stopped = False
+        plan.local = _scan_local(self.local_root, plan.unreadable_local)
+        with SyncConnection(self.serial) as conn:
+            try:
+                plan.remote = _scan_remote(conn, self.remote_root, plan.unreadable_remote)
+            except SyncError as e:
+                raise RuntimeError(f"无法读取设备端目录: {e}")
+        self._check_stop()
+        index = load_index(self.serial, self.local_root, self.remote_root)
+        self._check_roots(plan, index)
+        for side, dirs in (("电脑端", plan.unreadable_local), ("设备端", plan.unreadable_remote)):
+            if dirs:
+                self._log(f"{side} {len(dirs)} 个目录无法读取，其中的文件本次跳过: {', '.join(dirs[:3])}")
+
+        pending: List[Tuple[str, str, str]] = []  # (rel, 默认操作, 原因)，待哈希确认
+        for rel in sorted(set(plan.local) | set(plan.remote) | set(index)):
+            l, r = plan.local.get(rel), plan.remote.get(rel)
+            known = index.get(rel)
+            base_l = (known["size"], known["mtime"]) if known else None
+            base_r = (known["size"], known.get("rmtime", known["mtime"])) if known else None
+            if l is None and r is None:
+                continue
+            if (l is None or r is None) and plan.is_unknown(rel):
+                # 缺失的一侧读不了：不知道是否被删，不传输也不删除
+                plan.skipped += 1
+                continue
+            if l is not None and r is not None:
+                l_changed = base_l is None or not _same(l, base_l)
+                r_changed = base_r is None or not _same(r, base_r)
+                if _same(l, r) or not (l_changed or r_changed):
+                    plan.unchanged += 1
+                    continue
+                if self.direction == PUSH or (self.direction == BOTH and l_changed and not r_changed):
+                    op = OP_PUSH
+                elif self.direction == PULL or (self.direction == BOTH and r_changed and not l_changed):
+                    op = OP_PULL
+                else:
+                    # 双向且两侧都变了（或首次同步）：较新的一侧为准
+                    op = OP_PUSH if l[1] >= r[1] else OP_PULL
+                    if known:
+                        plan.conflicts.append(rel)
+                if l[0] == r[0]:
+                    pending.append((rel, op, "修改时间不同"))
+                else:
+                    plan.actions.append(SyncAction(op, rel, l[0] if op == OP_PUSH else r[0], "内容已变化"))
+                continue
+            if l is not None:  # 只有电脑端有
+                if self.direction == PULL:
+                    if self.delete:
+                        plan.actions.append(SyncAction(OP_DELETE_LOCAL, rel, reason="设备端不存在"))
+                elif self.direction == BOTH and known and self.delete and _same(l, base_l):
+                    plan.actions.append(SyncAction(OP_DELETE_LOCAL, rel, reason="设备端已删除"))
+                else:
+                    plan.actions.append(SyncAction(OP_PUSH, rel, l[0], "设备端不存在"))
+                continue
+            # 只有设备端有
+            if self.direction == PUSH:
+                if self.delete:
+                    plan.actions.append(SyncAction(OP_DELETE_REMOTE, rel, reason="电脑端不存在"))
+            elif self.direction == BOTH and known and self.delete and _same(r, base_r):
+                plan.actions.append(SyncAction(OP_DELETE_REMOTE, rel, reason="电脑端已删除"))
+            else:
+                plan.actions.append(SyncAction(OP_PULL, rel, r[0], "电脑端不存在"))
+
+        equal = self._content_equal(plan, index, [rel for rel, _, _ in pending])
+        for rel, op, reason in pending:
+            if rel in equal:
+                plan.unchanged += 1
+                if rel in plan.conflicts:
+                    plan.conflicts.remove(rel)
+                continue
+            plan.actions.append(SyncAction(op, rel, plan.local[rel][0], reason))
+        return plan
+
+    # ---------- 执行 ----------
+    def _local_path(self, rel: str) -> str:
+        return os.path.join(self.local_root, *rel.split("/"))
+
+    def _remote_path(self, rel: str) -> str:
+        return join_remote(self.remote_root, rel)
+
+    def execute(self, plan: SyncPlan) -> List[TransferItem]:
+        """按计划删除与传输，返回失败的条目；成功部分写入索引。取消时抛出 InterruptedError"""
+        self._stopped = False
+        index = load_index(self.serial, self.local_root, self.remote_root)
+        # 新索引：两侧一致的文件；失败的文件不记录，下次重新比较
+        files: Dict[str, dict] = {}
+        for rel, l in plan.local.items():
+            r = plan.remote.get(rel)
+            known = index.get(rel)
+            if r is None:
+                continue
+            if _same(l, r) or rel in plan.hashes:
+                files[rel] = {"size": l[0], "mtime": l[1], "rmtime": r[1]}
+                if rel in plan.hashes:
+                    files[rel]["sha256"] = plan.hashes[rel]
+            elif known and _same(l, (known["size"], known["mtime"])) \
+                    and _same(r, (known["size"], known.get("rmtime", known["mtime"]))):
+                files[rel] = known
+        # 读不了的目录中的文件沿用旧记录，下次能读到时照常比较
+        for rel, known in index.items():
+            if rel not in files and plan.is_unknown(rel):
+                files[rel] = known
+        touched = {a.rel for a in plan.actions}
+        for rel in touched:
+            files.pop(rel, None)
+
+        local_deletes = [a.rel for a in plan.actions if a.op == OP_DELETE_LOCAL]
+        for rel in local_deletes:
+            try:
+                os.remove(self._local_path(rel))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self._log(f"删除本地文件失败: {rel}: {e}")
+        remote_deletes = [a.rel for a in plan.actions if a.op == OP_DELETE_REMOTE]
+        if remote_deletes:
+            ok, err = _remote_delete(self.serial, [self._remote_path(rel) for rel in remote_deletes])
+            if not ok:
+                self._log(f"删除设备端文件失败: {err}")
+        self._check_stop()
+
+        transfers = [a for a in plan.actions if a.op in (OP_PUSH, OP_PULL)]
+        if not transfers:
+            save_index(self.serial, self.local_root, self.remote_root, files)
+            return []
+
+        self._queue = TransferQueue(self.serial, concurrency=self.concurrency, progress=self._progress)
+        by_src: Dict[str, SyncAction] = {}
+        for a in transfers:
+            if a.op == OP_PUSH:
+                src = self._local_path(a.rel)
+                self._queue.add_push(src, posixpath.dirname(self._remote_path(a.rel)) or "/")
+            else:
+                src = self._remote_path(a.rel)
+                self._queue.add_pull(src, self._local_path(a.rel))
+            by_src[src] = a
+        try:
+            failed = self._queue.run()
+        finally:
+            # 推送时设备端文件时间取自电脑端，拉取时电脑端文件时间取自设备端，成功后两侧一致
+            for item in self._queue.items:
+                a = by_src.get(item.src)
+                if a is None or item.status != "done":
+                    continue
+                side = plan.local if a.op == OP_PUSH else plan.remote
+                size, mtime = side[a.rel]
+                files[a.rel] = {"size": size, "mtime": mtime, "rmtime": mtime}
+            save_index(self.serial, self.local_root, self.remote_root, files)
+            self._queue = None
+        return failed
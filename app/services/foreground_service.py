@@ -0,0 +1,205 @@
+"""
+前台应用跟踪
+常驻一个 adb shell logcat -b events 会话，只订阅 Activity 切换相关的事件（am_focused_activity、
+wm_set_resumed_activity、wm_on_resume_called 等），前台变化时立即回调，期间设备与主机都不做轮询。
+首次启动、事件中不含组件名或日志流不可用时，用一次在设备端过滤过的 dumpsys window 查询焦点。
+"""
+import re
+import subprocess
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from app.services import adb_service
+from app.services.adb_service import _silent_kwargs
+
+
+RETRY_DELAY = 3  # 日志流断开后重连的间隔（秒）
+POLL_INTERVAL = 3  # 日志流不可用时退回查询的间隔（秒）
+QUICK_EXIT = 2  # 日志流在此时间内退出视为启动失败
+MAX_QUICK_EXITS = 3  # 连续启动失败次数达到后改为查询
+
+# 事件内容中直接带有 "包名/Activity" 的标签（不同系统版本各有其一）
+_COMPONENT_TAGS = (
+    "am_focused_activity",
+    "am_set_resumed_activity",
+    "wm_set_resumed_activity",
+)
+# 只带 Activity 类名的标签：收到后查询一次焦点
+_TRIGGER_TAGS = (
+    "am_on_resume_called",
+    "wm_on_resume_called",
+    "wm_on_top_resumed_gained_called",
+)
+
+_FOCUS_SCRIPT = (
+    "out=$(dumpsys window 2>/dev/null | grep -E 'mFocusedApp=|mCurrentFocus='); "
+    "if [ -n \"$out\" ]; then echo \"$out\"; "
+    "else dumpsys activity activities 2>/dev/null | grep -E 'mResumedActivity|ResumedActivity:'; fi"
+)
+
+_COMPONENT_RE = re.compile(r"([A-Za-z][\w.]*)/(\.?[A-Za-z_$][\w.$]*)")
+_EVENT_RE = re.compile(r"^[VDIWEF]/(\w+)\s*\(\s*\d+\):\s*(.*)$")
+
+
+def normalize_component(pkg: str, cls: str) -> Tuple[str, str]:
+    """把 com.foo/.Main 补全为 com.foo/com.foo.Main，返回 (包名, 包名/类名)"""
+    if cls.startswith("."):
+        cls = pkg + cls
+    return pkg, f"{pkg}/{cls}"
+
+
+def parse_focus(text: str) -> Tuple[str, str]:
+    """
+    从 dumpsys window / activity 过滤后的输出中取前台 (包名, Activity)，取不到返回空字符串
+    优先 mFocusedApp 与 ResumedActivity，其次 mCurrentFocus（可能是状态栏等非 Activity 窗口）
+    """
+    best: Tuple[int, str, str] = (99, "", "")
+    for line in text.splitlines():
+        s = line.strip()
+        if "mFocusedApp=" in s or "ResumedActivity" in s:
+            rank = 0
+        elif "mCurrentFocus=" in s:
+            rank = 1
+        else:
+            continue
+        m = _COMPONENT_RE.search(s.split("=", 1)[-1] if "=" in s else s)
+        if m and rank < best[0]:
+            best = (rank,) + normalize_component(m.group(1), m.group(2))
+    return best[1], best[2]
+
+
+def parse_event_line(line: str) -> Optional[Tuple[str, str]]:
+    """
+    解析 logcat -v brief 的一行事件，例如
+    I/wm_set_resumed_activity( 1234): [0,com.foo/.Main,resumeTopActivity]
+    返回 (标签, 组件或类名)；不是关心的事件返回 None
+    """
+    m = _EVENT_RE.match(line.strip())
+    if not m or m.group(1) not in _COMPONENT_TAGS + _TRIGGER_TAGS:
+        return None
+    fields = [f.strip() for f in m.group(2).strip().strip("[]").split(",")]
+    if m.group(1) in _COMPONENT_TAGS:
+        for f in fields:
+            if _COMPONENT_RE.fullmatch(f):
+                return m.group(1), f
+        return None
+    # 类名字段：含 '.' 的非数字项
+    for f in fields:
+        if "." in f and not f.replace(".", "").isdigit():
+            return m.group(1), f
+    return m.group(1), ""
+
+
+def query_focus(serial: str, timeout: int = 5) -> Tuple[str, str]:
+    """查询一次前台 (包名, Activity)；过滤在设备端完成，只传回几行"""
+    rc, out = adb_service.run_adb(["-s", serial, "shell", _FOCUS_SCRIPT], timeout=timeout)
+    if rc != 0 and not out:
+        return "", ""
+    return parse_focus(out)
+
+
+class FocusWatcher:
+    """run() 阻塞直到 cancel() 或设备断开，前台变化时回调"""
+
+    def __init__(
+        self,
+        serial: str,
+        callback: Callable[[str, str], None],
+        log_callback: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        :param serial: 设备序列号
+        :param callback: 前台变化回调 (包名, Activity)，在后台线程调用
+        :param log_callback: 日志回调
+        """
+        self.serial = serial
+        self._callback = callback
+        self.log = log_callback or (lambda msg: None)
+        self._stop = threading.Event()
+        self._proc: Optional[subprocess.Popen] = None
+        self._current: Tuple[str, str] = ("", "")
+
+    def cancel(self):
+        self._stop.set()
+        proc = self._proc
+        if proc is not None:
+            try:
+                proc.terminate()
+            except Exception:
+                pass
+
+    def _update(self, pkg: str, act: str):
+        if not pkg or (pkg, act) == self._current:
+            return
+        self._current = (pkg, act)
+        self._callback(pkg, act)
+
+    def _refresh(self):
+        self._update(*query_focus(self.serial))
+
+    def _stream(self):
+        tags = [f"{t}:I" for t in _COMPONENT_TAGS + _TRIGGER_TAGS]
+        cmd = [adb_service._adb_bin(), "-s", self.serial, "shell",
+               "logcat", "-b", "events", "-v", "brief", "-T", "1", "-s"] + tags
+        self._proc = subprocess.Popen(
+            cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL,
+            text=True, encoding="utf-8", errors="replace", **_silent_kwargs(),
+        )
+        try:
+            if self._stop.is_set():
+                return
+            for line in iter(self._proc.stdout.readline, ""):
+                if self._stop.is_set():
+                    break
+                event = parse_event_line(line)
+                if event is None:
+                    continue
+                tag, value = event
+                if tag in _COMPONENT_TAGS:
+                    self._update(*normalize_component(*value.split("/", 1)))
+                elif not value or not self._current[1].endswith("/" + value):
+                    # 事件只给出类名且与当前不同：查询一次确认包名
+                    self._refresh()
+        finally:
+            try:
+                self._proc.terminate()
+                self._proc.wait(timeout=2)
+            except Exception:
+                pass
+            self._proc = None
+
+    def _device_online(self) -> bool:
+        try:
+            return self.serial in adb_service.list_devices()
+        except Exception:
+            return False
+
+    def run(self):
+        quick_exits = 0
+        while not self._stop.is_set():
+            self._refresh()
+            if quick_exits >= MAX_QUICK_EXITS:
+                # 设备不提供事件日志：退回低频查询，仍只在变化时回调
+                self._stop.wait(POLL_INTERVAL)
+                if not self._stop.is_set() and not self._device_online():
+                    return
+                continue
+            started = time.monotonic()
+            try:
+                self._stream()
+            except OSError as e:
+                self.log(f"无法启动事件日志: {e}")
+                quick_exits = MAX_QUICK_EXITS
+                continue
+            if self._stop.is_set():
+                return
+            if not self._device_online():
+                return
+            if time.monotonic() - started < QUICK_EXIT:
+                quick_exits += 1
+                if quick_exits >= MAX_QUICK_EXITS:
+                    self.log("设备不支持事件日志，改为定时查询前台应用")
+            else:
+                quick_exits = 0
+            self._stop.wait(RETRY_DELAY)
@@ -0,0 +1,120 @@
+"""
+远端目录列表缓存
+按 设备序列号 + 路径 缓存 list_dir 结果（短 TTL），本程序自身的写操作（推送、删除、重命名、移动）
+主动失效对应目录；另有后台线程预取当前目录下的子目录，使进入/返回目录时直接命中缓存。
+"""
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services import adb_service, adb_sync
+
+
+DEFAULT_TTL = 20.0  # 秒；设备上其他程序产生的变化最多延迟这么久才可见
+PREFETCH_LIMIT = 32  # 每次最多预取的子目录数
+MAX_ENTRIES = 512
+
+_cache: Dict[Tuple[str, str], Tuple[float, list]] = {}
+_lock = threading.Lock()
+_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="list-prefetch")
+_generation = 0
+
+
+def _norm(path: str) -> str:
+    p = posixpath.normpath(path or "/")
+    return "/" if p in (".", "//") else p
+
+
+def get(path: str, serial: str, max_age: float = DEFAULT_TTL) -> Optional[list]:
+    key = (serial, _norm(path))
+    with _lock:
+        hit = _cache.get(key)
+    if hit and time.monotonic() - hit[0] <= max_age:
+        return hit[1]
+    return None
+
+
+def put(path: str, serial: str, items: list):
+    with _lock:
+        _cache[(serial, _norm(path))] = (time.monotonic(), items)
+        if len(_cache) > MAX_ENTRIES:
+            # 淘汰最旧的一半
+            for key, _ in sorted(_cache.items(), key=lambda kv: kv[1][0])[: len(_cache) // 2]:
+                _cache.pop(key, None)
+
+
+def invalidate(paths: Iterable[str], serial: Optional[str] = None, recursive: bool = False):
+    """失效给定路径及其父目录；recursive 时连同所有子路径（用于删除/移动目录）。
+
+    serial 为 None 时对所有设备生效。
+    """
+    targets = set()
+    for p in paths:
+        if not p:
+            continue
+        p = _norm(p)
+        targets.add(p)
+        targets.add(_norm(posixpath.dirname(p)))
+    with _lock:
+        for key in list(_cache):
+            s, p = key
+            if serial is not None and s != serial:
+                continue
+            if p in targets or (recursive and any(p.startswith(t.rstrip("/") + "/") for t in targets)):
+                _cache.pop(key, None)
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def list_dir(path: str, use_cache: bool = True) -> Tuple[List[dict], str]:
+    """带缓存的 adb_service.list_dir；返回 (items, err)，出错的结果不缓存"""
+    serial = adb_sync.current_serial()
+    if use_cache:
+        items = get(path, serial)
+        if items is not None:
+            return items, ""
+    items, err = adb_service.list_dir(path)
+    if not err:
+        put(path, serial, items)
+    return items, err
+
+
+def prefetch(parent: str, items: list):
+    """后台预取 parent 下的子目录；新一次预取开始后旧任务自动放弃"""
+    global _generation
+    children = [
+        posixpath.join(_norm(parent), it["name"])
+        for it in items if (it.get("type") or "").lower() == "dir"
+    ][:PREFETCH_LIMIT]
+    with _lock:
+        _generation += 1
+        gen = _generation
+    if not children:
+        return
+    _prefetch_pool.submit(_prefetch_run, children, gen)
+
+
+def _prefetch_run(children: List[str], gen: int):
+    serial = adb_sync.current_serial()
+    if not serial:
+        return
+    try:
+        with adb_sync.SyncConnection(serial) as conn:
+            for path in children:
+                if gen != _generation:
+                    return
+                if get(path, serial) is not None:
+                    continue
+                try:
+                    items = adb_sync.list_entries(conn, path)
+                except adb_sync.SyncError:
+                    # 不存在或无权限：留给正常列目录流程（会回退到 ls）报告错误
+                    continue
+                put(path, serial, items)
+    except Exception:
+        pass
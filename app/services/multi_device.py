@@ -0,0 +1,151 @@
+"""
+多设备并行操作
+把同一组安装 / 卸载 / 冻结 / 解冻操作下发到多台设备：设备之间由有界线程池并行执行，
+每台设备上的 pm 命令合并为一次 adb shell 调用，安装走 apk_installer 的批量安装。
+结果按 设备 × 操作对象 组成矩阵，每完成一格回调一次。
+"""
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from app.services import adb_service, apk_installer
+
+
+DEFAULT_PARALLEL = 4
+INSTALL_CONCURRENCY = 2  # 每台设备的推送流数；设备之间已经并行
+
+OP_INSTALL = "install"
+OP_UNINSTALL = "uninstall"
+OP_FREEZE = "freeze"
+OP_UNFREEZE = "unfreeze"
+
+OP_LABELS = {
+    OP_INSTALL: "安装",
+    OP_UNINSTALL: "卸载",
+    OP_FREEZE: "冻结",
+    OP_UNFREEZE: "解冻",
+}
+
+_PM_COMMANDS = {
+    OP_UNINSTALL: "pm uninstall {pkg}",
+    OP_FREEZE: "pm disable-user --user 0 {pkg}",
+    OP_UNFREEZE: "pm enable {pkg}",
+}
+
+# 旧系统的 pm 失败时返回码仍为 0，需看输出
+_PM_FAILURE_RE = re.compile(r"^(Failure|Error|Exception|java\.)", re.M)
+_PKG_RE = re.compile(r"^[A-Za-z0-9_.]+$")
+
+
+def _cell(ok: bool, message: str) -> dict:
+    return {"ok": ok, "message": message}
+
+
+class MultiDeviceRunner:
+    """run() 阻塞直到全部设备完成，可从其他线程 cancel()"""
+
+    def __init__(
+        self,
+        serials: List[str],
+        max_parallel: int = DEFAULT_PARALLEL,
+        replace: bool = True,
+        downgrade: bool = False,
+        cell_callback: Optional[Callable[[str, str, dict], None]] = None,
+        log_callback: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        :param serials: 目标设备序列号
+        :param max_parallel: 同时操作的设备数
+        :param replace: 安装时覆盖安装（-r）
+        :param downgrade: 安装时允许降级（-d）
+        :param cell_callback: 单格结果回调 (序列号, 列名, {ok, message})，在后台线程调用
+        :param log_callback: 日志回调
+        """
+        self.serials = list(dict.fromkeys(s for s in serials if s))
+        self.max_parallel = max(1, int(max_parallel))
+        self.replace = replace
+        self.downgrade = downgrade
+        self._cell_cb = cell_callback
+        self.log = log_callback or (lambda msg: None)
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._installers: List[apk_installer.BatchInstaller] = []
+
+    def cancel(self):
+        self._stopped = True
+        with self._lock:
+            installers = list(self._installers)
+        for inst in installers:
+            inst.cancel()
+
+    def _report(self, matrix: Dict[str, Dict[str, dict]], serial: str, column: str, cell: dict):
+        with self._lock:
+            matrix.setdefault(serial, {})[column] = cell
+        if self._cell_cb:
+            self._cell_cb(serial, column, cell)
+
+    def _run_pm(self, serial: str, op: str, packages: List[str], matrix: Dict[str, Dict[str, dict]]):
+        ops = []
+        for pkg in packages:
+            if not _PKG_RE.match(pkg):
+                self._report(matrix, serial, pkg, _cell(False, "包名无效"))
+                continue
+            ops.append((pkg, ("shell", _PM_COMMANDS[op].format(pkg=pkg))))
+        if not ops:
+            return
+        results = adb_service.batch_ops([o for _, o in ops], timeout=120, serial=serial)
+        for (pkg, _), (ok, out) in zip(ops, results):
+            ok = ok and not _PM_FAILURE_RE.search(out)
+            self._report(matrix, serial, pkg, _cell(ok, out.strip().splitlines()[-1] if out.strip() else ("Success" if ok else "失败")))
+
+    def _run_install(self, serial: str, paths: List[str], matrix: Dict[str, Dict[str, dict]]):
+        inst = apk_installer.BatchInstaller(
+            serial=serial, replace=self.replace, downgrade=self.downgrade, concurrency=INSTALL_CONCURRENCY,
+        )
+        with self._lock:
+            self._installers.append(inst)
+        try:
+            for r in inst.run(paths):
+                self._report(matrix, serial, r["name"], _cell(r["ok"], r["message"]))
+        finally:
+            with self._lock:
+                self._installers.remove(inst)
+
+    def _run_device(self, serial: str, op: str, targets: List[str], matrix: Dict[str, Dict[str, dict]]):
+        if self._stopped:
+            return
+        self.log(f"[{serial}] 开始{OP_LABELS[op]}")
+        try:
+            if op == OP_INSTALL:
+                self._run_install(serial, targets, matrix)
+            else:
+                self._run_pm(serial, op, targets, matrix)
+        except InterruptedError:
+            return
+        except Exception as e:
+            # 整台设备失败（断开、超时等）：未出结果的格子全部记为失败
+            for t in targets:
+                column = os.path.basename(t) if op == OP_INSTALL else t
+                if column not in matrix.get(serial, {}):
+                    self._report(matrix, serial, column, _cell(False, str(e)))
+        self.log(f"[{serial}] 完成")
+
+    def run(self, op: str, targets: List[str]) -> Dict[str, Dict[str, dict]]:
+        """
+        在全部设备上执行操作，返回 {序列号: {列名: {ok, message}}}；取消时抛出 InterruptedError
+        :param op: OP_INSTALL / OP_UNINSTALL / OP_FREEZE / OP_UNFREEZE
+        :param targets: 安装时为本地 APK 路径（列名为安装组名），其余为包名
+        """
+        if op not in OP_LABELS:
+            raise ValueError(f"未知的操作: {op}")
+        self._stopped = False
+        matrix: Dict[str, Dict[str, dict]] = {s: {} for s in self.serials}
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel, max(1, len(self.serials))),
+                                thread_name_prefix="multi-device") as pool:
+            for serial in self.serials:
+                pool.submit(self._run_device, serial, op, list(targets), matrix)
+        if self._stopped:
+            raise InterruptedError("已取消")
+        return matrix
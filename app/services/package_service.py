@@ -0,0 +1,271 @@
+"""
+已安装应用清单
+一次 adb shell 调用执行 pm list packages（-f -U -i --show-versioncode，外加 -d / -s）得到全部包名、APK 路径、
+versionCode、安装来源、停用与系统应用标记；versionName、安装时间与 APK 大小来自一次 dumpsys package 加 stat 的调用，
+且只对新增或版本变化的包获取。结果按设备缓存到磁盘，下次刷新直接复用未变化的条目。
+"""
+import json
+import os
+import posixpath
+import re
+import shlex
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.services import adb_service
+from app.services.adb_service import CACHE_DIR
+
+
+PACKAGE_CACHE_DIR = CACHE_DIR / "packages"
+SCRIPT_MAX = 16 * 1024  # 单次 shell 命令长度上限，超出则分多次执行
+SINGLE_DUMP_MAX = 8  # 变化的包不多于此数时逐个 dumpsys，否则一次导出全部
+
+_MARK_DISABLED = "@@PKG_DISABLED@@"
+_MARK_SYSTEM = "@@PKG_SYSTEM@@"
+_MARK_SIZES = "@@PKG_SIZES@@"
+
+# 各字段的缺省值，缓存文件缺字段时以此补齐
+_EMPTY = {
+    "package": "",
+    "apk": "",
+    "version_code": "",
+    "version_name": "",
+    "installer": "",
+    "uid": "",
+    "system": False,
+    "enabled": True,
+    "size": -1,
+    "first_install": "",
+    "last_update": "",
+}
+
+
+def _cache_file(serial: str):
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in serial) or "unknown"
+    return PACKAGE_CACHE_DIR / f"{safe}.json"
+
+
+def load_cached(serial: str) -> Dict[str, dict]:
+    """读取磁盘缓存的清单 {包名: 信息}，没有返回空字典"""
+    try:
+        with open(_cache_file(serial), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {p: dict(_EMPTY, **info) for p, info in (data.get("packages") or {}).items()}
+    except (OSError, ValueError, AttributeError):
+        return {}
+
+
+def save_cached(serial: str, packages: Dict[str, dict]):
+    PACKAGE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _cache_file(serial)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"updated": time.time(), "packages": packages}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _shell(serial: str, script: str, timeout: int) -> str:
+    args = (["-s", serial] if serial else []) + ["shell", script]
+    rc, out = adb_service.run_adb(args, timeout=timeout)
+    if rc in (124, 127):
+        raise RuntimeError(out)
+    return out
+
+
+def parse_list_line(line: str) -> Optional[dict]:
+    """
+    解析 pm list packages -f -U -i --show-versioncode 的一行，例如
+    package:/data/app/~~a==/com.foo-b==/base.apk=com.foo versionCode:12 installer=com.android.vending uid:10234
+    """
+    s = line.strip()
+    if not s.startswith("package:"):
+        return None
+    head, *rest = s[len("package:"):].split()
+    # APK 路径中可能含有 '='（新版本的随机目录名），包名中不会有
+    apk, sep, pkg = head.rpartition("=")
+    if not sep:
+        apk, pkg = "", head
+    info = {"package": pkg, "apk": apk}
+    for tok in rest:
+        parts = re.split(r"[:=]", tok, maxsplit=1)
+        if len(parts) != 2:
+            continue
+        key, value = parts
+        if key == "versionCode":
+            info["version_code"] = value
+        elif key == "installer":
+            info["installer"] = "" if value == "null" else value
+        elif key == "uid":
+            info["uid"] = value
+    return info if pkg else None
+
+
+def _list_packages(serial: str) -> Tuple[Dict[str, dict], set, set]:
+    """一次调用得到 ({包名: 基本信息}, 停用的包, 系统包)"""
+    # 旧系统不支持 --show-versioncode / -U 时退回 -f -i
+    script = (
+        "out=$(pm list packages -f -U -i --show-versioncode 2>&1); "
+        "case \"$out\" in *package:*) echo \"$out\";; *) pm list packages -f -i 2>/dev/null;; esac; "
+        f"echo {_MARK_DISABLED}; pm list packages -d 2>/dev/null; "
+        f"echo {_MARK_SYSTEM}; pm list packages -s 2>/dev/null"
+    )
+    out = _shell(serial, script, timeout=60)
+    listed: Dict[str, dict] = {}
+    disabled, system = set(), set()
+    section = None
+    for line in out.splitlines():
+        s = line.strip()
+        if s in (_MARK_DISABLED, _MARK_SYSTEM):
+            section = s
+            continue
+        info = parse_list_line(s)
+        if not info:
+            continue
+        if section is None:
+            listed[info["package"]] = info
+        elif section == _MARK_DISABLED:
+            disabled.add(info["package"])
+        else:
+            system.add(info["package"])
+    if not listed:
+        raise RuntimeError(out.strip() or "pm list packages 无输出")
+    return listed, disabled, system
+
+
+def parse_dumpsys(text: str) -> Dict[str, dict]:
+    """从 dumpsys package 的输出中取出各包的 versionCode / versionName / 安装时间 / 安装来源"""
+    result: Dict[str, dict] = {}
+    cur: Optional[dict] = None
+    active = False
+    for raw in text.splitlines():
+        s = raw.strip()
+        if not s:
+            continue
+        if not raw.startswith(" "):
+            # 顶层小节：只解析 "Packages:"，跳过 "Hidden system packages:" 等重复的块
+            active = s == "Packages:"
+            cur = None
+            continue
+        if not active:
+            continue
+        if s.startswith("Package [") and "]" in s:
+            cur = result.setdefault(s[len("Package ["):s.index("]")], {})
+            continue
+        if cur is None:
+            continue
+        for tok in (s.split() if s.startswith("versionCode=") else [s]):
+            key, sep, value = tok.partition("=")
+            if not sep:
+                continue
+            if key == "versionCode" and "version_code" not in cur:
+                cur["version_code"] = value
+            elif key == "versionName" and "version_name" not in cur:
+                cur["version_name"] = value
+            elif key == "firstInstallTime" and "first_install" not in cur:
+                cur["first_install"] = value
+            elif key == "lastUpdateTime" and "last_update" not in cur:
+                cur["last_update"] = value
+            elif key == "installerPackageName" and "installer" not in cur:
+                cur["installer"] = "" if value == "null" else value
+    return result
+
+
+def _apk_glob(apk: str) -> str:
+    # 新式安装目录（.../base.apk）内还可能有拆分 APK，一并计入大小
+    if posixpath.basename(apk) == "base.apk":
+        return shlex.quote(posixpath.dirname(apk)) + "/*.apk"
+    return shlex.quote(apk)
+
+
+def _parse_sizes(text: str, split_dirs: set) -> Dict[str, int]:
+    """把 stat 输出的 "大小 路径" 按安装目录（或单个 APK）归并"""
+    sizes: Dict[str, int] = {}
+    for line in text.splitlines():
+        size, _, path = line.strip().partition(" ")
+        if not size.isdigit() or not path:
+            continue
+        parent = posixpath.dirname(path)
+        key = parent if parent in split_dirs else path
+        sizes[key] = sizes.get(key, 0) + int(size)
+    return sizes
+
+
+def _size_key(apk: str) -> str:
+    return posixpath.dirname(apk) if posixpath.basename(apk) == "base.apk" else apk
+
+
+def _fetch_details(serial: str, pkgs: List[str], apks: List[str]) -> Tuple[Dict[str, dict], Dict[str, int]]:
+    """一次调用（APK 很多时按长度分几次）得到 dumpsys 详情与 APK 大小"""
+    if len(pkgs) <= SINGLE_DUMP_MAX:
+        dump = "; ".join(f"dumpsys package {shlex.quote(p)}" for p in pkgs)
+    else:
+        dump = "dumpsys package packages"
+    chunks: List[List[str]] = [[]]
+    size = 0
+    for apk in apks:
+        item = _apk_glob(apk)
+        if size + len(item) > SCRIPT_MAX and chunks[-1]:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(item)
+        size += len(item) + 1
+    split_dirs = {_size_key(a) for a in apks if posixpath.basename(a) == "base.apk"}
+    details: Dict[str, dict] = {}
+    sizes: Dict[str, int] = {}
+    for i, chunk in enumerate(chunks):
+        parts = [dump] if i == 0 and pkgs else []
+        if chunk:
+            parts.append(f"echo {_MARK_SIZES}; stat -c '%s %n' {' '.join(chunk)} 2>/dev/null")
+        if not parts:
+            continue
+        out = _shell(serial, "; ".join(parts) + "; true", timeout=120)
+        dump_text, _, size_text = out.partition(_MARK_SIZES)
+        if i == 0 and pkgs:
+            details = parse_dumpsys(dump_text)
+        sizes.update(_parse_sizes(size_text, split_dirs))
+    return details, sizes
+
+
+def collect_inventory(serial: str = "", full: bool = False) -> List[dict]:
+    """
+    获取设备上全部已安装应用，按包名排序；未变化的包沿用磁盘缓存中的详情
+    :param serial: 设备序列号，空字符串表示唯一连接的设备
+    :param full: 忽略缓存，重新获取全部包的详情
+    每项字段：package, apk, version_code, version_name, installer, uid,
+    system, enabled, size（字节，未知为 -1）, first_install, last_update
+    """
+    listed, disabled, system = _list_packages(serial)
+    cached = {} if full else load_cached(serial)
+    packages: Dict[str, dict] = {}
+    changed: List[str] = []
+    for pkg, info in listed.items():
+        old = cached.get(pkg)
+        # APK 路径与 versionCode 都未变：安装、更新时间与大小也不会变；
+        # 不支持 --show-versioncode 的设备列表中没有 versionCode，只比较 APK 路径（更新后路径会变）
+        version = info.get("version_code", "")
+        if old and old["apk"] == info["apk"] and (not version or old["version_code"] == version):
+            entry = dict(old)
+        else:
+            entry = dict(_EMPTY, package=pkg)
+            changed.append(pkg)
+        entry.update({k: v for k, v in info.items() if v or k == "apk"})
+        entry["enabled"] = pkg not in disabled
+        entry["system"] = pkg in system
+        packages[pkg] = entry
+
+    if changed:
+        apks = sorted({packages[p]["apk"] for p in changed if packages[p]["apk"]})
+        details, sizes = _fetch_details(serial, changed, apks)
+        for pkg in changed:
+            entry = packages[pkg]
+            for key, value in details.get(pkg, {}).items():
+                if value and not entry.get(key):
+                    entry[key] = value
+            if entry["apk"]:
+                entry["size"] = sizes.get(_size_key(entry["apk"]), -1)
+    try:
+        save_cached(serial, packages)
+    except OSError:
+        pass
+    return [packages[p] for p in sorted(packages)]
+
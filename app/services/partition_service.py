@@ -0,0 +1,138 @@
+"""
+分区表读取
+一次 su 调用完成 by-name 目录定位与全部分区大小读取（/sys/class/block/*/size），
+结果按 序列号 + boot_id 缓存：设备未重启前重复扫描不再访问 by-name 目录。
+"""
+import json
+import subprocess
+import threading
+from typing import Dict, Optional
+
+from app.services.adb_service import CACHE_DIR, _silent_kwargs
+
+
+PARTITION_CACHE_DIR = CACHE_DIR / "partitions"
+BY_NAME_CANDIDATES = [
+    "/dev/block/bootdevice/by-name",
+    "/dev/block/by-name",
+    "/dev/block/platform/*/by-name",
+]
+DEFAULT_THROUGHPUT = 30 * 1024 * 1024  # 未测得实际速度时的估算值（字节/秒）
+
+_memory_cache: Dict[str, dict] = {}
+_cache_lock = threading.Lock()
+
+_SCAN_SCRIPT = (
+    "for d in " + " ".join(BY_NAME_CANDIDATES) + "; do [ -d $d ] && break; done; "
+    "[ -d $d ] || exit 1; echo \"DIR $d\"; cd $d; "
+    "for p in *; do b=$(basename $(readlink -f $p)); "
+    "s=$(cat /sys/class/block/$b/size 2>/dev/null); echo \"$p $((${s:-0}*512))\"; done"
+)
+
+
+def _adb_shell(adb_path: str, serial: str, cmd: str, timeout: int = 30) -> str:
+    out = subprocess.run(
+        [adb_path, "-s", serial, "shell", cmd],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout, **_silent_kwargs()
+    ).stdout
+    return out.decode("utf-8", errors="ignore")
+
+
+def _cache_file(serial: str):
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in serial) or "unknown"
+    return PARTITION_CACHE_DIR / f"{safe}.json"
+
+
+def _load_disk(serial: str) -> Optional[dict]:
+    try:
+        return json.loads(_cache_file(serial).read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def _save_disk(serial: str, table: dict):
+    try:
+        PARTITION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _cache_file(serial).write_text(json.dumps(table, ensure_ascii=False), encoding="utf-8")
+    except Exception:
+        pass
+
+
+def boot_id(adb_path: str, serial: str) -> str:
+    try:
+        return _adb_shell(adb_path, serial, "cat /proc/sys/kernel/random/boot_id", timeout=5).strip()
+    except Exception:
+        return ""
+
+
+def scan_partitions(adb_path: str, serial: str, use_cache: bool = True) -> dict:
+    """返回 {"by_name": 目录, "partitions": {分区名: 字节数}, "boot_id": ...}。
+
+    需要 Root；找不到 by-name 目录或没有 su 权限时抛出 RuntimeError。
+    """
+    bid = boot_id(adb_path, serial)
+    if use_cache and bid:
+        with _cache_lock:
+            table = _memory_cache.get(serial)
+        if table is None:
+            table = _load_disk(serial)
+        if table and table.get("boot_id") == bid and table.get("partitions"):
+            with _cache_lock:
+                _memory_cache[serial] = table
+            return table
+
+    out = _adb_shell(adb_path, serial, f"su -c '{_SCAN_SCRIPT}'", timeout=60)
+    by_name = ""
+    partitions: Dict[str, int] = {}
+    for line in out.splitlines():
+        line = line.strip()
+        if line.startswith("DIR "):
+            by_name = line[4:].strip()
+            continue
+        parts = line.split()
+        if len(parts) == 2 and parts[1].isdigit():
+            partitions[parts[0]] = int(parts[1])
+    if not by_name or not partitions:
+        raise RuntimeError("无法读取分区表（未授予 Root 权限或找不到 /dev/block/by-name）")
+
+    old = _load_disk(serial) or {}
+    table = {
+        "serial": serial,
+        "by_name": by_name,
+        "partitions": dict(sorted(partitions.items())),
+        "boot_id": bid,
+        "throughput": old.get("throughput", 0),
+    }
+    with _cache_lock:
+        _memory_cache[serial] = table
+    _save_disk(serial, table)
+    return table
+
+
+def invalidate(serial: str):
+    with _cache_lock:
+        _memory_cache.pop(serial, None)
+    try:
+        _cache_file(serial).unlink()
+    except Exception:
+        pass
+
+
+def record_throughput(serial: str, bytes_per_sec: float):
+    """记录本机实测备份速度，用于之后的耗时估算"""
+    if bytes_per_sec <= 0:
+        return
+    with _cache_lock:
+        table = _memory_cache.get(serial)
+    table = dict(table or _load_disk(serial) or {})
+    if not table:
+        return
+    table["throughput"] = int(bytes_per_sec)
+    with _cache_lock:
+        _memory_cache[serial] = table
+    _save_disk(serial, table)
+
+
+def estimate_seconds(total_bytes: int, table: Optional[dict] = None) -> float:
+    rate = (table or {}).get("throughput") or DEFAULT_THROUGHPUT
+    return total_bytes / rate
@@ -0,0 +1,528 @@
+"""
+payload.bin 清单读取与分区解包
+只读取文件头与 DeltaArchiveManifest，不解包分区数据。
+本地文件使用 mmap，在线 OTA 使用 HTTP Range 请求，仅下载几十 KB ~ 数 MB。
+全量包的分区可按需逐个解出（REPLACE / BZ / XZ / ZSTD / ZERO）。
+"""
+import bz2
+import hashlib
+import json
+import lzma
+import mmap
+import os
+import struct
+import subprocess
+import threading
+import zipfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.adb_service import BIN_DIR, CACHE_DIR, _silent_kwargs
+
+
+PAYLOAD_MAGIC = b"CrAU"
+PAYLOAD_CACHE_DIR = CACHE_DIR / "payload"
+
+# InstallOperation.Type
+OP_NAMES = {
+    0: "REPLACE",
+    1: "REPLACE_BZ",
+    2: "MOVE",
+    3: "BSDIFF",
+    4: "SOURCE_COPY",
+    5: "SOURCE_BSDIFF",
+    6: "ZERO",
+    7: "DISCARD",
+    8: "REPLACE_XZ",
+    9: "PUFFDIFF",
+    10: "BROTLI_BSDIFF",
+    11: "ZUCCHINI",
+    12: "LZ4DIFF_BSDIFF",
+    13: "LZ4DIFF_PUFFDIFF",
+    14: "ZSTD",
+}
+
+_memory_cache: Dict[str, dict] = {}
+_cache_lock = threading.Lock()
+
+
+# -------- Readers --------
+class _LocalReader:
+    """本地文件只读访问（mmap）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        self.size = os.fstat(self._f.fileno()).st_size
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        if self._mm is None or offset >= self.size:
+            return b""
+        return self._mm[offset:offset + length]
+
+    def fingerprint(self) -> str:
+        st = os.stat(self.path)
+        return f"file:{os.path.abspath(self.path)}:{st.st_size}:{st.st_mtime_ns}"
+
+    def close(self):
+        try:
+            if self._mm is not None:
+                self._mm.close()
+        finally:
+            self._f.close()
+
+
+class _HttpReader:
+    """在线文件只读访问（HTTP Range），带简单的块缓存以减少请求次数"""
+
+    BLOCK = 256 * 1024
+
+    def __init__(self, url: str, timeout: int = 15):
+        import requests
+        self.url = url
+        self.timeout = timeout
+        self._session = requests.Session()
+        self._session.headers.update({"User-Agent": "Mozilla/5.0"})
+        head = self._session.head(url, allow_redirects=True, timeout=(5, timeout))
+        head.raise_for_status()
+        self.url = head.url or url
+        self.size = int(head.headers.get("content-length", 0) or 0)
+        self._etag = head.headers.get("etag", "") or head.headers.get("last-modified", "")
+        if self.size <= 0:
+            raise RuntimeError("服务器未返回文件大小，无法按需读取")
+        if head.headers.get("accept-ranges", "").lower() != "bytes":
+            # 部分服务器不声明 accept-ranges 但实际支持，这里以首次 Range 请求结果为准
+            pass
+        self._blocks: Dict[int, bytes] = {}
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        r = self._session.get(
+            self.url,
+            headers={"Range": f"bytes={start}-{end}"},
+            timeout=(5, self.timeout),
+        )
+        r.raise_for_status()
+        if r.status_code != 206:
+            raise RuntimeError("服务器不支持 Range 请求，无法在线读取清单")
+        return r.content
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        if length <= 0 or offset >= self.size:
+            return b""
+        end = min(self.size, offset + length) - 1
+        first = offset // self.BLOCK
+        last = end // self.BLOCK
+        missing = [b for b in range(first, last + 1) if b not in self._blocks]
+        if missing:
+            # 合并连续缺失块为一次请求
+            lo, hi = missing[0], missing[-1]
+            data = self._fetch(lo * self.BLOCK, min(self.size, (hi + 1) * self.BLOCK) - 1)
+            for i, b in enumerate(range(lo, hi + 1)):
+                self._blocks[b] = data[i * self.BLOCK:(i + 1) * self.BLOCK]
+        buf = b"".join(self._blocks[b] for b in range(first, last + 1))
+        skip = offset - first * self.BLOCK
+        return buf[skip:skip + (end - offset + 1)]
+
+    def fingerprint(self) -> str:
+        return f"url:{self.url}:{self.size}:{self._etag}"
+
+    def close(self):
+        try:
+            self._session.close()
+        except Exception:
+            pass
+
+
+class _ReaderFile:
+    """把 reader 包装成 zipfile 可用的只读文件对象"""
+
+    def __init__(self, reader):
+        self._r = reader
+        self._pos = 0
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=0):
+        if whence == 0:
+            self._pos = offset
+        elif whence == 1:
+            self._pos += offset
+        else:
+            self._pos = self._r.size + offset
+        return self._pos
+
+    def read(self, n=-1):
+        if n is None or n < 0:
+            n = self._r.size - self._pos
+        data = self._r.read_at(self._pos, n)
+        self._pos += len(data)
+        return data
+
+
+def open_reader(source: str):
+    if str(source).lower().startswith(("http://", "https://")):
+        return _HttpReader(source)
+    return _LocalReader(source)
+
+
+def locate_payload(reader) -> int:
+    """返回 payload.bin 在源文件中的起始偏移（裸 payload.bin 返回 0）"""
+    head = reader.read_at(0, 4)
+    if head == PAYLOAD_MAGIC:
+        return 0
+    if head[:2] != b"PK":
+        raise ValueError("不是有效的 payload.bin 或 OTA ZIP")
+    with zipfile.ZipFile(_ReaderFile(reader)) as zf:
+        try:
+            info = zf.getinfo("payload.bin")
+        except KeyError:
+            raise ValueError("ZIP 中未找到 payload.bin")
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError("ZIP 中的 payload.bin 被压缩，无法按需读取")
+    local = reader.read_at(info.header_offset, 30)
+    if local[:4] != b"PK\x03\x04":
+        raise ValueError("ZIP 本地文件头损坏")
+    name_len, extra_len = struct.unpack("<HH", local[26:30])
+    return info.header_offset + 30 + name_len + extra_len
+
+
+# -------- Protobuf (wire format) --------
+def _varint(buf, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _fields(buf, start: int = 0, end: Optional[int] = None):
+    """遍历消息字段，yield (field_no, wire_type, value)；长度字段返回 (start, end) 切片位置"""
+    pos = start
+    end = len(buf) if end is None else end
+    while pos < end:
+        key, pos = _varint(buf, pos)
+        field_no, wire = key >> 3, key & 7
+        if wire == 0:
+            val, pos = _varint(buf, pos)
+        elif wire == 1:
+            val = struct.unpack_from("<Q", buf, pos)[0]
+            pos += 8
+        elif wire == 2:
+            ln, pos = _varint(buf, pos)
+            val = (pos, pos + ln)
+            pos += ln
+        elif wire == 5:
+            val = struct.unpack_from("<I", buf, pos)[0]
+            pos += 4
+        else:
+            raise ValueError(f"不支持的 protobuf wire type: {wire}")
+        yield field_no, wire, val
+
+
+def _extents(buf, span) -> List[Tuple[int, int]]:
+    start_block = num_blocks = 0
+    for f, _, v in _fields(buf, *span):
+        if f == 1:
+            start_block = v
+        elif f == 2:
+            num_blocks = v
+    return [(start_block, num_blocks)]
+
+
+def _parse_operation(buf, span) -> dict:
+    op = {"type": 0, "data_offset": 0, "data_length": 0, "dst_extents": [], "data_sha256": ""}
+    for f, _, v in _fields(buf, *span):
+        if f == 1:
+            op["type"] = v
+        elif f == 2:
+            op["data_offset"] = v
+        elif f == 3:
+            op["data_length"] = v
+        elif f == 6:
+            op["dst_extents"].extend(_extents(buf, v))
+        elif f == 8:
+            op["data_sha256"] = bytes(buf[v[0]:v[1]]).hex()
+    return op
+
+
+def _parse_partition_info(buf, span) -> Tuple[int, str]:
+    size = 0
+    digest = ""
+    for f, _, v in _fields(buf, *span):
+        if f == 1:
+            size = v
+        elif f == 2:
+            digest = bytes(buf[v[0]:v[1]]).hex()
+    return size, digest
+
+
+def _parse_partition(buf, span, with_operations: bool) -> dict:
+    part = {"name": "", "size": 0, "sha256": "", "op_count": 0, "op_types": {}, "data_length": 0}
+    ops: List[dict] = []
+    for f, _, v in _fields(buf, *span):
+        if f == 1:
+            part["name"] = bytes(buf[v[0]:v[1]]).decode("utf-8", errors="replace")
+        elif f == 7:
+            part["size"], part["sha256"] = _parse_partition_info(buf, v)
+        elif f == 8:
+            part["op_count"] += 1
+            # 只读取 type 与 data_length，跳过 extents，保证大清单的扫描速度
+            op_type = 0
+            for of, _, ov in _fields(buf, *v):
+                if of == 1:
+                    op_type = ov
+                elif of == 3:
+                    part["data_length"] += ov
+            name = OP_NAMES.get(op_type, str(op_type))
+            part["op_types"][name] = part["op_types"].get(name, 0) + 1
+            if with_operations:
+                ops.append(_parse_operation(buf, v))
+    if with_operations:
+        part["operations"] = ops
+    return part
+
+
+def _parse_dynamic_groups(buf, span) -> List[dict]:
+    groups: List[dict] = []
+    for f, _, v in _fields(buf, *span):
+        if f != 1:
+            continue
+        g = {"name": "", "size": 0, "partitions": []}
+        for gf, _, gv in _fields(buf, *v):
+            if gf == 1:
+                g["name"] = bytes(buf[gv[0]:gv[1]]).decode("utf-8", errors="replace")
+            elif gf == 2:
+                g["size"] = gv
+            elif gf == 3:
+                g["partitions"].append(bytes(buf[gv[0]:gv[1]]).decode("utf-8", errors="replace"))
+        groups.append(g)
+    return groups
+
+
+def parse_manifest(buf, with_operations: bool = False) -> dict:
+    manifest = {"block_size": 4096, "minor_version": 0, "partial_update": False,
+                "partitions": [], "dynamic_groups": []}
+    for f, _, v in _fields(buf):
+        if f == 3:
+            manifest["block_size"] = v
+        elif f == 12:
+            manifest["minor_version"] = v
+        elif f == 13:
+            manifest["partitions"].append(_parse_partition(buf, v, with_operations))
+        elif f == 15:
+            manifest["dynamic_groups"] = _parse_dynamic_groups(buf, v)
+        elif f == 16:
+            manifest["partial_update"] = bool(v)
+    logical = set()
+    for g in manifest["dynamic_groups"]:
+        logical.update(g["partitions"])
+    for p in manifest["partitions"]:
+        p["logical"] = p["name"] in logical
+    return manifest
+
+
+# -------- Public API --------
+def read_header(reader, base: int) -> dict:
+    head = reader.read_at(base, 24)
+    if head[:4] != PAYLOAD_MAGIC:
+        raise ValueError("payload.bin 魔数不匹配")
+    version, manifest_size = struct.unpack(">QQ", head[4:20])
+    if version == 1:
+        header_len = 20
+        sig_size = 0
+    elif version == 2:
+        header_len = 24
+        sig_size = struct.unpack(">I", head[20:24])[0]
+    else:
+        raise ValueError(f"不支持的 payload 版本: {version}")
+    return {
+        "version": version,
+        "manifest_offset": base + header_len,
+        "manifest_size": manifest_size,
+        "data_offset": base + header_len + manifest_size + sig_size,
+    }
+
+
+def _cache_path(key: str):
+    return PAYLOAD_CACHE_DIR / f"{key}.json"
+
+
+def _load_cached(fingerprint: str) -> Optional[dict]:
+    fp_key = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        hit = _memory_cache.get(fp_key)
+    if hit is not None:
+        return hit
+    try:
+        index = json.loads((PAYLOAD_CACHE_DIR / "index.json").read_text(encoding="utf-8"))
+        digest = index.get(fp_key)
+        if digest:
+            data = json.loads(_cache_path(digest).read_text(encoding="utf-8"))
+            with _cache_lock:
+                _memory_cache[fp_key] = data
+            return data
+    except Exception:
+        pass
+    return None
+
+
+def _store_cached(fingerprint: str, info: dict):
+    fp_key = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        _memory_cache[fp_key] = info
+    try:
+        PAYLOAD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        _cache_path(info["manifest_sha256"]).write_text(json.dumps(info, ensure_ascii=False), encoding="utf-8")
+        index_path = PAYLOAD_CACHE_DIR / "index.json"
+        try:
+            index = json.loads(index_path.read_text(encoding="utf-8"))
+        except Exception:
+            index = {}
+        index[fp_key] = info["manifest_sha256"]
+        index_path.write_text(json.dumps(index), encoding="utf-8")
+    except Exception:
+        pass
+
+
+def inspect_payload(source: str, use_cache: bool = True) -> dict:
+    """读取 payload 清单，返回分区列表（名称、大小、哈希、操作数）。
+
+    结果按源文件指纹（路径/URL + 大小 + 修改时间/ETag）缓存，并以清单的 SHA-256 落盘；
+    返回值中的 cached 表示是否命中缓存。
+    """
+    reader = open_reader(source)
+    try:
+        fingerprint = reader.fingerprint()
+        if use_cache:
+            cached = _load_cached(fingerprint)
+            if cached is not None:
+                return dict(cached, cached=True)
+        base = locate_payload(reader)
+        header = read_header(reader, base)
+        raw = reader.read_at(header["manifest_offset"], header["manifest_size"])
+        if len(raw) != header["manifest_size"]:
+            raise ValueError("清单数据不完整")
+        manifest = parse_manifest(raw)
+        info = {
+            "source": source,
+            "version": header["version"],
+            "block_size": manifest["block_size"],
+            "minor_version": manifest["minor_version"],
+            "partial_update": manifest["partial_update"],
+            "incremental": manifest["minor_version"] != 0,
+            "manifest_sha256": hashlib.sha256(raw).hexdigest(),
+            "partitions": manifest["partitions"],
+            "dynamic_groups": manifest["dynamic_groups"],
+        }
+        _store_cached(fingerprint, info)
+        return dict(info, cached=False)
+    finally:
+        reader.close()
+
+
+def load_operations(source: str) -> dict:
+    """读取完整清单（含每个分区的 InstallOperation），供解包使用"""
+    reader = open_reader(source)
+    try:
+        base = locate_payload(reader)
+        header = read_header(reader, base)
+        raw = reader.read_at(header["manifest_offset"], header["manifest_size"])
+        if len(raw) != header["manifest_size"]:
+            raise ValueError("清单数据不完整")
+        manifest = parse_manifest(raw, with_operations=True)
+        manifest["data_offset"] = header["data_offset"]
+        manifest["incremental"] = manifest["minor_version"] != 0
+        return manifest
+    finally:
+        reader.close()
+
+
+def _zstd_decompress(data: bytes, expected: int) -> bytes:
+    try:
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=expected)
+    except ImportError:
+        pass
+    exe = BIN_DIR / "zstd.exe"
+    cmd = [str(exe) if exe.exists() else "zstd", "-d", "-c", "-q"]
+    proc = subprocess.run(cmd, input=data, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **_silent_kwargs())
+    if proc.returncode != 0:
+        raise ValueError("ZSTD 解压失败: " + proc.stderr.decode("utf-8", errors="replace").strip())
+    return proc.stdout
+
+
+def _decode_operation(op: dict, data: bytes, expected: int) -> bytes:
+    op_type = op["type"]
+    if op_type == 0:
+        return data
+    if op_type == 1:
+        return bz2.decompress(data)
+    if op_type == 8:
+        return lzma.decompress(data)
+    if op_type == 14:
+        return _zstd_decompress(data, expected)
+    name = OP_NAMES.get(op_type, str(op_type))
+    raise ValueError(f"不支持的操作类型 {name}（增量包需要原始镜像，无法直接解包）")
+
+
+def extract_partition(
+    reader,
+    data_offset: int,
+    block_size: int,
+    part: dict,
+    out_path: str,
+    progress: Optional[Callable[[int, int], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    verify: bool = True,
+) -> str:
+    """把单个分区解包到 out_path。part 需来自 load_operations()（含 operations）。
+
+    目标文件先按分区大小预分配，ZERO / DISCARD 区段直接跳过；
+    verify 为 True 时校验每个操作数据块的 SHA-256。
+    """
+    ops = part.get("operations") or []
+    size = int(part.get("size") or 0)
+    if not size:
+        for op in ops:
+            for start, num in op["dst_extents"]:
+                size = max(size, (start + num) * block_size)
+    with open(out_path, "wb") as f:
+        f.truncate(size)
+        for i, op in enumerate(ops):
+            if should_stop and should_stop():
+                raise InterruptedError("已取消")
+            if op["type"] not in (6, 7):
+                expected = sum(num for _, num in op["dst_extents"]) * block_size
+                data = reader.read_at(data_offset + op["data_offset"], op["data_length"])
+                if len(data) != op["data_length"]:
+                    raise ValueError(f"{part['name']}: 数据读取不完整")
+                if verify and op["data_sha256"] and hashlib.sha256(data).hexdigest() != op["data_sha256"]:
+                    raise ValueError(f"{part['name']}: 第 {i + 1} 个操作数据校验失败")
+                out = _decode_operation(op, data, expected)
+                pos = 0
+                for start, num in op["dst_extents"]:
+                    length = num * block_size
+                    f.seek(start * block_size)
+                    f.write(out[pos:pos + length])
+                    pos += length
+            if progress:
+                progress(i + 1, len(ops))
+        f.truncate(size)
+    return out_path
+
+
+def format_size(num: int) -> str:
+    size = float(num or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
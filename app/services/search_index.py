@@ -0,0 +1,298 @@
+"""
+设备文件搜索索引
+在后台经 sync 连接遍历设备目录树，写入本地 SQLite（每台设备一个库），按名称 / 扩展名 / 大小即时查询。
+增量刷新：目录的修改时间在其中增删、重命名条目时才会变化，时间未变的目录沿用库中的子项，
+只对其子目录做一次 STAT 检查，不再重新列出整个目录。
+"""
+import os
+import posixpath
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Callable, Dict, List, Optional
+
+from app.services.adb_service import CACHE_DIR
+from app.services.adb_sync import SyncConnection, SyncError, current_serial, join_remote
+
+
+SEARCH_INDEX_DIR = CACHE_DIR / "search"
+DEFAULT_ROOT = "/storage/emulated/0"
+STALE_AFTER = 300  # 秒；超过后搜索时在后台增量刷新
+DEFAULT_LIMIT = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    path   TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name   TEXT NOT NULL,
+    ext    TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size   INTEGER NOT NULL,
+    mtime  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_parent ON entries(parent);
+CREATE INDEX IF NOT EXISTS idx_entries_name ON entries(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_entries_ext ON entries(ext);
+CREATE TABLE IF NOT EXISTS roots (
+    path      TEXT PRIMARY KEY,
+    refreshed REAL NOT NULL
+);
+"""
+
+# 同一设备的刷新串行执行，查询不受影响（SQLite WAL 允许读写并发）
+_refresh_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _norm(path: str) -> str:
+    p = posixpath.normpath(path or "/")
+    return "/" if p in (".", "//") else p
+
+
+def _ext(name: str) -> str:
+    return os.path.splitext(name)[1].lstrip(".").lower()
+
+
+def _subtree_bounds(path: str):
+    # path 下所有子路径满足 prefix <= p < prefix 的下一个字符（'/' 之后是 '0'）
+    prefix = path.rstrip("/") + "/"
+    return prefix, prefix[:-1] + "0"
+
+
+def _like_pattern(text: str) -> str:
+    text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    if "*" in text or "?" in text:
+        return text.replace("*", "%").replace("?", "_")
+    return f"%{text}%"
+
+
+class SearchIndex:
+    """单台设备的搜索索引；查询可在任意线程调用，刷新请在后台线程调用"""
+
+    def __init__(self, serial: str = ""):
+        """
+        :param serial: 设备序列号，空字符串表示当前唯一连接的设备
+        """
+        self.serial = serial or current_serial()
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in self.serial) or "unknown"
+        self.db_path = SEARCH_INDEX_DIR / f"{safe}.db"
+        self._stopped = False
+        with closing(self._connect()) as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        SEARCH_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(self.db_path), timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # ---------- 覆盖范围 ----------
+    def covering_root(self, path: str) -> Optional[str]:
+        """返回包含 path 的已索引根目录，没有则为 None"""
+        path = _norm(path)
+        with closing(self._connect()) as db:
+            for (root,) in db.execute("SELECT path FROM roots"):
+                if path == root or path.startswith(root.rstrip("/") + "/"):
+                    return root
+        return None
+
+    def age(self, root: str) -> float:
+        """根目录距上次刷新的秒数，从未索引返回 inf"""
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT refreshed FROM roots WHERE path = ?", (_norm(root),)).fetchone()
+        return time.time() - row[0] if row else float("inf")
+
+    def count(self, scope: str = "/") -> int:
+        lo, hi = _subtree_bounds(_norm(scope))
+        with closing(self._connect()) as db:
+            return db.execute("SELECT COUNT(*) FROM entries WHERE path >= ? AND path < ?", (lo, hi)).fetchone()[0]
+
+    # ---------- 刷新 ----------
+    def cancel(self):
+        self._stopped = True
+
+    def refresh(
+        self,
+        root: str = DEFAULT_ROOT,
+        full: bool = False,
+        progress: Optional[Callable[[int, str], None]] = None,
+    ) -> int:
+        """
+        遍历 root 更新索引，返回本次重新列出的目录数；取消时抛出 InterruptedError
+        :param root: 设备端根目录
+        :param full: 忽略目录修改时间，全部重新列出（原地改写的文件大小只有完整刷新才会更新）
+        :param progress: 进度回调 (已处理目录数, 当前目录)
+        """
+        root = _norm(root)
+        self._stopped = False
+        with _locks_guard:
+            lock = _refresh_locks.setdefault(str(self.db_path), threading.Lock())
+        with lock, closing(self._connect()) as db, SyncConnection(self.serial) as conn:
+            st = conn.stat(root)
+            if not st.is_dir:
+                raise SyncError(f"目录不存在: {root}")
+            known = {}
+            if not full:
+                lo, hi = _subtree_bounds(root)
+                known = dict(db.execute(
+                    "SELECT path, mtime FROM entries WHERE is_dir = 1 AND ((path >= ? AND path < ?) OR path = ?)",
+                    (lo, hi, root),
+                ))
+            else:
+                self._delete_subtree(db, root)
+            visited = listed = 0
+            stack = [(root, st.mtime)]
+            while stack:
+                if self._stopped:
+                    db.commit()
+                    raise InterruptedError("已取消")
+                path, mtime = stack.pop()
+                visited += 1
+                if progress and visited % 50 == 0:
+                    progress(visited, path)
+                if known.get(path) == mtime:
+                    # 目录本身未变：子项沿用，子目录逐个 STAT 确认后继续向下
+                    for (child,) in db.execute(
+                        "SELECT path FROM entries WHERE parent = ? AND is_dir = 1", (path,)
+                    ).fetchall():
+                        cst = conn.stat(child)
+                        if cst.is_dir:
+                            stack.append((child, cst.mtime))
+                        else:
+                            self._delete_subtree(db, child, include_self=True)
+                    continue
+                listed += 1
+                stack.extend(self._relist(db, conn, path, mtime))
+                if listed % 200 == 0:
+                    db.commit()
+            db.execute("INSERT OR REPLACE INTO roots(path, refreshed) VALUES (?, ?)", (root, time.time()))
+            db.commit()
+        if progress:
+            progress(visited, "")
+        return listed
+
+    def _relist(self, db: sqlite3.Connection, conn: SyncConnection, path: str, mtime: int) -> list:
+        """重新列出 path，更新其子项，返回需要继续遍历的子目录 [(路径, 修改时间)]"""
+        try:
+            entries = conn.list(path)
+        except SyncError:
+            entries = []
+        old = {p: d for p, d in db.execute("SELECT path, is_dir FROM entries WHERE parent = ?", (path,))}
+        rows, subdirs = [], []
+        for e in entries:
+            # 符号链接不跟随，避免 /sdcard 之类的链接造成重复或循环
+            if e.is_link:
+                continue
+            child = join_remote(path, e.name)
+            # 新子目录的修改时间先记为 -1，真正列出后才写入，中途取消时不会被误判为未变化
+            rows.append((
+                child, path, e.name, "" if e.is_dir else _ext(e.name), int(e.is_dir),
+                0 if e.is_dir else e.size, -1 if e.is_dir else e.mtime,
+            ))
+            if e.is_dir:
+                subdirs.append((child, e.mtime))
+            if old.pop(child, None) and not e.is_dir:
+                # 原来是目录，现在变成了文件
+                self._delete_subtree(db, child)
+        for child in old:
+            self._delete_subtree(db, child, include_self=True)
+        # 已有子目录保留旧的修改时间，同样等列出后再更新
+        db.executemany(
+            "INSERT INTO entries(path, parent, name, ext, is_dir, size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(path) DO UPDATE SET size = excluded.size, is_dir = excluded.is_dir, "
+            "mtime = CASE WHEN excluded.is_dir = 1 AND entries.is_dir = 1 THEN entries.mtime ELSE excluded.mtime END",
+            rows,
+        )
+        db.execute(
+            "INSERT INTO entries(path, parent, name, ext, is_dir, size, mtime) VALUES (?, ?, ?, '', 1, 0, ?) "
+            "ON CONFLICT(path) DO UPDATE SET mtime = excluded.mtime",
+            (path, _norm(posixpath.dirname(path)), posixpath.basename(path) or "/", mtime),
+        )
+        return subdirs
+
+    @staticmethod
+    def _delete_subtree(db: sqlite3.Connection, path: str, include_self: bool = False):
+        lo, hi = _subtree_bounds(path)
+        db.execute("DELETE FROM entries WHERE path >= ? AND path < ?", (lo, hi))
+        if include_self:
+            db.execute("DELETE FROM entries WHERE path = ?", (path,))
+
+    # ---------- 查询 ----------
+    def search(
+        self,
+        text: str = "",
+        scope: str = "/",
+        ext: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        include_dirs: bool = True,
+        limit: int = DEFAULT_LIMIT,
+    ) -> List[dict]:
+        """
+        查询索引，返回 [{path, name, size, type: 'dir'|'file', mtime}]，目录在前
+        :param text: 名称关键字（不区分大小写），支持 * 与 ? 通配符
+        :param scope: 只在该目录下查找
+        :param ext: 扩展名，逗号分隔多个，如 "log,txt"
+        :param min_size: 最小字节数
+        :param max_size: 最大字节数
+        :param include_dirs: 是否包含目录
+        :param limit: 最多返回条数
+        """
+        lo, hi = _subtree_bounds(_norm(scope))
+        sql = ["SELECT path, name, size, is_dir, mtime FROM entries WHERE path >= ? AND path < ?"]
+        args: list = [lo, hi]
+        if text:
+            sql.append("AND name LIKE ? ESCAPE '\\'")
+            args.append(_like_pattern(text))
+        if ext:
+            exts = [e.strip().lstrip(".").lower() for e in ext.split(",") if e.strip()]
+            sql.append(f"AND ext IN ({','.join('?' * len(exts))})")
+            args.extend(exts)
+        if min_size is not None or max_size is not None or ext:
+            include_dirs = False
+        if min_size is not None:
+            sql.append("AND size >= ?")
+            args.append(int(min_size))
+        if max_size is not None:
+            sql.append("AND size <= ?")
+            args.append(int(max_size))
+        if not include_dirs:
+            sql.append("AND is_dir = 0")
+        sql.append("ORDER BY is_dir DESC, name COLLATE NOCASE LIMIT ?")
+        args.append(int(limit))
+        with closing(self._connect()) as db:
+            rows = db.execute(" ".join(sql), args).fetchall()
+        return [
+            {"path": p, "name": n, "size": s, "type": "dir" if d else "file", "mtime": m}
+            for p, n, s, d, m in rows
+        ]
+
+
+def parse_query(query: str) -> dict:
+    """把搜索框文本解析为 search() 参数：支持 ext:log,txt  >10M  <1G 与普通关键字"""
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    kwargs: dict = {}
+    words = []
+    for token in query.split():
+        low = token.lower()
+        if low.startswith("ext:") and len(low) > 4:
+            kwargs["ext"] = low[4:]
+            continue
+        if low[:1] in "<>" and len(low) > 1:
+            num, mul = low[1:], 1
+            if num[-1:] in units:
+                num, mul = num[:-1], units[num[-1]]
+            elif num.endswith("b") and num[-2:-1] in units:
+                num, mul = num[:-2], units[num[-2]]
+            try:
+                value = int(float(num) * mul)
+            except ValueError:
+                words.append(token)
+                continue
+            kwargs["min_size" if low[0] == ">" else "max_size"] = value
+            continue
+        words.append(token)
+    kwargs["text"] = " ".join(words)
+    return kwargs
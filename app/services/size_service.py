@@ -0,0 +1,157 @@
+"""
+远端目录大小统计
+一次 adb shell 调用（find + stat）得到若干路径下全部文件的精确字节数与文件数，
+按 设备序列号 + 路径 缓存；本程序自身的写操作使对应路径及其上级、下级的结果失效。
+选中条目时在后台提前计算，传输开始时进度条直接拿到准确的总量。
+"""
+import posixpath
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services import adb_service, adb_sync
+
+
+DEFAULT_TTL = 120.0  # 秒
+MAX_ENTRIES = 256
+
+_cache: Dict[Tuple[str, str], Tuple[float, int, int]] = {}
+_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="size-prefetch")
+_generation = 0
+_last_serial = ""
+
+
+def _norm(path: str) -> str:
+    p = posixpath.normpath(path or "/")
+    return "/" if p in (".", "//") else p
+
+
+def get_cached(path: str, serial: Optional[str] = None, max_age: float = DEFAULT_TTL) -> Optional[Tuple[int, int]]:
+    """返回缓存的 (字节数, 文件数)，没有或过期返回 None"""
+    serial = adb_sync.current_serial() if serial is None else serial
+    with _lock:
+        hit = _cache.get((serial, _norm(path)))
+    if hit and time.monotonic() - hit[0] <= max_age:
+        return hit[1], hit[2]
+    return None
+
+
+def last_serial() -> str:
+    """最近一次统计所用的设备序列号，供界面线程查缓存时避免访问 adb server"""
+    return _last_serial
+
+
+def _put(serial: str, path: str, size: int, files: int):
+    global _last_serial
+    with _lock:
+        _last_serial = serial
+        _cache[(serial, _norm(path))] = (time.monotonic(), size, files)
+        if len(_cache) > MAX_ENTRIES:
+            for key, _ in sorted(_cache.items(), key=lambda kv: kv[1][0])[: len(_cache) // 2]:
+                _cache.pop(key, None)
+
+
+def invalidate(paths: Iterable[str], serial: Optional[str] = None):
+    """失效给定路径、其全部上级目录（总大小随之改变）与全部子路径；serial 为 None 时对所有设备生效"""
+    targets = [_norm(p) for p in paths if p]
+    if not targets:
+        return
+    with _lock:
+        for key in list(_cache):
+            s, p = key
+            if serial is not None and s != serial:
+                continue
+            for t in targets:
+                if p == t or t.startswith(p.rstrip("/") + "/") or p.startswith(t.rstrip("/") + "/"):
+                    _cache.pop(key, None)
+                    break
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+
+
+def measure(paths: List[str], serial: str = "", timeout: int = 120) -> Dict[str, Tuple[int, int]]:
+    """
+    一次 shell 调用统计多个路径，返回 {路径: (字节数, 文件数)}；路径不存在时为 (0, 0)
+    :param paths: 设备端文件或目录路径
+    :param serial: 设备序列号，空字符串表示唯一连接的设备
+    :param timeout: 超时秒数
+    """
+    roots = [_norm(p) for p in paths]
+    if not roots:
+        return {}
+    # -H 使作为起点的符号链接（如 /sdcard）被跟随；逐文件输出 "大小 路径"，在电脑端按起点归并
+    script = (
+        "find -H " + " ".join(shlex.quote(r) for r in roots)
+        + " -type f -exec stat -c '%s %n' {} + 2>/dev/null"
+    )
+    args = (["-s", serial] if serial else []) + ["shell", script]
+    rc, out = adb_service.run_adb(args, timeout=timeout)
+    if rc in (124, 127):
+        raise RuntimeError(out)
+    totals = {r: [0, 0] for r in roots}
+    seen = set()
+    for line in out.splitlines():
+        size, _, name = line.partition(" ")
+        # 起点相互嵌套时同一文件会被 find 输出多次
+        if not size.isdigit() or not name or name in seen:
+            continue
+        seen.add(name)
+        # 嵌套的起点各自计数
+        for r in roots:
+            if name == r or name.startswith(r.rstrip("/") + "/"):
+                totals[r][0] += int(size)
+                totals[r][1] += 1
+    return {r: (v[0], v[1]) for r, v in totals.items()}
+
+
+def dir_size(path: str, use_cache: bool = True, serial: Optional[str] = None) -> Tuple[int, int]:
+    """带缓存的单路径统计，返回 (字节数, 文件数)"""
+    serial = adb_sync.current_serial() if serial is None else serial
+    if use_cache:
+        hit = get_cached(path, serial)
+        if hit is not None:
+            return hit
+    size, files = measure([path], serial)[_norm(path)]
+    _put(serial, path, size, files)
+    return size, files
+
+
+def prefetch(paths: List[str], callback=None):
+    """后台统计尚未缓存的路径；新一次预取开始后旧任务自动放弃。callback(路径, 字节数, 文件数) 在后台线程调用"""
+    global _generation
+    with _lock:
+        _generation += 1
+        gen = _generation
+    if paths:
+        _pool.submit(_prefetch_run, [_norm(p) for p in paths], gen, callback)
+
+
+def _prefetch_run(paths: List[str], gen: int, callback):
+    if gen != _generation:
+        return
+    try:
+        serial = adb_sync.current_serial()
+        if not serial:
+            return
+        todo = []
+        for p in paths:
+            hit = get_cached(p, serial)
+            if hit is not None:
+                if callback:
+                    callback(p, *hit)
+            else:
+                todo.append(p)
+        if not todo or gen != _generation:
+            return
+        for p, (size, files) in measure(todo, serial).items():
+            _put(serial, p, size, files)
+            if callback and gen == _generation:
+                callback(p, size, files)
+    except Exception:
+        pass
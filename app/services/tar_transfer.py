@@ -0,0 +1,256 @@
+"""
+tar 流批量传输
+大量小文件的目录整体打成一个 tar 流：拉取时设备端 tar 经 exec-out 输出、电脑端边收边解包；
+推送时电脑端边打包边经 exec-in 写给设备端 tar 解包。可选设备端 gzip 压缩，文件修改时间随 tar 保留。
+"""
+import os
+import shlex
+import subprocess
+import tarfile
+import time
+import uuid
+from typing import Callable, List, Optional, Tuple
+
+from app.services import adb_service, size_service
+from app.services.adb_sync import SyncConnection
+
+
+PIPE_BUFFER = 1024 * 1024
+DEVICE_TMP = "/data/local/tmp"
+_MARK_ERR = "@@TAR_ERR@@"
+
+
+class _Progress:
+    def __init__(self, total: int, total_files: int, callback: Optional[Callable[[dict], None]]):
+        self.total = total
+        self.total_files = total_files
+        self.callback = callback
+        self.bytes = 0
+        self.files = 0
+        self.failed = 0
+        self.current = ""
+        self._t0 = time.perf_counter()
+        self._last = 0.0
+
+    def step(self, name: str, size: int, ok: bool = True):
+        self.current = name
+        if ok:
+            self.files += 1
+            self.bytes += size
+        else:
+            self.failed += 1
+        self.emit()
+
+    def emit(self, force: bool = False):
+        now = time.perf_counter()
+        if self.callback and (force or now - self._last >= 0.1):
+            self._last = now
+            self.callback({
+                "bytes": self.bytes,
+                "total": self.total,
+                "rate": self.bytes / max(now - self._t0, 1e-6),
+                "files": self.files,
+                "total_files": self.total_files,
+                "failed": self.failed,
+                "current": self.current,
+            })
+
+
+def _adb() -> str:
+    return str(adb_service.ADB_BIN) if adb_service.ADB_BIN.exists() else "adb"
+
+
+def _adb_cmd(serial: str) -> list:
+    return [_adb()] + (["-s", serial] if serial else [])
+
+
+def _safe_member(member: tarfile.TarInfo, dest: str) -> bool:
+    target = os.path.realpath(os.path.join(dest, member.name))
+    root = os.path.realpath(dest)
+    if os.path.isabs(member.name) or not (target == root or target.startswith(root + os.sep)):
+        return False
+    return member.isfile() or member.isdir()
+
+
+def _extract_kwargs() -> dict:
+    # Python 3.12+（及 3.11.4+）支持解包过滤器，进一步拒绝越界链接与设备文件
+    return {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+
+
+class TarTransfer:
+    """一次 tar 流传输；可从其他线程 cancel()，直接结束 adb 进程使阻塞的读写立即返回"""
+
+    def __init__(self, serial: str = "", compress: bool = False, progress: Optional[Callable[[dict], None]] = None):
+        """
+        :param serial: 设备序列号，空字符串表示唯一连接的设备
+        :param compress: 是否在设备端 gzip 压缩（适合文档类，照片视频基本无收益）
+        :param progress: 汇总进度回调，字段与 transfer_queue 相同
+        """
+        self.serial = serial
+        self.compress = compress
+        self._progress = progress
+        self._proc: Optional[subprocess.Popen] = None
+        self._stopped = False
+        self.errors: List[str] = []  # 最近一次拉取时设备端 tar 的错误输出
+
+    def cancel(self):
+        self._stopped = True
+        proc = self._proc
+        if proc is not None and proc.poll() is None:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+
+    def _check_stop(self):
+        if self._stopped:
+            raise InterruptedError("已取消")
+
+    def _read_status(self, token: str) -> Tuple[str, List[str]]:
+        """读取并清理设备端记录的 tar 退出码与错误输出；读不到时退出码为空"""
+        rc, out = adb_service.run_adb(
+            (["-s", self.serial] if self.serial else []) + [
+                "shell",
+                f"cat {token}.rc 2>/dev/null; echo {_MARK_ERR}; head -c 4096 {token}.err 2>/dev/null; "
+                f"rm -f {token}.rc {token}.err",
+            ],
+            timeout=15,
+        )
+        if rc != 0 or _MARK_ERR not in out:
+            return "", []
+        code, _, err = out.partition(_MARK_ERR)
+        return code.strip(), [ln.strip() for ln in err.splitlines() if ln.strip()]
+
+    def pull(self, remote: str, local_parent: str) -> int:
+        """
+        把远端文件或目录整体拉到 local_parent 下（保留原名），返回失败的文件数
+        设备端 tar 读不了的文件不会出现在数据流中：按 tar 退出码与统计的文件数补记为失败，错误输出见 errors
+        """
+        self._stopped = False
+        self.errors = []
+        remote = remote.rstrip("/") or "/"
+        parent, name = os.path.dirname(remote) or "/", os.path.basename(remote)
+        with SyncConnection(self.serial) as conn:
+            st = conn.stat(remote)
+            if not st.exists:
+                raise RuntimeError(f"远端路径不存在: {remote}")
+        if st.is_dir:
+            # 一次 shell 调用得到总量，选中时已在后台统计过则直接命中缓存
+            total, count = size_service.dir_size(remote, serial=self.serial or None)
+        else:
+            total, count = st.size, 1
+        prog = _Progress(total, count, self._progress)
+
+        flag = "z" if self.compress else ""
+        # exec-out 没有独立的错误通道，退出码与错误输出写到设备端临时文件，传完再取
+        token = f"{DEVICE_TMP}/.toba_tar_{uuid.uuid4().hex[:12]}"
+        script = (
+            f"command -v tar >/dev/null || exit 127; "
+            f"tar -c{flag}f - -C {shlex.quote(parent)} {shlex.quote(name)} 2>{token}.err; echo $? > {token}.rc"
+        )
+        self._check_stop()
+        self._proc = proc = subprocess.Popen(
+            _adb_cmd(self.serial) + ["exec-out", script],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=PIPE_BUFFER,
+            **adb_service._silent_kwargs()
+        )
+        os.makedirs(local_parent, exist_ok=True)
+        try:
+            try:
+                tar = tarfile.open(fileobj=proc.stdout, mode="r|gz" if self.compress else "r|")
+            except (tarfile.ReadError, EOFError):
+                self._check_stop()
+                raise RuntimeError("设备端没有输出 tar 数据（缺少 tar 命令或无读取权限），请改用普通传输")
+            with tar:
+                for member in tar:
+                    self._check_stop()
+                    if not _safe_member(member, local_parent):
+                        continue
+                    try:
+                        # 逐个成员流式解包；tar 自带的修改时间由 extract 恢复
+                        tar.extract(member, local_parent, set_attrs=True, numeric_owner=True, **_extract_kwargs())
+                    except OSError:
+                        self._check_stop()
+                        if member.isfile():
+                            prog.step(member.name, member.size, ok=False)
+                        continue
+                    if member.isfile():
+                        prog.step(member.name, member.size)
+        except (tarfile.TarError, EOFError):
+            self._check_stop()
+            raise RuntimeError("tar 数据流意外中断")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+            self._proc = None
+            code, self.errors = self._read_status(token)
+        self._check_stop()
+        missing = max(count - prog.files - prog.failed, 0)
+        if code not in ("", "0"):
+            missing = max(missing, len(self.errors), 1)
+        prog.failed += missing
+        prog.emit(force=True)
+        return prog.failed
+
+    def push(self, local: str, remote_dir: str) -> int:
+        """把本地文件或目录整体推送到远端目录 remote_dir 下，返回读取失败而跳过的文件数"""
+        self._stopped = False
+        local = os.path.normpath(local)
+        entries = []
+        if os.path.isdir(local):
+            for dirpath, _, filenames in os.walk(local):
+                rel_dir = os.path.relpath(dirpath, os.path.dirname(local))
+                entries.append((dirpath, rel_dir, True))
+                for fn in filenames:
+                    entries.append((os.path.join(dirpath, fn), os.path.join(rel_dir, fn), False))
+        else:
+            entries.append((local, os.path.basename(local), False))
+        sizes = {path: os.path.getsize(path) for path, _, is_dir in entries if not is_dir}
+        prog = _Progress(sum(sizes.values()), len(sizes), self._progress)
+
+        flag = "z" if self.compress else ""
+        q_dir = shlex.quote(remote_dir)
+        self._check_stop()
+        self._proc = proc = subprocess.Popen(
+            _adb_cmd(self.serial) + ["exec-in", f"mkdir -p {q_dir} && tar -x{flag}f - -C {q_dir}"],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, bufsize=PIPE_BUFFER,
+            **adb_service._silent_kwargs()
+        )
+        try:
+            with tarfile.open(fileobj=proc.stdin, mode="w|gz" if self.compress else "w|") as tar:
+                for path, arcname, is_dir in entries:
+                    self._check_stop()
+                    arcname = arcname.replace(os.sep, "/")
+                    if is_dir:
+                        tar.add(path, arcname, recursive=False)
+                        continue
+                    try:
+                        info = tar.gettarinfo(path, arcname)
+                        info.uid = info.gid = 0
+                        info.uname = info.gname = ""
+                        with open(path, "rb") as f:
+                            tar.addfile(info, f)
+                    except BrokenPipeError:
+                        raise
+                    except OSError:
+                        prog.step(arcname, 0, ok=False)
+                        continue
+                    prog.step(arcname, sizes[path])
+            proc.stdin.close()
+            if proc.wait() != 0:
+                err = proc.stderr.read().decode("utf-8", errors="replace").strip()
+                raise RuntimeError(f"设备端解包失败: {err or proc.returncode}")
+        except (BrokenPipeError, ValueError):
+            # ValueError: cancel() 结束进程后写入已关闭的管道
+            self._check_stop()
+            err = proc.stderr.read().decode("utf-8", errors="replace").strip() if proc.poll() is not None else ""
+            raise RuntimeError(f"设备端 tar 中断: {err or '连接断开'}")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            self._proc = None
+        prog.emit(force=True)
+        return prog.failed
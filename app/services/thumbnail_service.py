@@ -0,0 +1,283 @@
+"""
+设备图片缩略图
+只读取文件开头一段字节：JPEG 优先取 EXIF 内嵌缩略图，取不到且文件不大时再整文件拉取解码；
+多个文件的开头字节合并为一次 exec-out 读取。解码在线程池中用 Pillow 完成，
+结果按 设备 + 路径 + 修改时间 + 大小 存入磁盘缓存，超出容量时淘汰最久未用的条目。
+"""
+import hashlib
+import io
+import os
+import shlex
+import struct
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from app.services import adb_service
+from app.services.adb_service import CACHE_DIR, _silent_kwargs
+from app.services.adb_sync import SyncConnection, current_serial
+
+
+THUMB_CACHE_DIR = CACHE_DIR / "thumbs"
+THUMB_SIZE = 128
+HEAD_BYTES = 64 * 1024  # EXIF 段（APP1）最长 64 KB
+FULL_FETCH_LIMIT = 12 * 1024 * 1024  # 没有内嵌缩略图时，整文件拉取的上限
+FETCH_BATCH = 16
+MAX_CACHE_BYTES = 200 * 1024 * 1024
+
+IMAGE_EXTS = {"jpg", "jpeg", "png", "webp", "gif", "bmp"}
+_EXIF_EXTS = {"jpg", "jpeg"}
+
+_decode_pool = ThreadPoolExecutor(max_workers=max(2, min(4, os.cpu_count() or 2)), thread_name_prefix="thumb-decode")
+_fetch_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumb-fetch")
+_lock = threading.Lock()
+_generation = 0
+_writes = 0
+
+
+def _ext(name: str) -> str:
+    return os.path.splitext(name)[1].lstrip(".").lower()
+
+
+def is_supported(name: str) -> bool:
+    return _ext(name) in IMAGE_EXTS
+
+
+def available() -> bool:
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def cache_path(serial: str, path: str, mtime: int, size: int):
+    key = hashlib.sha1(f"{serial}|{path}|{mtime}|{size}".encode("utf-8")).hexdigest()
+    return THUMB_CACHE_DIR / key[:2] / f"{key}.jpg"
+
+
+def cached(serial: str, path: str, mtime: int, size: int) -> Optional[str]:
+    """已缓存的缩略图文件路径；命中时更新其时间，供 LRU 淘汰"""
+    p = cache_path(serial, path, mtime, size)
+    try:
+        os.utime(p, None)
+        return str(p)
+    except OSError:
+        return None
+
+
+def _trim_cache():
+    files = []
+    total = 0
+    for root, _, names in os.walk(THUMB_CACHE_DIR):
+        for n in names:
+            fp = os.path.join(root, n)
+            try:
+                st = os.stat(fp)
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, fp))
+            total += st.st_size
+    if total <= MAX_CACHE_BYTES:
+        return
+    # 淘汰到容量的 80%
+    for _, size, fp in sorted(files):
+        try:
+            os.remove(fp)
+        except OSError:
+            continue
+        total -= size
+        if total <= MAX_CACHE_BYTES * 0.8:
+            break
+
+
+def exif_thumbnail(head: bytes) -> Optional[Tuple[bytes, int]]:
+    """从 JPEG 开头字节中取出 EXIF IFD1 内嵌的 JPEG 缩略图，返回 (缩略图, 主图方向)"""
+    if head[:2] != b"\xff\xd8":
+        return None
+    pos = 2
+    while pos + 4 <= len(head) and head[pos] == 0xFF:
+        marker = head[pos + 1]
+        seg_len = struct.unpack(">H", head[pos + 2:pos + 4])[0]
+        if marker == 0xE1 and head[pos + 4:pos + 10] == b"Exif\x00\x00":
+            tiff = head[pos + 10:pos + 2 + seg_len]
+            return _ifd1_thumbnail(tiff)
+        if marker in (0xDA, 0xD9):  # 图像数据开始，之后不会再有 APP 段
+            return None
+        pos += 2 + seg_len
+    return None
+
+
+def _ifd1_thumbnail(tiff: bytes) -> Optional[Tuple[bytes, int]]:
+    if len(tiff) < 8 or tiff[:2] not in (b"II", b"MM"):
+        return None
+    e = "<" if tiff[:2] == b"II" else ">"
+    try:
+        ifd0 = struct.unpack(e + "I", tiff[4:8])[0]
+        count = struct.unpack(e + "H", tiff[ifd0:ifd0 + 2])[0]
+        orientation = 1
+        for i in range(count):
+            entry = tiff[ifd0 + 2 + i * 12:ifd0 + 14 + i * 12]
+            if struct.unpack(e + "H", entry[:2])[0] == 0x0112:
+                # SHORT 类型的值位于 4 字节值域的开头
+                orientation = struct.unpack(e + "H", entry[8:10])[0]
+                break
+        next_off = ifd0 + 2 + count * 12
+        ifd1 = struct.unpack(e + "I", tiff[next_off:next_off + 4])[0]
+        if not ifd1:
+            return None
+        count = struct.unpack(e + "H", tiff[ifd1:ifd1 + 2])[0]
+        offset = length = 0
+        for i in range(count):
+            entry = tiff[ifd1 + 2 + i * 12:ifd1 + 14 + i * 12]
+            tag, _typ, _n, value = struct.unpack(e + "HHII", entry)
+            if tag == 0x0201:
+                offset = value
+            elif tag == 0x0202:
+                length = value
+        data = tiff[offset:offset + length] if offset and length else b""
+        return (data, orientation) if data[:2] == b"\xff\xd8" else None
+    except struct.error:
+        return None
+
+
+def _read_heads(paths: List[str], sizes: List[int], serial: str) -> List[bytes]:
+    """一次 exec-out 读取多个文件的开头；每个文件补零到固定长度，按长度切分"""
+    parts = []
+    for p in paths:
+        q = shlex.quote(p)
+        # 读不到或不足 HEAD_BYTES 时用 /dev/zero 补齐，保证每个文件恰好占 HEAD_BYTES 字节
+        parts.append(f"{{ head -c {HEAD_BYTES} {q} 2>/dev/null; head -c {HEAD_BYTES} /dev/zero; }} | head -c {HEAD_BYTES}")
+    adb = str(adb_service.ADB_BIN) if adb_service.ADB_BIN.exists() else "adb"
+    cmd = [adb] + (["-s", serial] if serial else []) + ["exec-out", "; ".join(parts)]
+    out = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=60, **_silent_kwargs()).stdout
+    heads = []
+    for i, size in enumerate(sizes):
+        chunk = out[i * HEAD_BYTES:(i + 1) * HEAD_BYTES]
+        heads.append(chunk[:min(size, HEAD_BYTES)] if size else chunk)
+    return heads
+
+
+def _pull_bytes(conn: SyncConnection, path: str, tmp_dir: str) -> bytes:
+    local = os.path.join(tmp_dir, hashlib.sha1(path.encode("utf-8")).hexdigest())
+    try:
+        conn.pull_file(path, local)
+        with open(local, "rb") as f:
+            return f.read()
+    finally:
+        try:
+            os.remove(local)
+        except OSError:
+            pass
+
+
+# EXIF 方向值对应的变换
+_ORIENTATION_OPS = {2: "FLIP_LEFT_RIGHT", 3: "ROTATE_180", 4: "FLIP_TOP_BOTTOM", 5: "TRANSPOSE",
+                    6: "ROTATE_270", 7: "TRANSVERSE", 8: "ROTATE_90"}
+
+
+def _decode(data: bytes, dest, orientation: int = 0) -> bool:
+    """orientation 为 0 时使用图片自身的 EXIF 方向（整图解码），否则按给定方向旋转（内嵌缩略图）"""
+    from PIL import Image, ImageOps
+    try:
+        with Image.open(io.BytesIO(data)) as im:
+            # JPEG 按目标尺寸缩小解码，大图也很快
+            im.draft("RGB", (THUMB_SIZE * 2, THUMB_SIZE * 2))
+            if orientation in _ORIENTATION_OPS:
+                im = im.transpose(getattr(Image.Transpose, _ORIENTATION_OPS[orientation]))
+            elif not orientation:
+                im = ImageOps.exif_transpose(im)
+            im.thumbnail((THUMB_SIZE, THUMB_SIZE))
+            if im.mode not in ("RGB", "L"):
+                im = im.convert("RGB")
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp = dest.with_suffix(".tmp")
+            im.save(tmp, "JPEG", quality=80)
+            os.replace(tmp, dest)
+            return True
+    except Exception:
+        return False
+
+
+def cancel_pending():
+    """放弃尚未开始的请求（如切换了目录）"""
+    global _generation
+    with _lock:
+        _generation += 1
+
+
+def request(entries: List[dict], callback: Callable[[str, str], None]):
+    """
+    后台生成缩略图
+    :param entries: [{path, size, mtime}]，设备端图片文件
+    :param callback: callback(设备端路径, 缩略图文件路径)，在后台线程调用；失败的条目不回调
+    """
+    with _lock:
+        gen = _generation
+    if entries:
+        _fetch_pool.submit(_fetch_run, list(entries), gen, callback)
+
+
+def _fetch_run(entries: List[dict], gen: int, callback):
+    global _writes
+    if gen != _generation or not available():
+        return
+    serial = current_serial()
+    todo = []
+    for e in entries:
+        hit = cached(serial, e["path"], e["mtime"], e["size"])
+        if hit:
+            callback(e["path"], hit)
+        else:
+            todo.append(e)
+
+    def _finish(e: dict, data: Optional[bytes], orientation: int = 0):
+        dest = cache_path(serial, e["path"], e["mtime"], e["size"])
+        if data and _decode(data, dest, orientation):
+            callback(e["path"], str(dest))
+
+    full = []
+    for i in range(0, len(todo), FETCH_BATCH):
+        if gen != _generation:
+            return
+        batch = [e for e in todo[i:i + FETCH_BATCH] if _ext(e["path"]) in _EXIF_EXTS]
+        try:
+            heads = _read_heads([e["path"] for e in batch], [e["size"] for e in batch], serial) if batch else []
+        except Exception:
+            heads = [b""] * len(batch)
+        for e, head in zip(batch, heads):
+            thumb = exif_thumbnail(head)
+            if thumb:
+                _decode_pool.submit(_finish, e, *thumb)
+            elif e["size"] <= HEAD_BYTES and head:
+                _decode_pool.submit(_finish, e, head)
+            else:
+                full.append(e)
+        full.extend(e for e in todo[i:i + FETCH_BATCH] if _ext(e["path"]) not in _EXIF_EXTS)
+
+    # 没有内嵌缩略图的图片：不超过上限时整文件拉取
+    full = [e for e in full if 0 < e["size"] <= FULL_FETCH_LIMIT]
+    if full and gen == _generation:
+        tmp_dir = str(THUMB_CACHE_DIR / "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        try:
+            with SyncConnection(serial) as conn:
+                for e in full:
+                    if gen != _generation:
+                        break
+                    try:
+                        data = _pull_bytes(conn, e["path"], tmp_dir)
+                    except Exception:
+                        continue
+                    _decode_pool.submit(_finish, e, data)
+        except Exception:
+            pass
+
+    with _lock:
+        _writes += len(todo)
+        trim = _writes >= 200
+        if trim:
+            _writes = 0
+    if trim:
+        _decode_pool.submit(_trim_cache)
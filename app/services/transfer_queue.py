@@ -0,0 +1,270 @@
+"""
+并发文件传输队列
+把若干 pull / push 任务（文件或整个目录）展开为单个文件条目，由多个工作线程并行传输；
+每个线程持有自己的 sync 连接并复用它传完所有分到的文件，省去每个文件启动一次 adb 进程的开销。
+失败的条目重连后自动重试，汇总字节进度、速率与完成数。
+"""
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from app.services import adb_service
+from app.services.adb_sync import SyncConnection, SyncError, join_remote, remote_tree
+
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 2
+
+PULL = "pull"
+PUSH = "push"
+
+
+class TransferItem:
+    __slots__ = ("direction", "src", "dst", "size", "mode", "mtime", "status", "error", "attempts", "done")
+
+    def __init__(self, direction: str, src: str, dst: str, size: int = 0, mode: int = 0o644, mtime: int = 0):
+        self.direction = direction
+        self.src = src
+        self.dst = dst
+        self.size = size
+        self.mode = mode
+        self.mtime = mtime
+        self.status = "pending"  # pending | running | done | failed
+        self.error = ""
+        self.attempts = 0
+        self.done = 0
+
+
+class TransferQueue:
+    """并发传输队列；run() 阻塞直到全部完成，可从其他线程 cancel()"""
+
+    def __init__(
+        self,
+        serial: str = "",
+        concurrency: int = DEFAULT_CONCURRENCY,
+        retries: int = DEFAULT_RETRIES,
+        progress: Optional[Callable[[dict], None]] = None,
+        item_callback: Optional[Callable[[TransferItem], None]] = None,
+    ):
+        """
+        :param serial: 设备序列号，空字符串表示唯一连接的设备
+        :param concurrency: 并发传输流数
+        :param retries: 单个文件失败后的重试次数
+        :param progress: 汇总进度回调 {bytes, total, rate, files, total_files, failed, current}，最多每 0.1 秒一次
+        :param item_callback: 条目状态变化回调（开始 / 完成 / 失败）
+        """
+        self.serial = serial
+        self.concurrency = max(1, int(concurrency))
+        self.retries = max(0, int(retries))
+        self._progress = progress
+        self._item_cb = item_callback
+        self._jobs: List[tuple] = []
+        self.items: List[TransferItem] = []
+        self._lock = threading.Lock()
+        self._conns: List[SyncConnection] = []
+        self._stopped = False
+        self._bytes = 0
+        self._total = 0
+        self._files_done = 0
+        self._failed = 0
+        self._current = ""
+        self._t0 = 0.0
+        self._last_emit = 0.0
+
+    # ---------- 添加任务 ----------
+    def add_pull(self, remote: str, local: str):
+        """拉取远端文件或目录到 local（local 为目标文件 / 目录本身的路径）"""
+        self._jobs.append((PULL, remote, local))
+
+    def add_push(self, local: str, remote_dir: str):
+        """推送本地文件或目录到远端目录 remote_dir 下（与 adb push x dir/ 相同）"""
+        self._jobs.append((PUSH, local, remote_dir))
+
+    def _expand(self, conn: SyncConnection) -> List[Tuple[str, str]]:
+        """把任务展开为文件条目，返回需要在设备上单独创建的空目录 [(本地目录, 远端目录)]"""
+        empty_remote_dirs: List[Tuple[str, str]] = []
+        for direction, src, dst in self._jobs:
+            if direction == PULL:
+                st = conn.stat(src)
+                if not st.exists:
+                    raise SyncError(f"远端路径不存在: {src}")
+                if st.is_dir:
+                    files, dirs = remote_tree(conn, src)
+                    os.makedirs(dst, exist_ok=True)
+                    for rel in dirs:
+                        os.makedirs(os.path.join(dst, *rel.split("/")), exist_ok=True)
+                    for rel, e in files:
+                        self.items.append(TransferItem(
+                            PULL, join_remote(src, rel), os.path.join(dst, *rel.split("/")), e.size, e.mode, e.mtime
+                        ))
+                else:
+                    if os.path.isdir(dst):
+                        dst = os.path.join(dst, os.path.basename(src.rstrip("/")))
+                    self.items.append(TransferItem(PULL, src, dst, st.size, st.mode, st.mtime))
+                continue
+            base = join_remote(dst, os.path.basename(os.path.normpath(src)))
+            if not os.path.isdir(src):
+                self.items.append(TransferItem(PUSH, src, base, os.path.getsize(src), self._local_mode(src)))
+                continue
+            for dirpath, dirnames, filenames in os.walk(src):
+                rel_dir = os.path.relpath(dirpath, src)
+                remote_dir = base if rel_dir == "." else join_remote(base, rel_dir.replace(os.sep, "/"))
+                if not dirnames and not filenames:
+                    empty_remote_dirs.append((dirpath, remote_dir))
+                for fn in filenames:
+                    path = os.path.join(dirpath, fn)
+                    self.items.append(TransferItem(
+                        PUSH, path, join_remote(remote_dir, fn), os.path.getsize(path), self._local_mode(path)
+                    ))
+        return empty_remote_dirs
+
+    @staticmethod
+    def _local_mode(path: str) -> int:
+        return os.stat(path).st_mode & 0o777 if os.name != "nt" else 0o644
+
+    # ---------- 进度 ----------
+    def _on_bytes(self, item: TransferItem, n: int):
+        with self._lock:
+            item.done += n
+            self._bytes += n
+        self._emit()
+
+    def _emit(self, force: bool = False):
+        now = time.perf_counter()
+        if not self._progress or (not force and now - self._last_emit < 0.1):
+            return
+        self._last_emit = now
+        with self._lock:
+            info = {
+                "bytes": self._bytes,
+                "total": self._total,
+                "rate": self._bytes / max(now - self._t0, 1e-6),
+                "files": self._files_done,
+                "total_files": len(self.items),
+                "failed": self._failed,
+                "current": self._current,
+            }
+        self._progress(info)
+
+    def _set_status(self, item: TransferItem, status: str, error: str = ""):
+        item.status = status
+        item.error = error
+        if self._item_cb:
+            self._item_cb(item)
+
+    # ---------- 执行 ----------
+    def cancel(self):
+        self._stopped = True
+        with self._lock:
+            conns = list(self._conns)
+        for conn in conns:
+            conn.abort()
+
+    def _open_conn(self) -> SyncConnection:
+        conn = SyncConnection(self.serial)
+        with self._lock:
+            self._conns.append(conn)
+        return conn
+
+    def _close_conn(self, conn: Optional[SyncConnection]):
+        if conn is None:
+            return
+        with self._lock:
+            if conn in self._conns:
+                self._conns.remove(conn)
+        conn.close()
+
+    def _transfer(self, conn: SyncConnection, item: TransferItem):
+        should_stop = lambda: self._stopped
+        if item.direction == PULL:
+            os.makedirs(os.path.dirname(item.dst) or ".", exist_ok=True)
+            conn.pull_file(item.src, item.dst, lambda n: self._on_bytes(item, n), should_stop, item.mtime)
+        else:
+            conn.push_file(item.src, item.dst, item.mode, lambda n: self._on_bytes(item, n), should_stop)
+
+    def _worker(self, q: "queue.Queue[TransferItem]"):
+        conn = None
+        try:
+            while not self._stopped:
+                try:
+                    item = q.get_nowait()
+                except queue.Empty:
+                    return
+                item.attempts += 1
+                self._current = os.path.basename(item.src)
+                self._set_status(item, "running")
+                try:
+                    if conn is None:
+                        conn = self._open_conn()
+                    self._transfer(conn, item)
+                except (OSError, SyncError) as e:
+                    # 连接状态已不可信，丢弃后重连；已计入的字节回退
+                    self._close_conn(conn)
+                    conn = None
+                    with self._lock:
+                        self._bytes -= item.done
+                        item.done = 0
+                    if self._stopped:
+                        return
+                    if item.attempts <= self.retries:
+                        self._set_status(item, "pending", str(e))
+                        q.put(item)
+                        continue
+                    with self._lock:
+                        self._failed += 1
+                    self._set_status(item, "failed", str(e) or type(e).__name__)
+                    continue
+                with self._lock:
+                    self._files_done += 1
+                self._set_status(item, "done")
+                self._emit()
+        finally:
+            self._close_conn(conn)
+
+    def _make_empty_dirs(self, dirs: List[Tuple[str, str]]):
+        """在设备上一次性创建空目录；失败的目录作为失败条目计入结果"""
+        if not dirs:
+            return
+        results = adb_service.batch_ops([("mkdir", remote) for _, remote in dirs], serial=self.serial)
+        for (local, remote), (ok, out) in zip(dirs, results):
+            if ok:
+                continue
+            item = TransferItem(PUSH, local, remote, 0, 0o755)
+            item.attempts = 1
+            self.items.append(item)
+            with self._lock:
+                self._failed += 1
+            self._set_status(item, "failed", out.strip() or "创建目录失败")
+
+    def run(self) -> List[TransferItem]:
+        """执行全部任务，返回失败的条目；取消时抛出 InterruptedError"""
+        self._stopped = False
+        self._t0 = time.perf_counter()
+        conn = self._open_conn()
+        try:
+            empty_dirs = self._expand(conn)
+        finally:
+            self._close_conn(conn)
+        self._make_empty_dirs(empty_dirs)
+        self._total = sum(it.size for it in self.items)
+        self._emit(force=True)
+
+        q: "queue.Queue[TransferItem]" = queue.Queue()
+        # 大文件先发，避免最后只剩一个大文件单线程传输
+        for item in sorted(self.items, key=lambda it: it.size, reverse=True):
+            if item.status == "pending":
+                q.put(item)
+        workers = [
+            threading.Thread(target=self._worker, args=(q,), daemon=True)
+            for _ in range(min(self.concurrency, max(1, len(self.items))))
+        ]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        self._emit(force=True)
+        if self._stopped:
+            raise InterruptedError("已取消")
+        return [it for it in self.items if it.status != "done"]
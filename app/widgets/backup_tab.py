@@ -2,9 +2,9 @@ import os
 import time
 import subprocess
 import shutil
-import zipfile
-from pathlib import Path
-from typing import List, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QFileDialog, 
@@ -14,15 +14,20 @@ from PySide6.QtCore import Qt, QThread, QObject, Signal
 from qfluentwidgets import (
     CardWidget, PrimaryPushButton, PushButton, InfoBar, InfoBarPosition,
     FluentIcon, MessageDialog, SmoothScrollArea, MessageBoxBase, SubtitleLabel,
-    StrongBodyLabel, CaptionLabel, ExpandGroupSettingCard, SwitchButton
+    StrongBodyLabel, CaptionLabel, ExpandGroupSettingCard, SwitchButton, ComboBox
 )
 
 from app.services import adb_service as svc
+from app.services import backup_service
+from app.services import partition_service
+from app.services import snapshot_service
+from app.services.payload_service import format_size
+from app.logic import BackupRestoreLogic
 
 # ----------------- Workers -----------------
 
 class _ScanWorker(QObject):
-    finished = Signal(list, str)  # partitions, error_msg
+    finished = Signal(dict, str)  # partition table, error_msg
     log = Signal(str)
 
     def __init__(self, adb_path: str, serial: str):
@@ -71,7 +76,7 @@ class _ScanWorker(QObject):
             
             # 0. Check ADB Path
             if not os.path.exists(self.adb_path):
-                self.finished.emit([], f"ADB executable not found at: {self.adb_path}")
+                self.finished.emit({}, f"ADB executable not found at: {self.adb_path}")
                 return
 
             self.log.emit("检查 Root 权限...")
@@ -85,59 +90,26 @@ class _ScanWorker(QObject):
                 res_su = self._adb_shell("su -c id", timeout=8)
                 print(f"[DEBUG] su check result: {res_su}")
                 if "uid=0" not in res_su:
-                    self.finished.emit([], "未获取到 Root 权限，无法读取分区表。")
+                    self.finished.emit({}, "未获取到 Root 权限，无法读取分区表。")
                     return
             except Exception as e:
                 print(f"[DEBUG] Root check failed: {e}")
-                self.finished.emit([], f"Root 权限检查失败: {e}\n请确认设备已 Root 并授予 Shell 权限。")
+                self.finished.emit({}, f"Root 权限检查失败: {e}\n请确认设备已 Root 并授予 Shell 权限。")
                 return
 
-            self.log.emit("正在查找分区路径...")
-            # 2. Find partitions
-            search_paths = [
-                "/dev/block/bootdevice/by-name",
-                "/dev/block/by-name",
-                "/dev/block/platform/*/by-name"
-            ]
-            
-            partitions = []
-            
-            for p in search_paths:
-                try:
-                    if '*' in p:
-                        base = p.split('*')[0]
-                        self.log.emit(f"解析通配符: {p}")
-                        ls_base = self._adb_shell(f"ls -d {base}* 2>/dev/null", timeout=5).strip()
-                        if ls_base and "No such" not in ls_base:
-                            lines = ls_base.splitlines()
-                            if lines:
-                                p = lines[0].strip() + "/by-name"
-                    
-                    self.log.emit(f"扫描路径: {p}")
-                    # Use ls -1 to ensure one entry per line
-                    res = self._adb_shell(f"ls -1 {p}", timeout=5)
-                    if res and "No such file" not in res and "Permission denied" not in res:
-                        found = [x.strip() for x in res.split() if x.strip()]
-                        # Filter out obviously wrong entries
-                        partitions = [x for x in found if not x.startswith('/') and not x.startswith('ls:') and x]
-                        if partitions:
-                            self.log.emit(f"成功找到 {len(partitions)} 个分区。")
-                            break
-                except Exception as e:
-                    print(f"[DEBUG] Path {p} scan error: {e}")
-                    self.log.emit(f"路径 {p} 扫描出错: {e}")
-                    continue
-            
-            if not partitions:
-                self.finished.emit([], "无法找到分区路径 (/dev/block/by-name 等)。")
-            else:
-                # Sort partitions
-                partitions.sort()
-                self.finished.emit(partitions, "")
+            self.log.emit("正在读取分区表...")
+            # 2. by-name 目录与分区大小一次读取，按 serial + boot_id 缓存
+            try:
+                table = partition_service.scan_partitions(self.adb_path, self.serial)
+            except Exception as e:
+                self.finished.emit({}, str(e))
+                return
+            self.log.emit(f"分区路径: {table['by_name']}，共 {len(table['partitions'])} 个分区。")
+            self.finished.emit(table, "")
                 
         except Exception as e:
             print(f"[DEBUG] ScanWorker exception: {e}")
-            self.finished.emit([], f"扫描流程异常: {str(e)}")
+            self.finished.emit({}, f"扫描流程异常: {str(e)}")
 
 
 class _BackupExecutorWorker(QObject):
@@ -145,8 +117,16 @@ class _BackupExecutorWorker(QObject):
     progress = Signal(int, int)  # current, total
     finished = Signal(bool, str)
 
+    # 小于该大小的分区并发备份，大分区单独一条通道串行，避免多个大流争抢 USB 带宽
+    SMALL_PARTITION = 64 * 1024 * 1024
+
     def __init__(self, adb_path: str, out_dir: str, serial: str, 
-                 partitions: List[str], use_zip: bool, gen_script: bool):
+                 partitions: List[str], use_zip: bool, gen_script: bool,
+                 block_size: int = backup_service.DEFAULT_BLOCK_SIZE,
+                 fmt: str = backup_service.FORMAT_RAW,
+                 concurrency: int = 4,
+                 incremental: bool = False,
+                 table: Optional[dict] = None):
         super().__init__()
         self.adb_path = adb_path
         self.out_dir = out_dir
@@ -154,34 +134,120 @@ class _BackupExecutorWorker(QObject):
         self.partitions = partitions
         self.use_zip = use_zip
         self.gen_script = gen_script
+        self.block_size = block_size
+        self.fmt = fmt
+        self.concurrency = max(1, int(concurrency))
+        self.incremental = incremental
+        self.table = table
         self._stop = False
+        self._lock = threading.Lock()
+        self._done = 0
+        self._bytes = 0
+        self._archive = None
 
     def stop(self):
         self._stop = True
 
-    def _run_cmd(self, cmd: List[str], timeout=30) -> str:
+    def _backup_one(self, part: str, target_path: str, backup_dir: str, expected: int, total: int, results: dict):
+        """备份单个分区（可在线程池中并发调用）"""
+        if self._stop:
+            return
+        self.log.emit(f"正在备份: {part} ...")
+        # dd 输出经 exec-out 直接写入本地文件，设备端不落地
+        file_name = backup_service.backup_file_name(part, self.fmt)
+        local_img = os.path.join(backup_dir, file_name)
+        t0 = time.perf_counter()
         try:
-            if os.name == 'nt':
-                si = subprocess.STARTUPINFO()
-                si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                return subprocess.check_output(
-                    cmd, 
-                    stderr=subprocess.STDOUT, 
-                    timeout=timeout,
-                    startupinfo=si,
-                    creationflags=subprocess.CREATE_NO_WINDOW
-                ).decode('utf-8', errors='ignore').strip()
-            else:
-                return subprocess.check_output(
-                    cmd, 
-                    stderr=subprocess.STDOUT, 
-                    timeout=timeout
-                ).decode('utf-8', errors='ignore').strip()
+            res = backup_service.stream_partition(
+                self.adb_path, self.serial, f"{target_path}/{part}", local_img,
+                block_size=self.block_size, fmt=self.fmt, expected_size=expected,
+                should_stop=lambda: self._stop,
+            )
+        except InterruptedError:
+            return
         except Exception as e:
-            raise RuntimeError(str(e))
+            self.log.emit(f"  - 分区 {part} 备份失败: {e}")
+            with self._lock:
+                self._done += 1
+                done = self._done
+            self.progress.emit(done, total)
+            return
+        elapsed = max(time.perf_counter() - t0, 0.001)
+        size = res["size"]
+        stored = os.path.getsize(local_img)
+        ratio = f"，存储 {stored / 1048576:.1f} MB" if stored != size else ""
+        checked = "，设备端哈希一致" if res["device_sha256"] else ""
+        with self._lock:
+            results[part] = {
+                "name": part,
+                "file": file_name,
+                "format": self.fmt,
+                "size": size,
+                "stored_size": stored,
+                "sha256": res["sha256"],
+                "device_sha256": res["device_sha256"],
+                "file_sha256": res["file_sha256"],
+            }
+            self._done += 1
+            self._bytes += size
+            done = self._done
+        if self._archive is not None:
+            self._archive.add(local_img, self.fmt)
+        self.log.emit(f"  - [{done}/{total}] {part} 完成 {size / 1048576:.1f} MB{ratio}，{size / 1048576 / elapsed:.1f} MB/s{checked}")
+        self.progress.emit(done, total)
 
-    def _adb_shell(self, cmd: str, timeout=60) -> str:
-        return self._run_cmd([self.adb_path, '-s', self.serial, 'shell', cmd], timeout=timeout)
+    def _run_incremental(self, target_path: str, sizes: Dict[str, int], identity: dict):
+        """增量模式：只传输与上一快照相比变化的块"""
+        store = snapshot_service.store_dir(self.out_dir, self.serial)
+        prev = snapshot_service.latest_snapshot(store)
+        prev_parts = (prev or {}).get("partitions", {})
+        if prev:
+            self.log.emit(f"找到上一次快照: {prev.get('created', '')}，仅传输变化的块")
+        else:
+            self.log.emit("未找到历史快照，本次为完整备份")
+
+        total = len(self.partitions)
+        done: Dict[str, dict] = {}
+        sent = 0
+        t_start = time.perf_counter()
+        for idx, part in enumerate(self.partitions):
+            if self._stop:
+                break
+            self.progress.emit(idx + 1, total)
+            size = sizes.get(part, 0)
+            if not size:
+                self.log.emit(f"  - 分区 {part} 大小未知，跳过")
+                continue
+            self.log.emit(f"[{idx+1}/{total}] 计算块哈希: {part} ...")
+            previous = prev_parts.get(part, {}).get("chunks")
+            try:
+                res = snapshot_service.backup_partition(
+                    self.adb_path, self.serial, f"{target_path}/{part}", size, store,
+                    previous=previous, should_stop=lambda: self._stop,
+                )
+            except InterruptedError:
+                break
+            except Exception as e:
+                self.log.emit(f"  - 分区 {part} 增量备份失败: {e}")
+                continue
+            done[part] = res
+            sent += res["transferred"]
+            self.log.emit(
+                f"  - {part}: {res['changed']}/{len(res['chunks'])} 块变化，"
+                f"传输 {res['transferred'] / 1048576:.1f} MB"
+            )
+
+        if self._stop:
+            self.finished.emit(False, "备份已取消")
+            return
+        if not done:
+            self.finished.emit(False, "没有分区备份成功")
+            return
+        snap = snapshot_service.write_snapshot(store, dict(identity, by_name=target_path), done)
+        elapsed = max(time.perf_counter() - t_start, 0.001)
+        self.log.emit(f"增量备份完成: {len(done)} 个分区，实际传输 {sent / 1048576:.1f} MB，用时 {elapsed:.1f}s")
+        self.log.emit(f"快照清单: {snap}")
+        self.finished.emit(True, str(snap.parent.parent))
 
     def run(self):
         try:
@@ -193,140 +259,130 @@ class _BackupExecutorWorker(QObject):
             
             # Prepare local folder
             timestamp = time.strftime("%Y%m%d_%H%M%S")
-            device_model = svc.get_device_info(self.serial).get('model', 'Unknown').replace(' ', '_')
+            dev_info = svc.get_device_info(self.serial)
+            device_model = dev_info.get('model', 'Unknown').replace(' ', '_')
+            # 恢复时据此确认备份来自同一台设备
+            identity = {
+                "model": device_model,
+                "device": dev_info.get('device', ''),
+                "serial": self.serial,
+                "serialno": svc._getprop(self.serial, "ro.serialno"),
+            }
             backup_name = f"Backup_{device_model}_{timestamp}"
             local_backup_dir = os.path.join(self.out_dir, backup_name)
+
+            # 分区表：优先使用扫描时得到的结果，否则读取缓存（设备未重启时不访问设备）
+            table = self.table or partition_service.scan_partitions(self.adb_path, self.serial)
+            target_path = table["by_name"]
+            sizes: Dict[str, int] = table.get("partitions", {})
+            total = len(self.partitions)
+
+            if self.incremental:
+                self._run_incremental(target_path, sizes, identity)
+                return
+
             os.makedirs(local_backup_dir, exist_ok=True)
+            small = [p for p in self.partitions if 0 < sizes.get(p, 0) < self.SMALL_PARTITION]
+            large = [p for p in self.partitions if p not in small]
+            self.log.emit(f"小分区 {len(small)} 个并发备份（{self.concurrency} 路），大分区 {len(large)} 个串行备份")
 
-            # Find target path again (safe check)
-            target_path = ""
-            search_paths = [
-                "/dev/block/bootdevice/by-name",
-                "/dev/block/by-name",
-                "/dev/block/platform/*/by-name"
-            ]
-            for p in search_paths:
-                try:
-                    if '*' in p:
-                        base = p.split('*')[0]
-                        ls_base = self._adb_shell(f"ls -d {base}* 2>/dev/null", timeout=5).strip()
-                        if ls_base and "No such" not in ls_base:
-                            p = ls_base + "/by-name"
-                    res = self._adb_shell(f"ls {p}", timeout=5)
-                    if res and "No such file" not in res:
-                        target_path = p
+            results: Dict[str, dict] = {}
+            t_start = time.perf_counter()
+            self._done = 0
+            self._bytes = 0
+            zip_path = os.path.join(self.out_dir, f"{backup_name}.zip")
+            if self.use_zip:
+                # 压缩与传输并行：分区传完即写入 ZIP，不再有传输结束后的整包压缩
+                self._archive = backup_service.ArchiveStage(zip_path, backup_name, log=self.log.emit)
+
+            def _large_lane():
+                for part in large:
+                    if self._stop:
                         break
-                except Exception:
-                    continue
-            
-            if not target_path:
-                raise RuntimeError("无法找到分区路径")
+                    self._backup_one(part, target_path, local_backup_dir, sizes.get(part, 0), total, results)
 
-            total = len(self.partitions)
-            success_parts = []
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                futures = []
+                if large:
+                    futures.append(pool.submit(_large_lane))
+                for part in small:
+                    futures.append(pool.submit(
+                        self._backup_one, part, target_path, local_backup_dir, sizes.get(part, 0), total, results
+                    ))
+                for f in futures:
+                    f.result()
 
-            for idx, part in enumerate(self.partitions):
-                if self._stop:
-                    break
-                
-                self.progress.emit(idx + 1, total)
-                self.log.emit(f"[{idx+1}/{total}] 正在备份: {part} ...")
-                
-                remote_tmp = f"/sdcard/Download/tmp_backup_{part}.img"
-                self._adb_shell("mkdir -p /sdcard/Download")
-                
-                # DD
-                dd_cmd = f"su -c 'dd if={target_path}/{part} of={remote_tmp}'"
-                try:
-                    self._adb_shell(dd_cmd, timeout=3600) # super partition can be HUGE
-                except Exception as e:
-                    self.log.emit(f"  - 分区 {part} 备份失败 (DD): {e}")
-                    continue
-
-                # Pull
-                local_img = os.path.join(local_backup_dir, f"{part}.img")
-                try:
-                    pull_cmd = [self.adb_path, '-s', self.serial, 'pull', remote_tmp, local_img]
-                    self._run_cmd(pull_cmd, timeout=3600)
-                    success_parts.append(part)
-                except Exception as e:
-                    self.log.emit(f"  - 分区 {part} 拉取失败: {e}")
-                
-                # Cleanup
-                try:
-                    self._adb_shell(f"rm {remote_tmp}", timeout=10)
-                except Exception:
-                    pass
+            entries = [results[p] for p in self.partitions if p in results]
+            success_parts = [e["name"] for e in entries]
+            elapsed = max(time.perf_counter() - t_start, 0.001)
+            self.log.emit(
+                f"传输完成: {len(entries)}/{total} 个分区，共 {self._bytes / 1048576:.1f} MB，"
+                f"用时 {elapsed:.1f}s，平均 {self._bytes / 1048576 / elapsed:.1f} MB/s"
+            )
+            if self._bytes >= self.SMALL_PARTITION:
+                partition_service.record_throughput(self.serial, self._bytes / elapsed)
 
             if self._stop:
+                if self._archive is not None:
+                    self._archive.abort()
+                    if self._archive.moved:
+                        self.log.emit(f"已完成的分区保存在: {zip_path}")
                 self.finished.emit(False, "备份已取消")
                 return
 
+            # Backup index
+            extra_files = []
+            if entries:
+                try:
+                    extra_files.append(backup_service.write_manifest(local_backup_dir, dict(
+                        identity, by_name=target_path, block_size=self.block_size,
+                    ), entries))
+                except Exception as e:
+                    self.log.emit(f"写入备份索引失败: {e}")
+
             # Generate Script
             if self.gen_script and success_parts:
                 self.log.emit("正在生成刷机脚本...")
                 try:
-                    bat_path = os.path.join(local_backup_dir, "flash_all.bat")
-                    with open(bat_path, 'w', encoding='utf-8') as f: # Bat needs ANSI usually but utf-8 mostly works if no special chars
-                        f.write("@echo off\n")
-                        f.write("echo Waiting for device in fastboot...\n")
-                        f.write("fastboot devices\n")
-                        f.write("pause\n")
-                        for p in success_parts:
-                            f.write(f"echo Flashing {p}...\n")
-                            f.write(f"fastboot flash {p} {p}.img\n")
-                        f.write("echo Done!\n")
-                        f.write("pause\n")
-                    
-                    sh_path = os.path.join(local_backup_dir, "flash_all.sh")
-                    with open(sh_path, 'w', encoding='utf-8') as f:
-                        f.write("#!/bin/bash\n")
-                        f.write("echo 'Waiting for device...'\n")
-                        f.write("fastboot devices\n")
-                        for p in success_parts:
-                            f.write(f"echo 'Flashing {p}...'\n")
-                            f.write(f"fastboot flash {p} {p}.img\n")
-                        f.write("echo 'Done!'\n")
-                    # make executable? chmod not needed on windows host usually
+                    backup_service.write_flash_scripts(local_backup_dir, entries)
+                    for name in ("flash_all.bat", "flash_all.sh", "zstd.exe"):
+                        fp = os.path.join(local_backup_dir, name)
+                        if os.path.exists(fp):
+                            extra_files.append(fp)
                 except Exception as e:
                     self.log.emit(f"生成脚本失败: {e}")
 
             final_path = local_backup_dir
 
             # Zip
-            if self.use_zip and success_parts:
-                self.log.emit("正在压缩备份文件...")
-                zip_path = os.path.join(self.out_dir, f"{backup_name}.zip")
-                
-                # Try 7z
-                root_dir = Path(__file__).resolve().parents[2]
-                p7z = root_dir / 'bin' / '7z.exe'
-                used_7z = False
-                
-                if p7z.exists():
-                    try:
-                        cmd_7z = [str(p7z), 'a', zip_path, local_backup_dir]
-                        self._run_cmd(cmd_7z, timeout=1800)
-                        used_7z = True
-                    except Exception as e:
-                        self.log.emit(f"7z 压缩失败，尝试使用内置 zip: {e}")
-                
-                if not used_7z:
-                    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-                        for root, _, files in os.walk(local_backup_dir):
-                            for file in files:
-                                if self._stop: break
-                                fp = os.path.join(root, file)
-                                arcname = os.path.relpath(fp, self.out_dir)
-                                zf.write(fp, arcname)
-                
-                if not self._stop:
-                    # Cleanup folder if zipped
+            if self._archive is not None:
+                archive, self._archive = self._archive, None
+                if success_parts:
+                    for fp in extra_files:
+                        archive.add(fp, None)
+                    self.log.emit("等待压缩包写入完成...")
+                    archive.close()
+                    if archive.errors:
+                        # 校验通过的分区已在压缩包中（散文件已删），出错的分区镜像仍在备份目录中
+                        self.log.emit("压缩包写入出错: " + "; ".join(archive.errors))
+                        if not archive.moved:
+                            try:
+                                os.remove(zip_path)
+                            except OSError:
+                                pass
+                            msg = f"压缩包写入失败，分区镜像已保留在: {local_backup_dir}"
+                        else:
+                            msg = f"压缩包写入出错，已写入的分区在 {zip_path}，其余保留在: {local_backup_dir}"
+                        self.log.emit(msg)
+                        self.finished.emit(False, msg)
+                        return
                     try:
                         shutil.rmtree(local_backup_dir)
                     except Exception:
                         pass
                     final_path = zip_path
+                else:
+                    archive.abort()
 
             if self._stop:
                 self.finished.emit(False, "备份已取消")
@@ -336,17 +392,85 @@ class _BackupExecutorWorker(QObject):
             self.finished.emit(True, final_path)
 
         except Exception as e:
+            if self._archive is not None:
+                self._archive.abort()
+                self._archive = None
             self.log.emit(f"错误: {str(e)}")
             self.finished.emit(False, str(e))
 
 
+class _VerifyWorker(QObject):
+    log = Signal(str)
+    finished = Signal(bool, str)
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+
+    def run(self):
+        try:
+            self.log.emit(f"正在校验: {self.path}")
+            t0 = time.perf_counter()
+
+            def _on_item(name, ok, reason):
+                self.log.emit(f"  {'✓' if ok else '✗'} {name}" + (f"（{reason}）" if reason else ""))
+
+            results = backup_service.verify_backup(self.path, workers=os.cpu_count() or 4, progress=_on_item)
+            bad = [r["name"] for r in results if not r["ok"]]
+            self.log.emit(f"校验完成，用时 {time.perf_counter() - t0:.1f}s")
+            if bad:
+                self.finished.emit(False, f"{len(bad)}/{len(results)} 个分区校验失败: {', '.join(bad)}")
+            else:
+                self.finished.emit(True, f"全部 {len(results)} 个分区校验通过")
+        except Exception as e:
+            self.finished.emit(False, f"校验失败: {e}")
+
+
+class _RestoreWorker(QObject):
+    log = Signal(str)
+    progress = Signal(int)
+    mismatch = Signal(str)  # 备份与设备不一致被拒绝时的原因
+    finished = Signal(bool, str)
+
+    def __init__(self, path: str, skip_matching: bool = True, allow_other_device: bool = False):
+        super().__init__()
+        self.path = path
+        self.skip_matching = skip_matching
+        self.allow_other_device = allow_other_device
+        self._logic = None
+
+    def stop(self):
+        if self._logic:
+            self._logic.stop()
+
+    def run(self):
+        try:
+            self._logic = BackupRestoreLogic(
+                self.log.emit,
+                adb_path=str(svc.ADB_BIN) if svc.ADB_BIN.exists() else None,
+                progress_callback=lambda done, total, pct: self.progress.emit(pct),
+            )
+            ok = self._logic.restore(
+                self.path, skip_matching=self.skip_matching, allow_other_device=self.allow_other_device,
+            )
+            if not ok and self._logic.device_mismatch:
+                self.mismatch.emit(self._logic.device_mismatch)
+                self.finished.emit(False, "备份与当前设备不一致，未恢复")
+                return
+            self.finished.emit(ok, "恢复完成" if ok else "恢复失败，请查看日志")
+        except Exception as e:
+            self.finished.emit(False, f"恢复失败: {e}")
+
+
 class PartitionSelectionDialog(MessageBoxBase):
-    def __init__(self, partitions: List[str], parent=None):
+    def __init__(self, partitions: List[str], parent=None, table: Optional[dict] = None):
         super().__init__(parent)
         self.titleLabel = SubtitleLabel("选择需要备份的分区", self)
         self.viewLayout.addWidget(self.titleLabel)
 
         self.partitions = partitions
+        self.table = table or {}
+        self.sizes: Dict[str, int] = self.table.get("partitions", {})
         self.checkboxes = {}
         
         # Tools
@@ -361,6 +485,8 @@ class PartitionSelectionDialog(MessageBoxBase):
         tools.addWidget(btn_inv)
         tools.addWidget(btn_def)
         tools.addStretch(1)
+        self.summary_label = CaptionLabel("")
+        tools.addWidget(self.summary_label)
         self.viewLayout.addLayout(tools)
         
         # Scroll Area
@@ -403,6 +529,21 @@ class PartitionSelectionDialog(MessageBoxBase):
         self.widget.setMinimumWidth(600)
         
         self._populate()
+        self._update_summary()
+
+    def _label(self, name: str) -> str:
+        size = self.sizes.get(name)
+        return f"{name} ({format_size(size)})" if size else name
+
+    def _update_summary(self, *_):
+        selected = self.get_selected()
+        total = sum(self.sizes.get(p, 0) for p in selected)
+        if not self.sizes:
+            self.summary_label.setText(f"已选 {len(selected)} 个")
+            return
+        secs = partition_service.estimate_seconds(total, self.table)
+        eta = f"{secs / 60:.1f} 分钟" if secs >= 60 else f"{secs:.0f} 秒"
+        self.summary_label.setText(f"已选 {len(selected)} 个，共 {format_size(total)}，预计约 {eta}")
 
     def _populate(self):
         risky_names = ["userdata", "metadata", "frp", "cache"]
@@ -417,8 +558,9 @@ class PartitionSelectionDialog(MessageBoxBase):
         # Grid
         row, col = 0, 0
         for p in normal:
-            chk = QCheckBox(p)
+            chk = QCheckBox(self._label(p))
             chk.setChecked(True)
+            chk.toggled.connect(self._update_summary)
             self.grid.addWidget(chk, row, col)
             self.checkboxes[p] = chk
             col += 1
@@ -428,8 +570,9 @@ class PartitionSelectionDialog(MessageBoxBase):
                 
         # Risky
         for p in risky:
-            chk = QCheckBox(p)
+            chk = QCheckBox(self._label(p))
             chk.setChecked(False)
+            chk.toggled.connect(self._update_summary)
             self.risky_layout.addWidget(chk)
             self.checkboxes[p] = chk
 
@@ -462,7 +605,14 @@ class BackupTab(QWidget):
         self._scan_worker = None
         self._backup_thread = None
         self._backup_worker = None
+        self._verify_thread = None
+        self._verify_worker = None
+        self._restore_thread = None
+        self._restore_worker = None
+        self._restore_path = ""
+        self._restore_mismatch = ""
         self.partitions = []
+        self.partition_table = {}
         self.selected_partitions = []
         self._init_ui()
         
@@ -531,9 +681,39 @@ class BackupTab(QWidget):
         self.chk_zip.setChecked(True)
         self.chk_script = QCheckBox("为备份分区生成刷机脚本 (flash_all.bat/sh)")
         self.chk_script.setChecked(True)
+        self.chk_incremental = QCheckBox("增量备份（按块比对上次快照，只传输变化的块）")
+        self.chk_incremental.setChecked(False)
+        self.chk_incremental.toggled.connect(self._on_incremental_toggled)
         
         l_opt.addWidget(self.chk_zip)
         l_opt.addWidget(self.chk_script)
+        l_opt.addWidget(self.chk_incremental)
+
+        r_stream = QHBoxLayout()
+        r_stream.setSpacing(8)
+        r_stream.addWidget(QLabel("块大小:"))
+        self.combo_bs = ComboBox()
+        for label, size in (("1 MB", 1 << 20), ("4 MB", 4 << 20), ("8 MB", 8 << 20), ("16 MB", 16 << 20)):
+            self.combo_bs.addItem(label, userData=size)
+        self.combo_bs.setCurrentIndex(1)
+        r_stream.addWidget(self.combo_bs)
+        r_stream.addSpacing(12)
+        r_stream.addWidget(QLabel("备份格式:"))
+        self.combo_format = ComboBox()
+        self.combo_format.addItem("原始镜像 (.img)", userData=backup_service.FORMAT_RAW)
+        self.combo_format.addItem("Sparse 镜像 (.sparse.img)", userData=backup_service.FORMAT_SPARSE)
+        self.combo_format.addItem("zstd 压缩 (.img.zst)", userData=backup_service.FORMAT_ZSTD)
+        self.combo_format.addItem("gzip 压缩 (.img.gz)", userData=backup_service.FORMAT_GZIP)
+        r_stream.addWidget(self.combo_format)
+        r_stream.addSpacing(12)
+        r_stream.addWidget(QLabel("并发:"))
+        self.combo_jobs = ComboBox()
+        for n in (1, 2, 4, 6):
+            self.combo_jobs.addItem(str(n), userData=n)
+        self.combo_jobs.setCurrentIndex(2)
+        r_stream.addWidget(self.combo_jobs)
+        r_stream.addStretch(1)
+        l_opt.addLayout(r_stream)
         
         l_opt.addSpacing(10)
         
@@ -546,8 +726,16 @@ class BackupTab(QWidget):
         self.btn_start = PrimaryPushButton("开始备份")
         self.btn_start.clicked.connect(self._start_backup)
         
+        self.btn_verify = PushButton("校验备份")
+        self.btn_verify.clicked.connect(self._verify_backup)
+
+        self.btn_restore = PushButton("从备份恢复")
+        self.btn_restore.clicked.connect(self._restore_backup)
+
         h_btn.addWidget(self.btn_refresh)
         h_btn.addWidget(self.btn_start)
+        h_btn.addWidget(self.btn_verify)
+        h_btn.addWidget(self.btn_restore)
         h_btn.addStretch(1)
         l_opt.addLayout(h_btn)
         
@@ -617,6 +805,11 @@ class BackupTab(QWidget):
         banner.addStretch(1)
         self.layout.addWidget(banner_w)
 
+    def _on_incremental_toggled(self, on: bool):
+        # 增量快照存放在块仓库中，不生成单独的镜像、压缩包和脚本
+        for w in (self.chk_zip, self.chk_script, self.combo_format):
+            w.setEnabled(not on)
+
     def _browse(self):
         d = QFileDialog.getExistingDirectory(self, "选择保存目录", self.path_edit.text())
         if d:
@@ -653,18 +846,20 @@ class BackupTab(QWidget):
         self._scan_thread = None
         self._scan_worker = None
 
-    def _on_scan_finished(self, partitions, err):
+    def _on_scan_finished(self, table, err):
         self.btn_refresh.setEnabled(True)
         if err:
             InfoBar.error("扫描失败", err, parent=self, position=InfoBarPosition.TOP)
             self.log_view.append(f"扫描失败: {err}")
             return
         
+        partitions = list(table.get("partitions", {}).keys())
+        self.partition_table = table
         self.partitions = partitions
         self.log_view.append(f"扫描完成，共找到 {len(partitions)} 个分区。")
         
         # Open Dialog
-        dlg = PartitionSelectionDialog(partitions, self.window())
+        dlg = PartitionSelectionDialog(partitions, self.window(), table=table)
         if dlg.exec():
             self.selected_partitions = dlg.get_selected()
             self.log_view.append(f"已选择 {len(self.selected_partitions)} 个分区。")
@@ -711,7 +906,12 @@ class BackupTab(QWidget):
         self._backup_thread = QThread(self)
         self._backup_worker = _BackupExecutorWorker(
             str(svc.ADB_BIN), path, serial, selected, 
-            self.chk_zip.isChecked(), self.chk_script.isChecked()
+            self.chk_zip.isChecked(), self.chk_script.isChecked(),
+            block_size=self.combo_bs.currentData() or backup_service.DEFAULT_BLOCK_SIZE,
+            fmt=self.combo_format.currentData() or backup_service.FORMAT_RAW,
+            concurrency=self.combo_jobs.currentData() or 4,
+            incremental=self.chk_incremental.isChecked(),
+            table=self.partition_table if self.partition_table.get("serial") == serial else None,
         )
         self._backup_worker.moveToThread(self._backup_thread)
         self._backup_thread.started.connect(self._backup_worker.run)
@@ -747,6 +947,123 @@ class BackupTab(QWidget):
         self._backup_thread = None
         self._backup_worker = None
 
+    def _verify_backup(self):
+        try:
+            if self._verify_thread and self._verify_thread.isRunning():
+                return
+        except RuntimeError:
+            self._verify_thread = None
+
+        path, _ = QFileDialog.getOpenFileName(
+            self, "选择备份清单或备份压缩包", self.path_edit.text(),
+            f"备份 ({backup_service.MANIFEST_NAME} *.zip);;所有文件 (*.*)"
+        )
+        if not path:
+            return
+        if os.path.basename(path) == backup_service.MANIFEST_NAME:
+            path = os.path.dirname(path)
+
+        self.btn_verify.setEnabled(False)
+        self._verify_thread = QThread(self)
+        self._verify_worker = _VerifyWorker(path)
+        self._verify_worker.moveToThread(self._verify_thread)
+        self._verify_thread.started.connect(self._verify_worker.run)
+        self._verify_worker.log.connect(self.log_view.append, Qt.QueuedConnection)
+        self._verify_worker.finished.connect(self._on_verify_finished, Qt.QueuedConnection)
+        self._verify_worker.finished.connect(self._verify_thread.quit)
+        self._verify_worker.finished.connect(self._verify_worker.deleteLater)
+        self._verify_thread.finished.connect(self._verify_thread.deleteLater)
+        self._verify_thread.finished.connect(self._cleanup_verify_thread)
+        self._verify_thread.start()
+
+    def _on_verify_finished(self, ok, msg):
+        self.btn_verify.setEnabled(True)
+        self.log_view.append(("[OK] " if ok else "[FAILED] ") + msg)
+        if ok:
+            InfoBar.success("校验通过", msg, parent=self, position=InfoBarPosition.TOP)
+        else:
+            InfoBar.error("校验失败", msg, parent=self, position=InfoBarPosition.TOP)
+
+    def _cleanup_verify_thread(self):
+        self._verify_thread = None
+        self._verify_worker = None
+
+    def _restore_backup(self):
+        try:
+            if self._restore_thread and self._restore_thread.isRunning():
+                InfoBar.warning("提示", "恢复任务正在进行", parent=self, position=InfoBarPosition.TOP)
+                return
+        except RuntimeError:
+            self._restore_thread = None
+
+        path, _ = QFileDialog.getOpenFileName(
+            self, "选择备份清单、备份压缩包或增量快照", self.path_edit.text(),
+            f"备份 ({backup_service.MANIFEST_NAME} *.zip *.json);;所有文件 (*.*)"
+        )
+        if not path:
+            return
+        confirm = MessageDialog(
+            "警告",
+            "即将把备份中的分区刷回设备。\n"
+            "系统模式下会先比对设备端哈希，跳过与备份一致的分区，然后自动重启到 Bootloader。\n"
+            "刷入错误的备份可能导致设备无法启动，确定要继续吗？",
+            self,
+        )
+        if confirm.exec() != MessageDialog.Accepted:
+            return
+        self._start_restore(path)
+
+    def _start_restore(self, path: str, allow_other_device: bool = False):
+        self.btn_restore.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        if not allow_other_device:
+            self.log_view.clear()
+        self._restore_path = path
+        self._restore_mismatch = ''
+
+        self._restore_thread = QThread(self)
+        self._restore_worker = _RestoreWorker(path, allow_other_device=allow_other_device)
+        self._restore_worker.moveToThread(self._restore_thread)
+        self._restore_thread.started.connect(self._restore_worker.run)
+        self._restore_worker.log.connect(self.log_view.append, Qt.QueuedConnection)
+        self._restore_worker.mismatch.connect(self._on_restore_mismatch, Qt.QueuedConnection)
+        self._restore_worker.progress.connect(self.progress_bar.setValue, Qt.QueuedConnection)
+        self._restore_worker.finished.connect(self._on_restore_finished, Qt.QueuedConnection)
+        self._restore_worker.finished.connect(self._restore_thread.quit)
+        self._restore_worker.finished.connect(self._restore_worker.deleteLater)
+        self._restore_thread.finished.connect(self._restore_thread.deleteLater)
+        self._restore_thread.finished.connect(self._cleanup_restore_thread)
+        self._restore_thread.start()
+
+    def _on_restore_mismatch(self, reason: str):
+        self._restore_mismatch = reason
+
+    def _on_restore_finished(self, ok, msg):
+        self.btn_restore.setEnabled(True)
+        self.log_view.append(("[SUCCESS] " if ok else "[FAILED] ") + msg)
+        if ok:
+            InfoBar.success("完成", msg, parent=self, position=InfoBarPosition.TOP)
+        else:
+            InfoBar.error("失败", msg, parent=self, position=InfoBarPosition.TOP)
+
+    def _cleanup_restore_thread(self):
+        self._restore_thread = None
+        self._restore_worker = None
+        reason, self._restore_mismatch = self._restore_mismatch, ''
+        if not reason:
+            return
+        # 备份来自其他设备：只有用户明确确认才继续
+        confirm = MessageDialog(
+            "备份与当前设备不一致",
+            f"{reason}\n\n"
+            "把其他设备的 persist / modem / boot 等分区刷入当前设备，可能导致基带、传感器失效或无法启动。\n"
+            "确定这是当前设备的备份并继续恢复吗？",
+            self,
+        )
+        if confirm.exec() == MessageDialog.Accepted:
+            self._start_restore(self._restore_path, allow_other_device=True)
+
     def cleanup(self):
         if self._scan_worker:
             try:
@@ -771,3 +1088,15 @@ class BackupTab(QWidget):
                 self._backup_thread.wait(1000)
             except RuntimeError:
                 pass
+
+        if self._restore_worker:
+            try:
+                self._restore_worker.stop()
+            except RuntimeError:
+                pass
+        if self._restore_thread:
+            try:
+                self._restore_thread.quit()
+                self._restore_thread.wait(1000)
+            except RuntimeError:
+                pass
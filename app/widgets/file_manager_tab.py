@@ -1,13 +1,12 @@
 import os
-import re
-import time
-import subprocess
+import posixpath
+import threading
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QFileDialog,
-    QTableWidgetItem, QMenu, QInputDialog, QProgressBar
+    QMenu, QInputDialog, QProgressBar
 )
-from PySide6.QtGui import QAction
-from PySide6.QtCore import Qt, QThread, QObject, Signal, QTimer
+from PySide6.QtGui import QAction, QIcon
+from PySide6.QtCore import Qt, QThread, QObject, Signal, QTimer, QAbstractTableModel, QModelIndex, QSize
 from qfluentwidgets import (
     CardWidget,
     PrimaryPushButton,
@@ -15,30 +14,73 @@ from qfluentwidgets import (
     InfoBar,
     InfoBarPosition,
     TitleLabel,
-    TableWidget,
+    TableView,
     FluentIcon,
     MessageDialog,
     SmoothScrollArea,
+    ComboBox,
+    CheckBox,
+    SearchLineEdit,
 )
 
 from app.services import adb_service
+from app.services import listing_cache
+from app.services import transfer_queue
+from app.services import tar_transfer
+from app.services import folder_sync
+from app.services import search_index
+from app.services import size_service
+from app.services import thumbnail_service
+from app.services.adb_sync import SyncConnection, current_serial
 
 
 class _ListWorker(QObject):
+    device = Signal(str)  # 当前设备序列号，切换设备时据此更换搜索索引
     finished = Signal(list, str)
 
-    def __init__(self, path: str):
+    def __init__(self, path: str, use_cache: bool = True):
         super().__init__()
         self.path = path or '/storage/emulated/0'
+        self.use_cache = use_cache
 
     def run(self):
         try:
-            items, err = adb_service.list_dir(self.path)
+            self.device.emit(current_serial())
+            items, err = listing_cache.list_dir(self.path, use_cache=self.use_cache)
             self.finished.emit(items or [], err or '')
         except Exception as e:
             self.finished.emit([], str(e))
 
 
+class _IndexWorker(QObject):
+    progress = Signal(str)
+    finished = Signal(object, str)  # (SearchIndex | None, err)
+
+    def __init__(self, root: str, index=None):
+        super().__init__()
+        self.root = root
+        self.index = index
+        self._stopped = False
+
+    def run(self):
+        try:
+            if self.index is None:
+                self.index = search_index.SearchIndex()
+            if self._stopped:
+                raise InterruptedError
+            self.index.refresh(self.root, progress=lambda n, _p: self.progress.emit(f'正在建立索引：已扫描 {n} 个目录'))
+            self.finished.emit(self.index, '')
+        except InterruptedError:
+            self.finished.emit(None, '已取消')
+        except Exception as e:
+            self.finished.emit(None, str(e) or '建立索引失败')
+
+    def stop(self):
+        self._stopped = True
+        if self.index is not None:
+            self.index.cancel()
+
+
 class _TransferWorker(QObject):
     finished = Signal(bool, str)
 
@@ -70,6 +112,14 @@ class _TransferWorker(QObject):
             elif self.mode == 'rename':
                 # dst: new name
                 ok, msg = adb_service.rename_path(self.src, self.dst)
+            elif self.mode == 'batch':
+                # src: [(op, ...)]，整批一次 adb shell 执行
+                results = adb_service.batch_ops(self.src, timeout=600)
+                failed = [(op, m) for op, (r, m) in zip(self.src, results) if not r]
+                ok = not failed
+                if failed:
+                    first_op, first_msg = failed[0]
+                    msg = f"{len(failed)}/{len(results)} 项失败：{posixpath.basename(first_op[1])}（{first_msg or '未知错误'}）"
             else:
                 ok, msg = False, '未知的传输模式'
             self.finished.emit(ok, msg or '')
@@ -77,130 +127,328 @@ class _TransferWorker(QObject):
             self.finished.emit(False, str(e))
 
 
-class _StreamTransferWorker(QObject):
+class _QueueTransferWorker(QObject):
     progress = Signal(int)  # percent 0-100
+    rate = Signal(str)  # 文件数 · 已传输 / 总量 · 速率
     finished = Signal(bool, str)
 
-    def __init__(self, mode: str, src: str, dst: str, total_bytes: int | None = None):
+    def __init__(self, jobs: list, concurrency: int = transfer_queue.DEFAULT_CONCURRENCY,
+                 tar_mode: bool = False, compress: bool = False):
         super().__init__()
-        self.mode = mode  # 'pull'|'push'
-        self.src = src
-        self.dst = dst
-        self.total = total_bytes or 0
-        self._proc = None
+        self.jobs = jobs  # [(mode 'pull'|'push', src, dst)]
+        self.concurrency = concurrency
+        self.tar_mode = tar_mode
+        self.compress = compress
+        self._queue = None
+        self._tar = None
         self._stopped = False
 
+    @staticmethod
+    def _fmt(num: float) -> str:
+        for unit in ('B', 'KB', 'MB', 'GB'):
+            if num < 1024 or unit == 'GB':
+                return f"{num:.0f} {unit}" if unit == 'B' else f"{num:.1f} {unit}"
+            num /= 1024.0
+
+    def _on_progress(self, info: dict):
+        total = info['total']
+        if total > 0:
+            self.progress.emit(min(100, int(info['bytes'] * 100 / total)))
+        elif info['total_files'] and info['files'] >= info['total_files']:
+            self.progress.emit(100)
+        else:
+            self.progress.emit(-1)
+        text = (
+            f"{info['files']}/{info['total_files']} 个文件 · "
+            f"{self._fmt(info['bytes'])} / {self._fmt(total)} · {self._fmt(info['rate'])}/s"
+        )
+        if info['failed']:
+            text += f" · 失败 {info['failed']}"
+        self.rate.emit(text)
+
+    def _emit_size_hint(self, jobs: list):
+        """拉取目标的大小已在选中时统计过，则在展开文件列表之前先给出总量"""
+        pulls = [src for mode, src, _ in jobs if mode == 'pull']
+        if not pulls or len(pulls) != len(jobs):
+            return
+        hits = [size_service.get_cached(src) for src in pulls]
+        if any(h is None for h in hits):
+            return
+        self._on_progress({
+            'bytes': 0, 'total': sum(h[0] for h in hits), 'rate': 0.0,
+            'files': 0, 'total_files': sum(h[1] for h in hits), 'failed': 0, 'current': '',
+        })
+
+    def _split_tar_jobs(self):
+        """tar 模式下目录任务整体打包传输，单个文件仍走并发队列"""
+        if not self.tar_mode:
+            return [], list(self.jobs)
+        tar_jobs, file_jobs = [], []
+        pulls = [j for j in self.jobs if j[0] == 'pull']
+        remote_dirs = set()
+        if pulls:
+            with SyncConnection() as conn:
+                remote_dirs = {src for _, src, _ in pulls if conn.stat(src).is_dir}
+        for job in self.jobs:
+            mode, src, _ = job
+            is_dir = src in remote_dirs if mode == 'pull' else os.path.isdir(src)
+            (tar_jobs if is_dir else file_jobs).append(job)
+        return tar_jobs, file_jobs
+
     def run(self):
         try:
-            adb = str(adb_service.ADB_BIN) if getattr(adb_service, 'ADB_BIN', None) and adb_service.ADB_BIN.exists() else 'adb'
-            cmd = [adb, 'pull' if self.mode == 'pull' else 'push', '-p', self.src, self.dst]
-            
-            startupinfo = None
-            if os.name == 'nt':
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                
-            self._proc = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,  # -p 进度通常输出到 stderr
-                bufsize=1,
-                universal_newlines=True,
-                startupinfo=startupinfo,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
-            
-            total_bytes = self.total if (self.total and self.total > 0) else 0
-            percent_pat = re.compile(r"(\d+)%")
-            bracket_pat = re.compile(r"\[(\d+)%\]")
-            bytes_pat = re.compile(r"\((\d+)\s+bytes")
-            last_emit = 0.0
-            last_busy = 0.0
-            buf = ''
-            saw_pct = False
-            done_bytes = 0
-            
-            while True:
+            tar_jobs, file_jobs = self._split_tar_jobs()
+            tar_failed = 0
+            tar_errors: list[str] = []
+            for mode, src, dst in tar_jobs:
                 if self._stopped:
-                    if self._proc.poll() is None:
-                        self._proc.kill()
-                    break
-                    
-                ch = self._proc.stderr.read(1)
-                
-                if not ch:
-                    if self._proc.poll() is not None:
-                        break
-                    time.sleep(0.05)
-                    # 周期性发出忙碌信号，驱动不确定进度条
-                    nowb = time.time()
-                    if not saw_pct and nowb - last_busy >= 0.2:
-                        self.progress.emit(-1)
-                        last_busy = nowb
-                    continue
-                    
-                if ch in ['\r', '\n']:
-                    line = buf
-                    buf = ''
-                    if not line:
-                        continue
-                    m_pct = percent_pat.search(line) or bracket_pat.search(line)
-                    if m_pct:
-                        pct = int(m_pct.group(1))
-                        saw_pct = True
-                        now = time.time()
-                        if now - last_emit >= 0.05:
-                            self.progress.emit(pct)
-                            last_emit = now
-                        continue
-                    m_bytes = bytes_pat.search(line)
-                    if m_bytes:
-                        done_bytes = int(m_bytes.group(1))
-                        if total_bytes > 0:
-                            pct = min(100, int(done_bytes * 100 / total_bytes))
-                            saw_pct = True
-                            now = time.time()
-                            if now - last_emit >= 0.05:
-                                self.progress.emit(pct)
-                                last_emit = now
-                        else:
-                            self.progress.emit(-1)
-                        continue
+                    raise InterruptedError
+                self._tar = tar_transfer.TarTransfer(compress=self.compress, progress=self._on_progress)
+                if mode == 'pull':
+                    tar_failed += self._tar.pull(src, os.path.dirname(dst))
+                    tar_errors += self._tar.errors
+                else:
+                    tar_failed += self._tar.push(src, dst)
+            # 多条 sync 连接并行传输，每条连接复用到底；失败的文件自动重试
+            self._queue = transfer_queue.TransferQueue(concurrency=self.concurrency, progress=self._on_progress)
+            for mode, src, dst in file_jobs:
+                if mode == 'pull':
+                    self._queue.add_pull(src, dst)
                 else:
-                    buf += ch
-                    
+                    self._queue.add_push(src, dst)
             if self._stopped:
-                 self.finished.emit(False, "已取消")
-                 return
-
-            code = self._proc.wait()
-            if code == 0:
-                self.progress.emit(100)
-                self.finished.emit(True, '')
-            else:
-                self.finished.emit(False, '传输失败')
-                
+                self.finished.emit(False, "已取消")
+                return
+            self._emit_size_hint(file_jobs)
+            failed = self._queue.run() if file_jobs else []
+            if failed:
+                names = ', '.join(os.path.basename(it.src) for it in failed[:5])
+                more = f" 等 {len(failed)} 个" if len(failed) > 5 else ''
+                self.finished.emit(False, f"传输失败: {names}{more}（{failed[0].error}）")
+                return
+            if tar_failed:
+                reason = tar_errors[0] if tar_errors else "文件名不受支持或无读取权限"
+                self.finished.emit(False, f"{tar_failed} 个文件未能传输（{reason}）")
+                return
+            self.progress.emit(100)
+            self.finished.emit(True, '')
+        except InterruptedError:
+            self.finished.emit(False, "已取消")
         except Exception as e:
-            try:
-                if self._proc and self._proc.poll() is None:
-                    self._proc.kill()
-            except Exception:
-                pass
-            self.finished.emit(False, str(e))
+            self.finished.emit(False, str(e) or '传输失败')
 
     def stop(self):
         self._stopped = True
+        if self._queue is not None:
+            self._queue.cancel()
+        if self._tar is not None:
+            self._tar.cancel()
+
+
+class _FolderSyncWorker(_QueueTransferWorker):
+    confirm_deletes = Signal(str)  # 计划中含删除时请求界面确认，界面回调 confirm()
+
+    def __init__(self, local: str, remote: str, direction: str, concurrency: int, delete: bool = False):
+        super().__init__([], concurrency)
+        self.local = local
+        self.remote = remote
+        self.direction = direction
+        self.delete = delete
+        self._sync = None
+        self._decision = threading.Event()
+        self._accepted = False
+
+    def confirm(self, accepted: bool):
+        self._accepted = accepted
+        self._decision.set()
+
+    def _ask_deletes(self, plan) -> bool:
+        deletes = plan.deletes
+        sides = {folder_sync.OP_DELETE_LOCAL: '电脑端', folder_sync.OP_DELETE_REMOTE: '设备端'}
+        lines = [f"{sides[a.op]}：{a.rel}" for a in deletes[:10]]
+        if len(deletes) > 10:
+            lines.append(f"… 等共 {len(deletes)} 个文件")
+        self._decision.clear()
+        self.confirm_deletes.emit(f"{plan.summary()}\n\n将删除以下文件：\n" + "\n".join(lines))
+        self._decision.wait()
+        return self._accepted and not self._stopped
+
+    def run(self):
         try:
-            if self._proc and self._proc.poll() is None:
-                self._proc.kill()
-        except Exception:
-            pass
+            # 传播删除须用户选择开启：双向按索引删除对侧已删的文件，单向删除目标侧多余文件
+            self._sync = folder_sync.FolderSync(
+                self.local, self.remote, direction=self.direction, delete=self.delete, use_hash=True,
+                concurrency=self.concurrency, progress=self._on_progress, log_callback=self.rate.emit,
+            )
+            self.progress.emit(-1)
+            self.rate.emit('正在比较两侧文件...')
+            plan = self._sync.scan()
+            summary = plan.summary()
+            self.rate.emit(summary)
+            if plan.deletes and not self._ask_deletes(plan):
+                self.finished.emit(False, "已取消同步（未删除任何文件）")
+                return
+            failed = self._sync.execute(plan)
+            if failed:
+                self.finished.emit(False, f"同步完成，{len(failed)} 个文件失败（{failed[0].error}）")
+                return
+            self.progress.emit(100)
+            self.finished.emit(True, f"同步完成：{summary}")
+        except InterruptedError:
+            self.finished.emit(False, "已取消")
+        except Exception as e:
+            self.finished.emit(False, str(e) or '同步失败')
+
+    def stop(self):
+        self._stopped = True
+        self._decision.set()
+        if self._sync is not None:
+            self._sync.cancel()
+
 
+class _FileTableModel(QAbstractTableModel):
+    """目录列表模型：数据一次取回，行按批次经 fetchMore 暴露给视图，上万项的目录也不卡界面"""
+
+    BATCH = 500
+    HEADERS = ["名称", "大小", "类型"]
+    thumb_ready = Signal(str, str)  # (设备端路径, 缩略图文件)，由后台线程发出
+
+    def __init__(self, fmt_size, parent=None):
+        super().__init__(parent)
+        self._fmt_size = fmt_size
+        self._items: list = []
+        self._loaded = 0
+        self._icons = {}
+        self._cwd = '/'
+        self._rows = {}  # 名称 -> 行号
+        # 缩略图：视图请求图标时才排队，攒一小批后统一交给后台
+        self.thumbnails = False
+        self._thumbs = {}
+        self._requested = set()
+        self._pending = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(80)
+        self._flush_timer.timeout.connect(self._flush_thumbs)
+        self.thumb_ready.connect(self._on_thumb_ready, Qt.QueuedConnection)
+
+    def set_items(self, items: list, cwd: str = '/'):
+        self.beginResetModel()
+        self._items = list(items)
+        self._loaded = min(self.BATCH, len(self._items))
+        self._cwd = cwd
+        self._rows = {it.get('name', ''): i for i, it in enumerate(self._items)}
+        self._thumbs.clear()
+        self._requested.clear()
+        self._pending.clear()
+        thumbnail_service.cancel_pending()
+        self.endResetModel()
+
+    def set_thumbnails(self, on: bool):
+        self.thumbnails = on
+        if self._loaded:
+            self.dataChanged.emit(self.index(0, 0), self.index(self._loaded - 1, 0), [Qt.DecorationRole])
+
+    def _thumb_icon(self, it: dict):
+        name = it.get('name', '')
+        if not thumbnail_service.is_supported(name):
+            return None
+        path = posixpath.join(self._cwd, name)
+        icon = self._thumbs.get(path)
+        if icon is None and path not in self._requested:
+            self._requested.add(path)
+            try:
+                size = int(it.get('size') or 0)
+            except ValueError:
+                size = 0
+            self._pending.append({'path': path, 'size': size, 'mtime': int(it.get('mtime') or 0)})
+            self._flush_timer.start()
+        return icon
 
-    
+    def _flush_thumbs(self):
+        pending, self._pending = self._pending, []
+        thumbnail_service.request(pending, lambda p, f: self.thumb_ready.emit(p, f))
+
+    def _on_thumb_ready(self, path: str, file: str):
+        # 切换目录后到达的旧结果直接丢弃
+        if path not in self._requested:
+            return
+        icon = QIcon(file)
+        if icon.isNull():
+            return
+        self._thumbs[path] = icon
+        row = self._rows.get(posixpath.relpath(path, self._cwd))
+        if row is not None and row < self._loaded:
+            idx = self.index(row, 0)
+            self.dataChanged.emit(idx, idx, [Qt.DecorationRole])
+
+    def total(self) -> int:
+        return len(self._items)
+
+    def item(self, row: int) -> dict:
+        if 0 <= row < self._loaded:
+            return self._items[row]
+        return {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._loaded < len(self._items)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        n = min(self.BATCH, len(self._items) - self._loaded)
+        if n <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + n - 1)
+        self._loaded += n
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and 0 <= section < len(self.HEADERS):
+            return self.HEADERS[section]
+        return None
+
+    def _icon(self, is_dir: bool):
+        key = 'dir' if is_dir else 'file'
+        if key not in self._icons:
+            try:
+                self._icons[key] = (FluentIcon.FOLDER if is_dir else FluentIcon.DOCUMENT).icon()
+            except Exception:
+                self._icons[key] = None
+        return self._icons[key]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        it = self._items[index.row()]
+        is_dir = (it.get('type') or '').lower() == 'dir'
+        col = index.column()
+        if role == Qt.DisplayRole:
+            if col == 0:
+                return it.get('name', '')
+            if col == 1:
+                # 显示规则：文件夹不显示大小，文件按 KB/MB/GB 显示
+                return '-' if is_dir else self._fmt_size(it.get('size', ''))
+            if col == 2:
+                return '文件夹' if is_dir else '文件'
+        elif role == Qt.DecorationRole and col == 0:
+            if self.thumbnails and not is_dir:
+                thumb = self._thumb_icon(it)
+                if thumb is not None:
+                    return thumb
+            return self._icon(is_dir)
+        return None
 
 
 class FileManagerTab(QWidget):
+    _size_ready = Signal(str, object, int)  # (路径, 字节数, 文件数)，由后台统计线程发出
+
     def __init__(self):
         super().__init__()
         self._thread = None
@@ -209,6 +457,13 @@ class FileManagerTab(QWidget):
         self._tx_worker = None
         self._clipboard = {"mode": None, "paths": []}  # mode: 'copy'|'cut'
         self._cwd = '/storage/emulated/0'
+        self._tx_affected = []  # 当前写操作会改动的远端路径，完成后使列表缓存失效
+        self._serial = ''  # 最近一次列目录时的设备序列号
+        self._props_pending = None  # (路径, 属性对话框, 文本行)：等待后台统计目录大小
+        self._index = None  # 当前设备的搜索索引
+        self._index_thread = None
+        self._index_worker = None
+        self._search_active = False
         self._build_ui()
         self._did_first_show = False
 
@@ -272,7 +527,7 @@ class FileManagerTab(QWidget):
             t.setStyleSheet("font-size: 22px; font-weight: 600;")
         except Exception:
             pass
-        s = QLabel("包含基础功能的手机端文件管理工具（导入导出进度不准确，需要手动确认文件状态）", banner_w)
+        s = QLabel("包含基础功能的手机端文件管理工具", banner_w)
         try:
             s.setStyleSheet("font-size: 14px;")
         except Exception:
@@ -297,17 +552,31 @@ class FileManagerTab(QWidget):
         row.addWidget(self.btn_refresh)
         lay.addLayout(row)
 
-        # 列表表格（与其它页一致的 TableWidget）
-        self.table = TableWidget(self)
+        # 搜索：在本地索引中查找当前目录下的文件，输入即出结果
+        self.search_edit = SearchLineEdit(self)
+        self.search_edit.setPlaceholderText('搜索当前目录及子目录，如 *.log、ext:jpg,png、>100M')
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(250)
+        self._search_timer.timeout.connect(self._run_search)
+        self.search_edit.textChanged.connect(lambda _t: self._search_timer.start())
+        lay.addWidget(self.search_edit)
+
+        # 列表表格：模型/视图，行按需加载
+        self.table = TableView(self)
+        self.model = _FileTableModel(self._fmt_size, self)
+        self.table.setModel(self.model)
         try:
-            self.table.setColumnCount(3)
-            self.table.setHorizontalHeaderLabels(["名称", "大小", "类型"])
             header = self.table.horizontalHeader()
             header.setStretchLastSection(False)
             from PySide6.QtWidgets import QHeaderView
             header.setSectionResizeMode(QHeaderView.Stretch)
+            # 固定行高，避免按内容逐行计算高度
+            self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+            self.table.verticalHeader().hide()
             self.table.setAlternatingRowColors(True)
             self.table.setSelectionBehavior(self.table.SelectRows)
+            self.table.setSelectionMode(self.table.ExtendedSelection)
             self.table.setEditTriggers(self.table.NoEditTriggers)
             # 右键菜单绑定到 viewport，确保在单元格/空白处都能触发
             self.table.viewport().setContextMenuPolicy(Qt.CustomContextMenu)
@@ -320,8 +589,30 @@ class FileManagerTab(QWidget):
         # actions
         act = QHBoxLayout(); act.setSpacing(8)
         self.btn_pull = PrimaryPushButton('拉取到本地')
+        self.combo_jobs = ComboBox(self)
+        for n in (1, 2, 4, 8):
+            self.combo_jobs.addItem(f"{n} 路并发", userData=n)
+        self.combo_jobs.setCurrentIndex(2)
+        # 打包模式：文件夹整体走 tar 流，适合大量小文件
+        self.chk_tar = CheckBox('文件夹打包传输 (tar)', self)
+        self.chk_tar_gz = CheckBox('压缩', self)
+        self.chk_tar_gz.setEnabled(False)
+        self.chk_tar.toggled.connect(self.chk_tar_gz.setEnabled)
+        act.addWidget(self.chk_tar)
+        act.addWidget(self.chk_tar_gz)
+        # 缩略图：图片只读取开头的 EXIF 缩略图或小文件，结果缓存在本地
+        self.chk_thumbs = CheckBox('缩略图', self)
+        self.chk_thumbs.setEnabled(thumbnail_service.available())
+        if not thumbnail_service.available():
+            self.chk_thumbs.setToolTip('需要安装 Pillow')
+        self.chk_thumbs.toggled.connect(self._toggle_thumbnails)
+        act.addWidget(self.chk_thumbs)
         act.addStretch(1)
+        act.addWidget(QLabel('传输:'))
+        act.addWidget(self.combo_jobs)
         act.addWidget(self.btn_pull)
+        self.btn_sync = PushButton('同步文件夹')
+        act.addWidget(self.btn_sync)
         lay.addLayout(act)
 
         root.addWidget(card)
@@ -337,15 +628,24 @@ class FileManagerTab(QWidget):
         _wrap_l.addWidget(self.prog_bar, 1)
         self.status_label = QLabel('', self)
         _wrap_l.addWidget(self.status_label)
+        self.btn_cancel_tx = PushButton('取消', self)
+        self.btn_cancel_tx.setVisible(False)
+        self.btn_cancel_tx.clicked.connect(self._cancel_transfer)
+        _wrap_l.addWidget(self.btn_cancel_tx)
         self.prog_wrap.setVisible(False)
         root.addWidget(self.prog_wrap)
 
         # signals
-        self.btn_refresh.clicked.connect(self._refresh)
+        self.btn_refresh.clicked.connect(lambda: self._refresh(use_cache=False))
         self.btn_go.clicked.connect(self._open_entered)
         self.btn_up.clicked.connect(self._go_up)
         self.btn_pull.clicked.connect(self._pull_selected)
-        self.table.cellDoubleClicked.connect(self._enter_item)
+        self.btn_sync.clicked.connect(lambda: self._sync_folder(self._cwd))
+        self.table.doubleClicked.connect(lambda idx: self._enter_item(idx.row(), idx.column()))
+        # 选中文件夹时后台统计大小，导出时进度条直接有准确总量
+        self.table.selectionModel().selectionChanged.connect(lambda *_: self._on_selection_changed())
+        self._size_ready.connect(lambda *_: self._update_selection_status(), Qt.QueuedConnection)
+        self._size_ready.connect(self._on_props_size_ready, Qt.QueuedConnection)
         try:
             self.table.viewport().customContextMenuRequested.connect(self._on_ctx_menu)
             self.table.customContextMenuRequested.connect(self._on_ctx_menu_widget)
@@ -353,8 +653,8 @@ class FileManagerTab(QWidget):
             pass
         
 
-    def _refresh(self):
-        # start worker to list
+    def _refresh(self, use_cache: bool = True):
+        # start worker to list；导航时优先用缓存，手动刷新时强制重新列目录
         path = self.path_edit.text().strip() or '/storage/emulated/0'
         # 避免并发列目录线程：若已有线程在跑，先尝试停止
         try:
@@ -362,12 +662,20 @@ class FileManagerTab(QWidget):
                 return
         except Exception:
             pass
+        # 导航即退出搜索
+        if self._search_active or self.search_edit.text():
+            self._search_active = False
+            self.search_edit.blockSignals(True)
+            self.search_edit.clear()
+            self.search_edit.blockSignals(False)
+            self._search_timer.stop()
         self._cwd = path
         self._thread = QThread(self)
-        self._worker = _ListWorker(path)
+        self._worker = _ListWorker(path, use_cache)
         self._worker.moveToThread(self._thread)
         self._thread.started.connect(self._worker.run)
         # 强制使用排队连接，确保在主线程更新 UI
+        self._worker.device.connect(self._on_list_device, Qt.QueuedConnection)
         self._worker.finished.connect(self._on_list_finished, Qt.QueuedConnection)
         
         self._worker.finished.connect(self._thread.quit)
@@ -380,43 +688,25 @@ class FileManagerTab(QWidget):
         self._thread = None
         self._worker = None
 
+    def _on_list_device(self, serial: str):
+        if serial == self._serial:
+            return
+        # 换了设备：旧设备的索引与进行中的索引任务都不再适用
+        self._serial = serial
+        self._index = None
+        try:
+            if self._index_worker:
+                self._index_worker.stop()
+        except RuntimeError:
+            pass
+
     def _on_list_finished(self, items: list, err: str):
         if err:
             QTimer.singleShot(0, lambda: self._set_status(f'列目录失败：{err}'))
             return
-        try:
-            self.table.setRowCount(0)
-        except Exception:
-            pass
-        for it in items:
-            name = it.get('name', '')
-            size = it.get('size', '')
-            typ = it.get('type', '')
-            # 显示规则：文件夹不显示大小，类型中文；文件按 KB/MB/GB 显示
-            if (typ or '').lower() == 'dir':
-                disp_size = '-'
-                disp_type = '文件夹'
-            else:
-                disp_type = '文件'
-                disp_size = self._fmt_size(size)
-            row = self.table.rowCount(); self.table.insertRow(row)
-            name_item = QTableWidgetItem(name)
-            # 设置图标
-            try:
-                if disp_type == '文件夹':
-                    ico = FluentIcon.FOLDER.icon()
-                else:
-                    # 文档图标（若不可用回退）
-                    try:
-                        ico = FluentIcon.DOCUMENT.icon()
-                    except Exception:
-                        ico = FluentIcon.FILE.icon() if hasattr(FluentIcon, 'FILE') else FluentIcon.DOCUMENT.icon()
-                name_item.setIcon(ico)
-            except Exception:
-                pass
-            self.table.setItem(row, 0, name_item)
-            self.table.setItem(row, 1, QTableWidgetItem(disp_size))
-            self.table.setItem(row, 2, QTableWidgetItem(disp_type))
+        self.model.set_items(items, self._cwd)
+        # 预取子目录，进入下一层时直接命中缓存
+        listing_cache.prefetch(self._cwd, items)
         QTimer.singleShot(0, lambda: self._set_status(f'共 {len(items)} 项'))
 
     def _open_entered(self):
@@ -432,31 +722,175 @@ class FileManagerTab(QWidget):
         self.path_edit.setText(parent)
         self._refresh()
 
+    def _toggle_thumbnails(self, on: bool):
+        try:
+            vh = self.table.verticalHeader()
+            if on:
+                self._row_height = getattr(self, '_row_height', vh.defaultSectionSize())
+                self.table.setIconSize(QSize(64, 64))
+                vh.setDefaultSectionSize(72)
+            else:
+                self.table.setIconSize(QSize(16, 16))
+                vh.setDefaultSectionSize(getattr(self, '_row_height', vh.defaultSectionSize()))
+        except Exception:
+            pass
+        self.model.set_thumbnails(on)
+
+    def _on_selection_changed(self):
+        self._prefetch_sizes()
+        self._update_selection_status()
+
+    def _prefetch_sizes(self, extra: str = ''):
+        """后台统计选中目录（及 extra）的大小；新一次预取会取代旧的，所以每次都带上全部选中项"""
+        dirs = []
+        for row in self._selected_rows():
+            name, typ = self._row_info(row)
+            if typ == '文件夹':
+                dirs.append(self._remote_path(name))
+        if extra and extra not in dirs:
+            dirs.insert(0, extra)
+        if dirs:
+            size_service.prefetch(dirs, callback=lambda p, b, n: self._size_ready.emit(p, b, n))
+
+    def _update_selection_status(self):
+        rows = self._selected_rows()
+        try:
+            if len(rows) == 0 or (self._tx_thread and self._tx_thread.isRunning()):
+                return
+        except RuntimeError:
+            return
+        total = files = 0
+        pending = False
+        for row in rows:
+            it = self.model.item(row)
+            if (it.get('type') or '').lower() == 'dir':
+                hit = size_service.get_cached(self._remote_path(it.get('name', '')), serial=size_service.last_serial())
+                if hit is None:
+                    pending = True
+                    continue
+                total += hit[0]; files += hit[1]
+            else:
+                try:
+                    total += int(it.get('size') or 0)
+                except ValueError:
+                    pass
+                files += 1
+        text = f'已选 {len(rows)} 项：{self._fmt_size(total)}，{files} 个文件'
+        if pending:
+            text += '（统计中...）'
+        self._on_stream_rate(text)
+        self.prog_wrap.setVisible(True)
+
+    def _selected_rows(self) -> list:
+        try:
+            return sorted({idx.row() for idx in self.table.selectionModel().selectedRows()})
+        except Exception:
+            return []
+
+    def _remote_path(self, name: str) -> str:
+        return (self._cwd.rstrip('/') + '/' + name) if self._cwd != '/' else ('/' + name)
+
+    def _row_info(self, row: int):
+        """返回 (名称, '文件夹'|'文件')"""
+        it = self.model.item(row)
+        if not it:
+            return '', ''
+        return it.get('name', ''), ('文件夹' if (it.get('type') or '').lower() == 'dir' else '文件')
+
     def _enter_item(self, row: int, col: int):
-        name = self.table.item(row, 0).text() if self.table.item(row,0) else ''
-        typ = self.table.item(row, 2).text() if self.table.item(row,2) else ''
+        name, typ = self._row_info(row)
         if not name:
             return
         if typ == '文件夹':
             newp = (self._cwd.rstrip('/') + '/' + name) if self._cwd != '/' else ('/' + name)
             self.path_edit.setText(newp)
             self._refresh()
+        elif self._search_active and '/' in name:
+            # 搜索结果中的文件：打开其所在目录
+            self.path_edit.setText(posixpath.join(self._cwd, posixpath.dirname(name)))
+            self._refresh()
+
+    # ---------- 搜索 ----------
+    def _run_search(self):
+        query = self.search_edit.text().strip()
+        if not query:
+            if self._search_active:
+                self._search_active = False
+                self._refresh()
+            return
+        self._search_active = True
+        if not self._serial:
+            self._set_status('未检测到设备，无法搜索')
+            return
+        if self._index is None or self._index.serial != self._serial:
+            self._index = search_index.SearchIndex(self._serial)
+        root = self._index.covering_root(self._cwd)
+        if root is None:
+            # 当前目录尚未索引：后台建立，完成后自动重新查询
+            self._start_indexing(self._cwd)
+            return
+        try:
+            results = self._index.search(scope=self._cwd, **search_index.parse_query(query))
+        except Exception as e:
+            self._set_status(f'搜索失败：{e}')
+            return
+        base = self._cwd.rstrip('/') + '/'
+        items = [{
+            'name': r['path'][len(base):],
+            'size': '-' if r['type'] == 'dir' else str(r['size']),
+            'type': r['type'],
+            'mtime': r['mtime'],
+        } for r in results]
+        self.model.set_items(items, self._cwd)
+        more = '（仅显示前 %d 项）' % search_index.DEFAULT_LIMIT if len(items) >= search_index.DEFAULT_LIMIT else ''
+        self._on_stream_rate(f'找到 {len(items)} 项{more}')
+        self.prog_wrap.setVisible(True)
+        # 索引较旧时在后台增量刷新，完成后结果自动更新
+        if self._index.age(root) > search_index.STALE_AFTER:
+            self._start_indexing(root)
+
+    def _start_indexing(self, root: str):
+        try:
+            if self._index_thread and self._index_thread.isRunning():
+                return
+        except Exception:
+            pass
+        self._index_thread = QThread(self)
+        self._index_worker = _IndexWorker(root, self._index)
+        self._index_worker.moveToThread(self._index_thread)
+        self._index_thread.started.connect(self._index_worker.run)
+        self._index_worker.progress.connect(self._on_stream_rate, Qt.QueuedConnection)
+        self._index_worker.finished.connect(self._on_index_finished, Qt.QueuedConnection)
+        self._index_worker.finished.connect(self._index_thread.quit)
+        self._index_worker.finished.connect(self._index_worker.deleteLater)
+        self._index_thread.finished.connect(self._index_thread.deleteLater)
+        self._index_thread.finished.connect(self._cleanup_index_thread)
+        self.prog_wrap.setVisible(True)
+        self._on_stream_rate('正在建立索引...')
+        self._index_thread.start()
+
+    def _cleanup_index_thread(self):
+        self._index_thread = None
+        self._index_worker = None
+
+    def _on_index_finished(self, index, err: str):
+        if index is None:
+            self._set_status(f'建立索引失败：{err}')
+            return
+        if index.serial != self._serial:
+            # 建立期间切换了设备
+            return
+        self._index = index
+        if self._search_active:
+            self._run_search()
 
     def _pull_selected(self):
-        row = self.table.currentRow()
+        row = self.table.currentIndex().row()
         if row < 0:
             QTimer.singleShot(0, lambda: self._set_status('请选择文件'))
             return
-        name = self.table.item(row, 0).text() if self.table.item(row,0) else ''
-        typ = self.table.item(row, 2).text() if self.table.item(row,2) else ''
-        if typ == '文件夹':
-            QTimer.singleShot(0, lambda: self._set_status('暂不支持拉取文件夹'))
-            return
-        remote = (self._cwd.rstrip('/') + '/' + name) if self._cwd != '/' else ('/' + name)
-        local, _ = QFileDialog.getSaveFileName(self, '保存到本地', name)
-        if not local:
-            return
-        self._start_stream_transfer('pull', remote, local, self._probe_total(remote))
+        name, typ = self._row_info(row)
+        self._export_item(name, typ)
 
     def cleanup(self):
         try:
@@ -464,6 +898,18 @@ class FileManagerTab(QWidget):
                 self._thread.quit(); self._thread.wait(800)
         except Exception:
             pass
+        try:
+            if self._index_worker:
+                self._index_worker.stop()
+            if self._index_thread and self._index_thread.isRunning():
+                self._index_thread.quit(); self._index_thread.wait(1000)
+        except Exception:
+            pass
+        try:
+            if self._tx_worker and hasattr(self._tx_worker, 'stop'):
+                self._tx_worker.stop()
+        except Exception:
+            pass
         try:
             if self._tx_thread and self._tx_thread.isRunning():
                 self._tx_thread.quit(); self._tx_thread.wait(1000)
@@ -523,8 +969,13 @@ class FileManagerTab(QWidget):
         row = self.table.indexAt(pos).row()
         if row < 0:
             return
-        name = self.table.item(row, 0).text() if self.table.item(row,0) else ''
-        typ = self.table.item(row, 2).text() if self.table.item(row,2) else ''
+        name, typ = self._row_info(row)
+        # 右键处于多选范围内时对全部选中项操作，否则只针对该行
+        selected = self._selected_rows()
+        if row not in selected:
+            selected = [row]
+        names = [self._row_info(r)[0] for r in selected]
+        multi = len(names) > 1
         menu = QMenu(self)
         act_open = QAction('打开', self)
         act_export = QAction('导出', self)
@@ -536,19 +987,30 @@ class FileManagerTab(QWidget):
         act_props = QAction('属性', self)
         act_import_files = QAction('导入文件', self)
         act_import_dir = QAction('导入文件夹', self)
+        act_sync = QAction('与电脑文件夹同步...', self)
         act_refresh = QAction('刷新', self)
         act_open.setEnabled(typ == '文件夹')
         act_open.triggered.connect(lambda: self._enter_item(row, 0))
-        act_export.triggered.connect(lambda: self._export_item(name, typ))
-        act_copy.triggered.connect(lambda: self._clipboard_set('copy', name))
-        act_cut.triggered.connect(lambda: self._clipboard_set('cut', name))
+        if multi:
+            act_open.setEnabled(False)
+            act_export.setText(f'导出 {len(names)} 项')
+            act_delete.setText(f'删除 {len(names)} 项')
+            act_export.triggered.connect(lambda: self._export_items(names))
+        else:
+            act_export.triggered.connect(lambda: self._export_item(name, typ))
+        act_copy.triggered.connect(lambda: self._clipboard_set('copy', names))
+        act_cut.triggered.connect(lambda: self._clipboard_set('cut', names))
         act_paste.triggered.connect(self._paste_items)
+        act_rename.setEnabled(not multi and '/' not in name)
         act_rename.triggered.connect(lambda: self._rename_item(name))
-        act_delete.triggered.connect(lambda: self._delete_item(name))
+        act_delete.triggered.connect(lambda: self._delete_items(names))
+        act_props.setEnabled(not multi)
         act_props.triggered.connect(lambda: self._show_props(name))
         act_import_files.triggered.connect(self._import_files)
         act_import_dir.triggered.connect(self._import_folder)
-        act_refresh.triggered.connect(self._refresh)
+        act_sync.setEnabled(typ == '文件夹' and not multi)
+        act_sync.triggered.connect(lambda: self._sync_folder(posixpath.join(self._cwd, name)))
+        act_refresh.triggered.connect(lambda: self._refresh(use_cache=False))
         menu.addAction(act_open)
         menu.addAction(act_export)
         menu.addSeparator()
@@ -562,6 +1024,7 @@ class FileManagerTab(QWidget):
         menu.addSeparator()
         menu.addAction(act_import_files)
         menu.addAction(act_import_dir)
+        menu.addAction(act_sync)
         menu.addSeparator()
         menu.addAction(act_refresh)
         menu.exec(self.table.viewport().mapToGlobal(pos))
@@ -573,38 +1036,33 @@ class FileManagerTab(QWidget):
             if not local_dir:
                 return
             dest = os.path.join(local_dir, os.path.basename(name))
-            self._start_stream_transfer('pull', remote, dest, self._probe_total(remote))
+            self._start_queue_transfer([('pull', remote, dest)])
         else:
             local, _ = QFileDialog.getSaveFileName(self, '导出文件到本地', name)
             if not local:
                 return
-            self._start_stream_transfer('pull', remote, local, self._probe_total(remote))
+            self._start_queue_transfer([('pull', remote, local)])
+
+    def _export_items(self, names: list):
+        local_dir = QFileDialog.getExistingDirectory(self, f'选择 {len(names)} 项的导出位置')
+        if not local_dir:
+            return
+        self._start_queue_transfer([
+            ('pull', self._remote_path(n), os.path.join(local_dir, posixpath.basename(n))) for n in names
+        ])
 
     def _import_files(self):
         files, _ = QFileDialog.getOpenFileNames(self, '选择要导入的文件')
         if not files:
             return
-        # 估算总大小（本地）
-        total = 0
-        try:
-            for p in files:
-                try:
-                    total += os.path.getsize(p)
-                except Exception:
-                    pass
-        except Exception:
-            total = 0
-        # 逐个 push，进度对话框逐个显示
-        # 简化：若多文件，无法单对话框展示合并进度，这里逐个弹出
-        for p in files:
-            self._start_stream_transfer('push', p, self._cwd, os.path.getsize(p) if os.path.exists(p) else 0)
+        # 全部文件进入同一个传输队列，合并显示进度
+        self._start_queue_transfer([('push', p, self._cwd) for p in files])
 
     def _import_folder(self):
         folder = QFileDialog.getExistingDirectory(self, '选择要导入的文件夹')
         if not folder:
             return
-        # 文件夹大小估算代价较高，这里置 0，由 adb 输出提供进度（若有）
-        self._start_stream_transfer('push', folder, self._cwd, 0)
+        self._start_queue_transfer([('push', folder, self._cwd)])
 
     def _start_transfer(self, mode: str, src, dst):
         # 防并发：如有正在执行的传输，先结束
@@ -614,6 +1072,16 @@ class FileManagerTab(QWidget):
                 return
         except Exception:
             pass
+        if mode == 'rename':
+            self._tx_affected = [src, posixpath.join(posixpath.dirname(src), dst)]
+        elif mode in ('copy', 'move'):
+            self._tx_affected = [posixpath.join(dst, posixpath.basename(src))] + ([src] if mode == 'move' else [])
+        elif mode == 'batch':
+            self._tx_affected = []
+            for op in src:
+                self._tx_affected.append(op[1])
+                if op[0] in ('move', 'copy'):
+                    self._tx_affected.append(posixpath.join(op[2], posixpath.basename(op[1])))
         self._tx_thread = QThread(self)
         self._tx_worker = _TransferWorker(mode, src, dst)
         self._tx_worker.moveToThread(self._tx_thread)
@@ -630,6 +1098,11 @@ class FileManagerTab(QWidget):
         self._tx_worker = None
 
     def _on_transfer_finished(self, ok: bool, msg: str):
+        # 无论成败都可能已部分改动设备上的文件
+        if self._tx_affected:
+            listing_cache.invalidate(self._tx_affected, recursive=True)
+            size_service.invalidate(self._tx_affected)
+            self._tx_affected = []
         if ok:
             QTimer.singleShot(0, lambda: self._set_status('操作已完成'))
             # 完成后刷新列表（例如导入后显示新文件）
@@ -641,10 +1114,12 @@ class FileManagerTab(QWidget):
             QTimer.singleShot(0, lambda: self._set_status(msg or '操作失败'))
 
     # ---------- Clipboard & Operations ----------
-    def _clipboard_set(self, mode: str, name: str):
-        remote = (self._cwd.rstrip('/') + '/' + name) if self._cwd != '/' else ('/' + name)
-        self._clipboard = {"mode": mode, "paths": [remote]}
-        QTimer.singleShot(0, lambda: self._set_status('已复制' if mode=='copy' else '已剪切'))
+    def _clipboard_set(self, mode: str, names: list):
+        self._clipboard = {"mode": mode, "paths": [self._remote_path(n) for n in names]}
+        text = '已复制' if mode == 'copy' else '已剪切'
+        if len(names) > 1:
+            text += f' {len(names)} 项'
+        QTimer.singleShot(0, lambda: self._set_status(text))
 
     def _paste_items(self):
         mode = self._clipboard.get('mode')
@@ -652,12 +1127,9 @@ class FileManagerTab(QWidget):
         if not mode or not paths:
             self._set_status('剪贴板为空')
             return
-        src = paths[0]
         dst_dir = self._cwd
-        if mode == 'copy':
-            self._start_transfer('copy', src, dst_dir)
-        elif mode == 'cut':
-            self._start_transfer('move', src, dst_dir)
+        op = 'copy' if mode == 'copy' else 'move'
+        self._start_transfer('batch', [(op, p, dst_dir) for p in paths], None)
 
     def _rename_item(self, name: str):
         new_name, ok = QInputDialog.getText(self, '重命名', '新名称：', text=name)
@@ -682,6 +1154,11 @@ class FileManagerTab(QWidget):
         ftype = info.get('type') or _fallback_type()
         raw_size = info.get('size', '-')
         size_disp = self._fmt_size(raw_size)
+        is_dir = ftype in ('directory', '目录')
+        if is_dir:
+            # 目录的 stat 大小只是目录项本身，改为其下全部文件的统计：有缓存直接显示，否则后台统计后填入
+            hit = size_service.get_cached(remote, serial=size_service.last_serial())
+            size_disp = f'{self._fmt_size(hit[0])}（{hit[1]} 个文件）' if hit else '统计中…'
         mtime = info.get('mtime', info.get('raw_mtime', '-'))
         perm = info.get('perm', '-')
         user = info.get('user', '-')
@@ -704,53 +1181,110 @@ class FileManagerTab(QWidget):
         dlg = MessageDialog('属性', msg, self)
         dlg.yesButton.setText('关闭')
         dlg.cancelButton.setVisible(False)
-        dlg.exec()
-
-    def _delete_item(self, name: str):
-        remote = (self._cwd.rstrip('/') + '/' + name) if self._cwd != '/' else ('/' + name)
-        # 无模态弹窗，直接执行删除（如需确认我可再加）
-        ok, msg = adb_service.delete_path(remote)
-        if ok:
-            self._set_status('已删除')
-            self._refresh()
-        else:
-            self._set_status(msg or '删除失败')
+        if is_dir and size_disp == '统计中…':
+            self._props_pending = (remote, dlg, detail_lines)
+            self._prefetch_sizes(remote)
+        try:
+            dlg.exec()
+        finally:
+            self._props_pending = None
 
-    def _probe_total(self, remote: str) -> int:
+    def _on_props_size_ready(self, path: str, total, files: int):
+        pending = self._props_pending
+        if not pending or pending[0] != path:
+            return
+        _, dlg, lines = pending
+        lines[:] = [
+            f'大小：{self._fmt_size(total)}（{files} 个文件）' if ln.startswith('大小：') else ln for ln in lines
+        ]
         try:
-            info = adb_service.stat_path(remote)
-            sz = int(info.get('size', '0')) if info.get('size') else 0
-            if sz > 0:
-                return sz
-        except Exception:
+            dlg.contentLabel.setText('\n'.join(lines))
+        except (AttributeError, RuntimeError):
             pass
-        # 目录时尝试 du -s（近似，以KB为单位）
+
+    def _delete_items(self, names: list):
+        if not names:
+            return
+        # 单项无模态弹窗直接删除；多选时确认一次
+        if len(names) > 1:
+            confirm = MessageDialog('删除', f'确定删除选中的 {len(names)} 项吗？此操作不可恢复。', self)
+            if confirm.exec() != MessageDialog.Accepted:
+                return
+        # 全部删除合并为一次 adb shell
+        self._start_transfer('batch', [('delete', self._remote_path(n)) for n in names], None)
+
+    def _start_queue_transfer(self, jobs: list):
+        # 防并发
         try:
-            out = adb_service._adb_shell(["du", "-s", remote], timeout=20)
-            # format: "<KB>\t<path>"
-            kb = int((out.strip().split() or ['0'])[0])
-            return kb * 1024
+            if self._tx_thread and self._tx_thread.isRunning():
+                InfoBar.info('提示', '正在进行传输，请稍候...', parent=self, position=InfoBarPosition.TOP, isClosable=True)
+                return
         except Exception:
-            return 0
+            pass
+        self._tx_affected = [
+            posixpath.join(dst, os.path.basename(os.path.normpath(src)))
+            for mode, src, dst in jobs if mode == 'push'
+        ]
+        self._run_stream_worker(_QueueTransferWorker(
+            jobs, self.combo_jobs.currentData() or transfer_queue.DEFAULT_CONCURRENCY,
+            tar_mode=self.chk_tar.isChecked(), compress=self.chk_tar_gz.isChecked(),
+        ))
 
-    def _start_stream_transfer(self, mode: str, src: str, dst: str, total: int | None = None):
-        # 防并发
+    def _sync_folder(self, remote: str):
         try:
             if self._tx_thread and self._tx_thread.isRunning():
                 InfoBar.info('提示', '正在进行传输，请稍候...', parent=self, position=InfoBarPosition.TOP, isClosable=True)
                 return
         except Exception:
             pass
+        local = QFileDialog.getExistingDirectory(self, f'选择与 {remote} 同步的电脑文件夹')
+        if not local:
+            return
+        modes = {
+            '双向同步（两侧的新增与修改互相同步）': folder_sync.BOTH,
+            '电脑 → 设备': folder_sync.PUSH,
+            '设备 → 电脑': folder_sync.PULL,
+        }
+        label, ok = QInputDialog.getItem(self, '同步文件夹', '同步方式：', list(modes), 0, False)
+        if not ok:
+            return
+        delete_modes = {
+            '不删除文件（只复制新增与修改的文件）': False,
+            '同步删除（双向：删除对侧已删的文件；单向：删除目标侧多余的文件，执行前确认）': True,
+        }
+        delete_label, ok = QInputDialog.getItem(self, '同步文件夹', '删除处理：', list(delete_modes), 0, False)
+        if not ok:
+            return
+        self._tx_affected = [remote]
+        worker = _FolderSyncWorker(
+            local, remote, modes[label], self.combo_jobs.currentData() or transfer_queue.DEFAULT_CONCURRENCY,
+            delete=delete_modes[delete_label],
+        )
+        worker.confirm_deletes.connect(self._confirm_sync_deletes, Qt.QueuedConnection)
+        self._run_stream_worker(worker)
+
+    def _confirm_sync_deletes(self, text: str):
+        worker = self._tx_worker
+        dlg = MessageDialog('确认删除', text, self)
+        accepted = dlg.exec() == MessageDialog.Accepted
+        try:
+            if worker is not None:
+                worker.confirm(accepted)
+        except RuntimeError:
+            pass
+
+    def _run_stream_worker(self, worker: _QueueTransferWorker):
         self._tx_thread = QThread(self)
-        worker = _StreamTransferWorker(mode, src, dst, total or 0)
         self._tx_worker = worker
         worker.moveToThread(self._tx_thread)
         self._tx_thread.started.connect(worker.run)
         # inline progress
         self._progress_reset()
+        self.btn_cancel_tx.setVisible(True)
         
         # Connect signals to slots using QueuedConnection
         worker.progress.connect(self._on_stream_progress, Qt.QueuedConnection)
+        worker.rate.connect(self._on_stream_rate, Qt.QueuedConnection)
         worker.finished.connect(self._on_stream_finished, Qt.QueuedConnection)
         
         worker.finished.connect(self._tx_thread.quit)
@@ -762,9 +1296,25 @@ class FileManagerTab(QWidget):
     def _on_stream_progress(self, pct: int):
         self._progress_update(pct)
 
+    def _on_stream_rate(self, text: str):
+        try:
+            self.status_label.setText(text)
+        except Exception:
+            pass
+
+    def _cancel_transfer(self):
+        try:
+            if self._tx_worker and hasattr(self._tx_worker, 'stop'):
+                self._tx_worker.stop()
+        except RuntimeError:
+            pass
+
     def _on_stream_finished(self, ok: bool, msg: str):
+        self.btn_cancel_tx.setVisible(False)
         self._progress_complete(ok, msg)
         self._on_transfer_finished(ok, msg)
+        if ok and msg:
+            InfoBar.success('完成', msg, parent=self, position=InfoBarPosition.TOP, isClosable=True)
 
     def _progress_reset(self):
         def _do():
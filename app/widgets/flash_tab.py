@@ -19,7 +19,7 @@ from qfluentwidgets import (
 )
 
 from app.services import adb_service
-from app.logic import SideloadFlashLogic, MiFlashLogic
+from app.logic import SideloadFlashLogic, MiFlashLogic, PayloadFlashLogic
 
 
 class _DeviceWatcher(QObject):
@@ -82,9 +82,15 @@ class _FlashWorker(QObject):
         self.config_path = config_path
         self.parent_tab = parent_tab  # 引用父 Tab 以访问刷机方法
         self._cancelled = False
+        self._logic = None
     
     def cancel(self):
         self._cancelled = True
+        if self._logic is not None:
+            try:
+                self._logic.stop()
+            except Exception:
+                pass
     
     def run(self):
         """在后台线程中执行刷机"""
@@ -95,6 +101,8 @@ class _FlashWorker(QObject):
                 self._flash_sideload()
             elif self.mode == 2:  # 小米线刷脚本
                 self._flash_miflash()
+            elif self.mode == 3:  # Payload 直刷
+                self._flash_payload()
         except Exception as e:
             self.log_signal.emit(f"刷机异常: {e}")
             self.finished.emit(False, str(e))
@@ -201,6 +209,33 @@ class _FlashWorker(QObject):
             self.log_signal.emit(f"小米线刷异常: {e}")
             self.finished.emit(False, str(e))
 
+    def _flash_payload(self):
+        """payload.bin 边解包边刷入"""
+        self.log_signal.emit("=" * 50)
+        self.log_signal.emit("Payload 直刷模式（边解包边刷入）")
+        self.log_signal.emit("=" * 50)
+        try:
+            skip = []
+            wipe = False
+            if self.parent_tab:
+                if getattr(self.parent_tab, 'keep_root_check', None) and self.parent_tab.keep_root_check.isChecked():
+                    skip = ['boot', 'init_boot']
+                    self.log_signal.emit("已勾选保留 ROOT，跳过 boot / init_boot")
+                if getattr(self.parent_tab, 'wipe_check', None):
+                    wipe = bool(self.parent_tab.wipe_check.isChecked())
+            self._logic = PayloadFlashLogic(
+                log_callback=self.log_signal.emit,
+                progress_callback=lambda c, t, p: self.progress_signal.emit(c, t, p),
+            )
+            success = self._logic.flash_payload(self.path, skip=skip, wipe=wipe)
+            if success:
+                self.finished.emit(True, "Payload 直刷完成")
+            else:
+                self.finished.emit(False, "Payload 直刷失败")
+        except Exception as e:
+            self.log_signal.emit(f"Payload 直刷异常: {e}")
+            self.finished.emit(False, str(e))
+
 
 class FlashTab(QWidget):
     log_signal = Signal(str)
@@ -310,7 +345,8 @@ class FlashTab(QWidget):
         self.combo_mode.addItems([
             "散包刷机（文件夹）",
             "ADB Sideload",
-            "小米线刷脚本"
+            "小米线刷脚本",
+            "Payload 直刷（边解包边刷）"
         ])
         self.combo_mode.currentIndexChanged.connect(self._on_mode_changed)
         
@@ -558,6 +594,11 @@ class FlashTab(QWidget):
             self.btn_pick.setText("选择目录")
             if hasattr(self, 'card_config'):
                 self.card_config.setVisible(False)  # 隐藏配置文件
+        elif index == 3:  # Payload 直刷
+            self.path_edit.setPlaceholderText("选择 payload.bin 或全量 OTA 包 (.zip)")
+            self.btn_pick.setText("选择文件")
+            if hasattr(self, 'card_config'):
+                self.card_config.setVisible(False)  # 隐藏配置文件
         
         # 清空路径
         self.path_edit.clear()
@@ -572,6 +613,8 @@ class FlashTab(QWidget):
             path, _ = QFileDialog.getOpenFileName(self, "选择 OTA 包", "", "OTA 包 (*.zip);;All (*.*)")
         elif mode == 2:  # 小米线刷脚本
             path = QFileDialog.getExistingDirectory(self, "选择小米线刷包目录")
+        elif mode == 3:  # Payload 直刷
+            path, _ = QFileDialog.getOpenFileName(self, "选择 payload", "", "Payload (*.bin *.zip);;All (*.*)")
 
         if path:
             self._source_path = path
@@ -672,7 +715,7 @@ class FlashTab(QWidget):
             if not os.path.isdir(path):
                 self._toast_warning("提示", "选择的路径不是有效的文件夹。")
                 return
-        elif mode == 1:  # Sideload 需要文件
+        elif mode in [1, 3]:  # Sideload、Payload 直刷需要文件
             if not os.path.isfile(path):
                 self._toast_warning("提示", "选择的路径不是有效的文件。")
                 return
@@ -686,10 +729,10 @@ class FlashTab(QWidget):
             config_path = str(self._config_path)
 
         # 设备模式检查
-        # - 散包：强制要求 bootloader/fastbootd
+        # - 散包 / Payload 直刷：强制要求 bootloader/fastbootd
         # - Sideload：不检查 fastboot
         # - 小米线刷脚本：不强制拦截（脚本失败与否由脚本自行决定）
-        if mode == 0:
+        if mode in [0, 3]:
             from app.services import adb_service
             device_mode, serial = adb_service.detect_connection_mode()
             if device_mode not in ['bootloader', 'fastbootd']:
@@ -710,7 +753,7 @@ class FlashTab(QWidget):
             except Exception:
                 pass
         from qfluentwidgets import MessageBox
-        mode_names = ["散包刷机", "ADB Sideload", "小米线刷脚本"]
+        mode_names = ["散包刷机", "ADB Sideload", "小米线刷脚本", "Payload 直刷"]
         
         msg_box = MessageBox(
             "确认刷机",
@@ -857,6 +900,11 @@ class FlashTab(QWidget):
         self._run_flash_plan(plan, folder)
 
     def cancel(self):
+        try:
+            if self._flash_worker:
+                self._flash_worker.cancel()
+        except Exception:
+            pass
         try:
             if self._flashing:
                 self._flashing = False
@@ -1152,6 +1152,8 @@ class _PayloadExtractDialog(QDialog):
         self.resize(700, 500)
         self._worker = None
         self._thread = None
+        self._inspect_thread = None
+        self._inspect_worker = None
         
         layout = QVBoxLayout(self)
         
@@ -1199,8 +1201,14 @@ class _PayloadExtractDialog(QDialog):
         partition_label = QLabel("要提取的分区（留空提取全部）:")
         self.partition_edit = QLineEdit()
         self.partition_edit.setPlaceholderText("例如: boot,vendor,system 或留空提取全部")
+        self.inspect_btn = QPushButton("读取分区列表")
+        self.inspect_btn.clicked.connect(self._inspect_manifest)
+        partition_row = QHBoxLayout()
+        partition_row.setContentsMargins(0, 0, 0, 0)
+        partition_row.addWidget(self.partition_edit)
+        partition_row.addWidget(self.inspect_btn)
         partition_layout.addWidget(partition_label)
-        partition_layout.addWidget(self.partition_edit)
+        partition_layout.addLayout(partition_row)
         layout.addWidget(partition_group)
         
         # 输出目录
@@ -1259,6 +1267,67 @@ class _PayloadExtractDialog(QDialog):
         path = QFileDialog.getExistingDirectory(self, "选择输出目录")
         if path:
             self.out_edit.setText(path)
+
+    def _current_source(self) -> str:
+        if self.mode_local.isChecked():
+            source = self.local_edit.text().strip()
+            if not source or not os.path.exists(source):
+                QMessageBox.warning(self, "提示", "请选择有效的文件")
+                return ""
+        else:
+            source = self.url_edit.text().strip()
+            if not source or not source.startswith('http'):
+                QMessageBox.warning(self, "提示", "请输入有效的 HTTP/HTTPS URL")
+                return ""
+        return source
+
+    def _inspect_manifest(self):
+        if self._inspect_thread and self._inspect_thread.isRunning():
+            return
+        source = self._current_source()
+        if not source:
+            return
+        self.inspect_btn.setEnabled(False)
+        self.log.append(f"正在读取分区清单: {source}")
+        self._inspect_thread = QThread(self)
+        self._inspect_worker = _PayloadManifestWorker(source)
+        self._inspect_worker.moveToThread(self._inspect_thread)
+        self._inspect_thread.started.connect(self._inspect_worker.run)
+        self._inspect_worker.finished.connect(self._on_manifest_ready, Qt.QueuedConnection)
+        self._inspect_worker.finished.connect(self._inspect_thread.quit)
+        self._inspect_worker.finished.connect(self._inspect_worker.deleteLater)
+        self._inspect_thread.finished.connect(self._inspect_thread.deleteLater)
+        self._inspect_thread.finished.connect(self._cleanup_inspect_thread)
+        self._inspect_thread.start()
+
+    def _cleanup_inspect_thread(self):
+        self._inspect_thread = None
+        self._inspect_worker = None
+
+    def _on_manifest_ready(self, info: dict, err: str):
+        self.inspect_btn.setEnabled(True)
+        if err:
+            self.log.append(f"❌ 读取清单失败: {err}")
+            return
+        parts = info.get('partitions') or []
+        self.log.append(
+            f"清单读取完成: {len(parts)} 个分区，耗时 {info.get('elapsed', 0):.2f}s"
+            + ("（缓存）" if info.get('cached') else "")
+        )
+        if info.get('incremental'):
+            self.log.append("⚠️ 这是增量 OTA 包，提取需要原始镜像，可能无法直接使用")
+        current = [p.strip() for p in self.partition_edit.text().split(',') if p.strip()]
+        dlg = _PayloadPartitionPickerDialog(parts, current, self)
+        if dlg.exec() == QDialog.Accepted:
+            selected = dlg.get_selected()
+            if not selected and parts:
+                # 分区框留空表示提取全部，不能用它表示“一个都不选”
+                QMessageBox.warning(self, "提示", "未选择任何分区，已保留原有的分区设置")
+                return
+            if len(selected) == len(parts):
+                self.partition_edit.clear()
+            else:
+                self.partition_edit.setText(','.join(selected))
     
     def _run_extract(self):
         # 验证输入
@@ -1325,6 +1394,9 @@ class _PayloadExtractDialog(QDialog):
         self._cleanup()
     
     def _cleanup(self):
+        if self._inspect_thread and self._inspect_thread.isRunning():
+            self._inspect_thread.quit()
+            self._inspect_thread.wait(2000)
         if self._thread and self._thread.isRunning():
             self._thread.quit()
             self._thread.wait(2000)
@@ -1413,3 +1485,115 @@ class _PayloadWorker(QObject):
                 
         except Exception as e:
             self.error.emit(str(e))
+
+
+class _PayloadManifestWorker(QObject):
+    finished = Signal(dict, str)
+
+    def __init__(self, source: str):
+        super().__init__()
+        self.source = source
+
+    def run(self):
+        try:
+            from app.services import payload_service
+            t0 = time.perf_counter()
+            info = dict(payload_service.inspect_payload(self.source))
+            info['elapsed'] = time.perf_counter() - t0
+            self.finished.emit(info, "")
+        except Exception as e:
+            self.finished.emit({}, str(e))
+
+
+class _PayloadPartitionPickerDialog(QDialog):
+    def __init__(self, partitions: list, checked: list, parent=None):
+        super().__init__(parent)
+        from PySide6.QtWidgets import QTableWidget, QTableWidgetItem, QHeaderView
+        from app.services.payload_service import format_size
+        self.setWindowTitle("选择要提取的分区")
+        self.resize(760, 520)
+        self._partitions = partitions
+
+        layout = QVBoxLayout(self)
+        total = sum(int(p.get('size') or 0) for p in partitions)
+        layout.addWidget(QLabel(f"共 {len(partitions)} 个分区，解包后合计 {format_size(total)}"))
+
+        tools = QHBoxLayout()
+        btn_all = QPushButton("全选")
+        btn_all.clicked.connect(lambda: self._set_all(True))
+        btn_none = QPushButton("全不选")
+        btn_none.clicked.connect(lambda: self._set_all(False))
+        btn_inv = QPushButton("反选")
+        btn_inv.clicked.connect(self._invert)
+        tools.addWidget(btn_all)
+        tools.addWidget(btn_none)
+        tools.addWidget(btn_inv)
+        tools.addStretch(1)
+        self.summary = QLabel("")
+        tools.addWidget(self.summary)
+        layout.addLayout(tools)
+
+        self.table = QTableWidget(len(partitions), 5, self)
+        self.table.setHorizontalHeaderLabels(["分区", "大小", "类型", "操作数", "SHA-256"])
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setStretchLastSection(True)
+        for row, p in enumerate(partitions):
+            name_item = QTableWidgetItem(p.get('name', ''))
+            name_item.setFlags(name_item.flags() | Qt.ItemIsUserCheckable)
+            name_item.setCheckState(Qt.Checked if (not checked or p.get('name') in checked) else Qt.Unchecked)
+            self.table.setItem(row, 0, name_item)
+            size_item = QTableWidgetItem(format_size(p.get('size', 0)))
+            size_item.setData(Qt.UserRole, int(p.get('size') or 0))
+            self.table.setItem(row, 1, size_item)
+            self.table.setItem(row, 2, QTableWidgetItem("逻辑" if p.get('logical') else "物理"))
+            ops = p.get('op_types') or {}
+            op_item = QTableWidgetItem(str(p.get('op_count', 0)))
+            op_item.setToolTip("\n".join(f"{k}: {v}" for k, v in ops.items()))
+            self.table.setItem(row, 3, op_item)
+            digest = p.get('sha256', '')
+            hash_item = QTableWidgetItem(digest[:16] + ('…' if digest else ''))
+            hash_item.setToolTip(digest)
+            self.table.setItem(row, 4, hash_item)
+        self.table.itemChanged.connect(self._update_summary)
+        layout.addWidget(self.table)
+
+        btns = QHBoxLayout()
+        btns.addStretch(1)
+        ok_btn = QPushButton("确定")
+        ok_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("取消")
+        cancel_btn.clicked.connect(self.reject)
+        btns.addWidget(ok_btn)
+        btns.addWidget(cancel_btn)
+        layout.addLayout(btns)
+        self._update_summary()
+
+    def _set_all(self, on: bool):
+        for row in range(self.table.rowCount()):
+            self.table.item(row, 0).setCheckState(Qt.Checked if on else Qt.Unchecked)
+
+    def _invert(self):
+        for row in range(self.table.rowCount()):
+            it = self.table.item(row, 0)
+            it.setCheckState(Qt.Unchecked if it.checkState() == Qt.Checked else Qt.Checked)
+
+    def _update_summary(self, *_):
+        from app.services.payload_service import format_size
+        count = 0
+        size = 0
+        for row in range(self.table.rowCount()):
+            if self.table.item(row, 0).checkState() == Qt.Checked:
+                count += 1
+                size += int(self.table.item(row, 1).data(Qt.UserRole) or 0)
+        self.summary.setText(f"已选 {count} 个，{format_size(size)}")
+
+    def get_selected(self) -> list:
+        return [
+            self.table.item(row, 0).text()
+            for row in range(self.table.rowCount())
+            if self.table.item(row, 0).checkState() == Qt.Checked
+        ]
@@ -4,7 +4,8 @@ import datetime
 import webbrowser
 from pathlib import Path
 
-from PySide6.QtCore import Qt, QThread, Signal, QObject, QTimer, QSettings
+from PySide6.QtCore import Qt, QThread, Signal, QObject, QTimer, QSettings, QSize
+from PySide6.QtGui import QIcon, QPixmap
 from PySide6.QtWidgets import (
     QApplication,
     QWidget,
@@ -16,6 +17,8 @@ from PySide6.QtWidgets import (
     QListWidget,
     QListWidgetItem,
     QProgressBar,
+    QTableWidgetItem,
+    QHeaderView,
 )
 
 from qfluentwidgets import (
@@ -32,20 +35,11 @@ from qfluentwidgets import (
     SubtitleLabel,
     BodyLabel,
     ListWidget,
+    ComboBox,
+    TableWidget,
 )
 
-from app.services import adb_service
-
-
-def _silent_popen_kwargs() -> dict:
-    try:
-        if os.name == 'nt':
-            si = subprocess.STARTUPINFO()
-            si.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            return {'startupinfo': si, 'creationflags': subprocess.CREATE_NO_WINDOW}
-    except Exception:
-        pass
-    return {}
+from app.services import adb_service, apk_installer, app_meta_cache, foreground_service, multi_device, package_service
 
 
 class _RiskConfirmDialog(MessageBoxBase):
@@ -106,6 +100,182 @@ class _PackageInputDialog(MessageBoxBase):
             return ''
 
 
+class _MultiDeviceDialog(MessageBoxBase):
+    """选择目标设备与操作"""
+
+    def __init__(self, serials: list[str], default_pkg: str, parent=None):
+        super().__init__(parent)
+        self._apk_paths: list[str] = []
+        self.titleLabel = SubtitleLabel("多设备操作", self)
+        self.viewLayout.addWidget(self.titleLabel)
+
+        self.viewLayout.addWidget(BodyLabel("目标设备：", self))
+        self.list_devices = QListWidget(self)
+        for s in serials:
+            it = QListWidgetItem(s)
+            it.setFlags(it.flags() | Qt.ItemIsUserCheckable)
+            it.setCheckState(Qt.Checked)
+            self.list_devices.addItem(it)
+        try:
+            self.list_devices.setMaximumHeight(160)
+        except Exception:
+            pass
+        self.viewLayout.addWidget(self.list_devices)
+
+        row = QHBoxLayout()
+        self.combo_op = ComboBox(self)
+        for op in (multi_device.OP_INSTALL, multi_device.OP_UNINSTALL, multi_device.OP_FREEZE, multi_device.OP_UNFREEZE):
+            self.combo_op.addItem(multi_device.OP_LABELS[op], userData=op)
+        self.combo_parallel = ComboBox(self)
+        for n in (2, 4, 8, 16):
+            self.combo_parallel.addItem(f"同时 {n} 台", userData=n)
+        self.combo_parallel.setCurrentIndex(1)
+        row.addWidget(self.combo_op)
+        row.addWidget(self.combo_parallel)
+        row.addStretch(1)
+        self.viewLayout.addLayout(row)
+
+        self.edit_pkgs = LineEdit(self)
+        try:
+            self.edit_pkgs.setPlaceholderText("包名，多个用空格或逗号分隔")
+            self.edit_pkgs.setText(default_pkg or "")
+        except Exception:
+            pass
+        self.viewLayout.addWidget(self.edit_pkgs)
+
+        row_apk = QHBoxLayout()
+        self.btn_pick = PushButton("选择 APK…", self)
+        self.lbl_apks = BodyLabel("未选择", self)
+        row_apk.addWidget(self.btn_pick)
+        row_apk.addWidget(self.lbl_apks, 1)
+        self.viewLayout.addLayout(row_apk)
+        self.btn_pick.clicked.connect(self._pick_apks)
+        self.combo_op.currentIndexChanged.connect(self._on_op_changed)
+        self._on_op_changed()
+
+        try:
+            self.widget.setMinimumWidth(480)
+            self.yesButton.setText("开始")
+            self.cancelButton.setText("取消")
+        except Exception:
+            pass
+
+    def _pick_apks(self):
+        paths, _ = QFileDialog.getOpenFileNames(self, '选择 APK（可多选）', '', 'APK (*.apk *.apks *.xapk *.apkm)')
+        if paths:
+            self._apk_paths = list(paths)
+            self.lbl_apks.setText(f"已选择 {len(paths)} 个文件")
+
+    def _on_op_changed(self):
+        install = self.op() == multi_device.OP_INSTALL
+        self.btn_pick.setVisible(install)
+        self.lbl_apks.setVisible(install)
+        self.edit_pkgs.setVisible(not install)
+
+    def op(self) -> str:
+        return str(self.combo_op.currentData() or multi_device.OP_INSTALL)
+
+    def parallel(self) -> int:
+        return int(self.combo_parallel.currentData() or multi_device.DEFAULT_PARALLEL)
+
+    def serials(self) -> list[str]:
+        out = []
+        for i in range(self.list_devices.count()):
+            it = self.list_devices.item(i)
+            if it.checkState() == Qt.Checked:
+                out.append(it.text())
+        return out
+
+    def targets(self) -> list[str]:
+        if self.op() == multi_device.OP_INSTALL:
+            return list(self._apk_paths)
+        text = str(self.edit_pkgs.text() or '').replace(',', ' ').replace('，', ' ')
+        return list(dict.fromkeys(p for p in text.split() if p))
+
+
+class _MultiResultDialog(MessageBoxBase):
+    """设备 × 操作对象 的结果矩阵，随结果到达逐格填入"""
+
+    def __init__(self, title: str, serials: list[str], parent=None):
+        super().__init__(parent)
+        self.titleLabel = SubtitleLabel(title, self)
+        self.viewLayout.addWidget(self.titleLabel)
+        self.lbl_status = BodyLabel("执行中…", self)
+        self.viewLayout.addWidget(self.lbl_status)
+        self.table = TableWidget(self)
+        self.table.setRowCount(len(serials))
+        self.table.setColumnCount(0)
+        self.table.setVerticalHeaderLabels(serials)
+        self.table.setEditTriggers(TableWidget.NoEditTriggers)
+        try:
+            self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+            self.table.setMinimumHeight(min(420, 80 + 36 * len(serials)))
+        except Exception:
+            pass
+        self.viewLayout.addWidget(self.table)
+        self._rows = {s: i for i, s in enumerate(serials)}
+        self._cols: dict[str, int] = {}
+        self._ok = self._failed = 0
+        try:
+            self.widget.setMinimumWidth(640)
+            self.yesButton.setText("后台运行")
+            self.cancelButton.setText("停止")
+        except Exception:
+            pass
+
+    def set_cell(self, serial: str, column: str, cell: object):
+        cell = dict(cell or {})
+        if serial not in self._rows:
+            return
+        col = self._cols.get(column)
+        if col is None:
+            col = self._cols[column] = self.table.columnCount()
+            self.table.insertColumn(col)
+            self.table.setHorizontalHeaderItem(col, QTableWidgetItem(column))
+        ok = bool(cell.get('ok'))
+        it = QTableWidgetItem('✓' if ok else '✗')
+        it.setTextAlignment(Qt.AlignCenter)
+        it.setToolTip(str(cell.get('message', '')))
+        self.table.setItem(self._rows[serial], col, it)
+        if ok:
+            self._ok += 1
+        else:
+            self._failed += 1
+        self.lbl_status.setText(f"执行中… 成功 {self._ok}，失败 {self._failed}")
+
+    def set_finished(self, text: str):
+        self.lbl_status.setText(text)
+        try:
+            self.yesButton.setText("关闭")
+            self.cancelButton.setVisible(False)
+        except Exception:
+            pass
+
+
+class _MultiDeviceWorker(QObject):
+    cell = Signal(str, str, object)  # serial, column, {ok, message}
+    finished = Signal(object, str)  # matrix, error
+
+    def __init__(self, serials: list[str], op: str, targets: list[str], parallel: int, replace: bool, downgrade: bool):
+        super().__init__()
+        self._runner = multi_device.MultiDeviceRunner(
+            serials, max_parallel=parallel, replace=replace, downgrade=downgrade, cell_callback=self.cell.emit,
+        )
+        self._op = op
+        self._targets = targets
+
+    def stop(self):
+        self._runner.cancel()
+
+    def run(self):
+        try:
+            self.finished.emit(self._runner.run(self._op, self._targets), '')
+        except InterruptedError:
+            self.finished.emit({}, '已取消')
+        except Exception as e:
+            self.finished.emit({}, str(e))
+
+
 class _AdbCmdWorker(QObject):
     output = Signal(str)
     finished = Signal(int)
@@ -163,80 +333,70 @@ class _AdbCmdWorker(QObject):
             self.finished.emit(code)
 
 
+class _InventoryWorker(QObject):
+    finished = Signal(object, str)  # packages, error
+
+    def __init__(self, serial: str):
+        super().__init__()
+        self._serial = serial
+
+    def run(self):
+        try:
+            self.finished.emit(package_service.collect_inventory(self._serial), '')
+        except Exception as e:
+            self.finished.emit([], str(e))
+
+
+class _BatchInstallWorker(QObject):
+    progress = Signal(object)
+    finished = Signal(object, str)  # results, error
+
+    def __init__(self, serial: str, paths: list[str], replace: bool, downgrade: bool):
+        super().__init__()
+        self._installer = apk_installer.BatchInstaller(
+            serial=serial, replace=replace, downgrade=downgrade, progress=self.progress.emit,
+        )
+        self._paths = paths
+
+    def stop(self):
+        self._installer.cancel()
+
+    def run(self):
+        try:
+            self.finished.emit(self._installer.run(self._paths), '')
+        except InterruptedError:
+            self.finished.emit([], '已取消')
+        except Exception as e:
+            self.finished.emit([], str(e))
+
+
+def _fmt_size(num: int) -> str:
+    if num < 0:
+        return ''
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num < 1024 or unit == 'GB':
+            return f"{num:.0f} {unit}" if unit == 'B' else f"{num:.1f} {unit}"
+        num /= 1024.0
+
+
 class _ForegroundWorker(QObject):
+    """手动刷新：查询一次前台应用"""
     result = Signal(str, str)  # pkg, act
 
     def __init__(self):
         super().__init__()
         self._busy = False
 
-    def fetch(self, adb: str, serial: str):
+    def fetch(self, serial: str):
         if self._busy:
             return
         self._busy = True
         pkg = ''
         act = ''
         try:
-            # 优化：只使用一个命令，减少开销
-            # 使用 dumpsys activity top 代替 activities，输出更少
-            try:
-                r = subprocess.run(
-                    [adb, '-s', serial, 'shell', 'dumpsys', 'activity', 'top'],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.STDOUT,
-                    text=True,
-                    encoding='utf-8',
-                    errors='replace',
-                    timeout=2,  # 从3秒减少到2秒
-                    **_silent_popen_kwargs(),
-                )
-                out = r.stdout or ""
-                # 只读取前100行，避免解析大量数据
-                lines = out.splitlines()[:100]
-                for line in lines:
-                    s = line.strip()
-                    if 'ACTIVITY' in s and '/' in s:
-                        # 提取 ACTIVITY 行中的包名/Activity
-                        for tok in s.split():
-                            if '/' in tok and '.' in tok and tok.count('/') == 1:
-                                act = tok.strip('}').strip()
-                                if not act.startswith('u0'):
-                                    pkg = act.split('/', 1)[0]
-                                    break
-                        if pkg:
-                            break
-            except subprocess.TimeoutExpired:
-                # 超时时不再尝试fallback，直接返回空
-                pass
-            except Exception:
-                pass
-
-            # 如果top命令失败，尝试更轻量的方法
-            if not pkg:
-                try:
-                    # 使用 am stack list 命令，输出更简洁
-                    r = subprocess.run(
-                        [adb, '-s', serial, 'shell', 'am', 'stack', 'list'],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        text=True,
-                        encoding='utf-8',
-                        errors='replace',
-                        timeout=1,
-                        **_silent_popen_kwargs(),
-                    )
-                    out = r.stdout or ""
-                    for line in out.splitlines()[:20]:  # 只读前20行
-                        if 'topActivity' in line or 'TaskRecord' in line:
-                            for tok in line.split():
-                                if '/' in tok and '.' in tok:
-                                    act = tok.strip()
-                                    pkg = act.split('/', 1)[0]
-                                    break
-                            if pkg:
-                                break
-                except Exception:
-                    pass
+            pkg, act = foreground_service.query_focus(serial)
+        except Exception:
+            pass
         finally:
             self._busy = False
             try:
@@ -245,8 +405,30 @@ class _ForegroundWorker(QObject):
                 pass
 
 
+class _ForegroundStreamWorker(QObject):
+    """自动刷新：常驻事件日志会话，前台变化时才发出信号"""
+    changed = Signal(str, str)  # pkg, act
+    finished = Signal()
+
+    def __init__(self, serial: str):
+        super().__init__()
+        self._watcher = foreground_service.FocusWatcher(serial, self.changed.emit)
+
+    def stop(self):
+        self._watcher.cancel()
+
+    def run(self):
+        try:
+            self._watcher.run()
+        except Exception:
+            pass
+        finally:
+            self.finished.emit()
+
+
 class SoftwareManagerTab(QWidget):
-    _fg_request = Signal(str, str)  # adb, serial
+    _fg_request = Signal(str)  # serial
+    _meta_ready = Signal(str, str, bytes)  # pkg, label, icon png
 
     def __init__(self):
         super().__init__()
@@ -255,38 +437,40 @@ class SoftwareManagerTab(QWidget):
         self._pending_op_desc: str | None = None
         self._installing: bool = False
 
-        self._install_queue: list[str] = []
-        self._install_total: int = 0
-        self._install_done: int = 0
+        self._install_thread: QThread | None = None
+        self._install_worker: _BatchInstallWorker | None = None
+        self._install_serial: str = ''
+
+        self._multi_thread: QThread | None = None
+        self._multi_worker: _MultiDeviceWorker | None = None
+        self._multi_dialog: _MultiResultDialog | None = None
+        self._multi_op: str = ''
 
         self._fg_thread: QThread | None = None
         self._fg_worker: _ForegroundWorker | None = None
+        self._fg_stream_thread: QThread | None = None
+        self._fg_stream_worker: _ForegroundStreamWorker | None = None
 
         self._apps_thread: QThread | None = None
-        self._apps_worker: _AdbCmdWorker | None = None
-        self._apps_out: list[str] = []
+        self._apps_worker: _InventoryWorker | None = None
+        self._apps_inventory: list[dict] = []
+        self._apps_serial: str = ''
 
         self._disabled_thread: QThread | None = None
         self._disabled_worker: _AdbCmdWorker | None = None
         self._disabled_out: list[str] = []
 
-        self._label_thread: QThread | None = None
-        self._label_worker: _AdbCmdWorker | None = None
-        self._label_out: list[str] = []
-        self._label_pkg: str = ''
-        self._label_cache: dict[str, str] = {}
+        self._app_icons: dict[str, QIcon] = {}
 
         self._selected_apk: str = ""
         self._selected_pkg: str = ""
         self._current_pkg: str = ""
         self._current_activity: str = ""
-        self._timer: QTimer | None = None
         self._auto_refresh_enabled: bool = False  # 默认关闭自动刷新
 
         self._build_ui()
+        self._meta_ready.connect(self._on_app_meta_ready, Qt.QueuedConnection)
         self._start_foreground_worker()
-        # 不再自动启动定时器，由用户手动控制
-        # self._start_foreground_timer()
 
         try:
             app = QApplication.instance()
@@ -410,7 +594,7 @@ class SoftwareManagerTab(QWidget):
 
         self.edt_app_search = LineEdit(card_apps)
         try:
-            self.edt_app_search.setPlaceholderText("搜索包名…")
+            self.edt_app_search.setPlaceholderText("搜索应用名 / 包名…")
         except Exception:
             pass
         try:
@@ -429,6 +613,7 @@ class SoftwareManagerTab(QWidget):
             self.list_apps = QListWidget(card_apps)
         try:
             self.list_apps.setMinimumWidth(420)
+            self.list_apps.setIconSize(QSize(32, 32))
             self.list_apps.setStyleSheet(
                 "QListWidget{background:transparent;border:none;}"
                 "QListWidget::item{padding:8px 10px;margin:2px 0;border-radius:8px;}"
@@ -464,7 +649,7 @@ class SoftwareManagerTab(QWidget):
         h_state.addStretch(1)
         # 添加自动刷新开关
         self.chk_auto_refresh = CheckBox("自动刷新", card_state)
-        self.chk_auto_refresh.setToolTip("开启后每3秒自动获取前台应用信息")
+        self.chk_auto_refresh.setToolTip("开启后实时跟踪前台应用切换")
         h_state.addWidget(self.chk_auto_refresh)
         
         self.btn_refresh_state = PushButton("立即刷新", card_state)
@@ -508,7 +693,7 @@ class SoftwareManagerTab(QWidget):
         except Exception:
             pass
         h_apk.addWidget(icon_apk)
-        h_apk.addWidget(QLabel("安装 APK（支持多选）"))
+        h_apk.addWidget(QLabel("安装 APK（支持多选，及 .apks / .xapk 拆分包）"))
         h_apk.addStretch(1)
         v_apk.addLayout(h_apk)
 
@@ -520,9 +705,15 @@ class SoftwareManagerTab(QWidget):
             self.btn_install.setIcon(FluentIcon.FOLDER)
         except Exception:
             pass
+        self.btn_multi_device = PushButton("多设备操作", card_apk)
+        try:
+            self.btn_multi_device.setIcon(FluentIcon.PHONE)
+        except Exception:
+            pass
         row_install.addWidget(self.cb_reinstall)
         row_install.addWidget(self.cb_downgrade)
         row_install.addStretch(1)
+        row_install.addWidget(self.btn_multi_device)
         row_install.addWidget(self.btn_install)
         v_apk.addLayout(row_install)
 
@@ -701,9 +892,10 @@ class SoftwareManagerTab(QWidget):
         self.btn_clear_selected.clicked.connect(self._clear_selected_pkg)
         self.btn_refresh_apps.clicked.connect(self._refresh_apps)
         self.edt_app_search.textChanged.connect(self._apply_app_filter)
-        self.cb_show_system_apps.stateChanged.connect(self._refresh_apps)
+        self.cb_show_system_apps.stateChanged.connect(self._on_show_system_changed)
         self.list_apps.itemSelectionChanged.connect(self._on_app_selected)
         self.btn_install.clicked.connect(self._install_apk)
+        self.btn_multi_device.clicked.connect(self._open_multi_device)
         self.btn_freeze.clicked.connect(self._freeze_app)
         self.btn_unfreeze.clicked.connect(self._unfreeze_app)
         self.btn_uninstall.clicked.connect(self._uninstall_app)
@@ -789,20 +981,6 @@ class SoftwareManagerTab(QWidget):
                 pass
         return ok
 
-    def _pause_foreground_timer(self):
-        try:
-            if self._timer is not None and self._timer.isActive():
-                self._timer.stop()
-        except Exception:
-            pass
-
-    def _resume_foreground_timer(self):
-        try:
-            if self._timer is not None and not self._timer.isActive():
-                self._timer.start()
-        except Exception:
-            pass
-
     def _get_default_serial(self) -> str:
         serials: list[str] = []
         try:
@@ -845,7 +1023,6 @@ class SoftwareManagerTab(QWidget):
         adb = self._resolve_adb()
         cmd = [adb, '-s', serial] + args
 
-        self._pause_foreground_timer()
         self._pending_op_desc = op_desc
 
         self._thread = QThread(self)
@@ -903,24 +1080,14 @@ class SoftwareManagerTab(QWidget):
         self._thread = None
         self._pending_op_desc = None
 
-        try:
-            if self._installing and self._install_queue:
-                self._install_next_in_queue()
-                return
-        except Exception:
-            pass
-
-        try:
-            if self._installing:
-                self._set_installing(False)
-        except Exception:
-            pass
-
-        self._resume_foreground_timer()
-
     # -------- actions --------
     def _install_apk(self):
-        paths, _ = QFileDialog.getOpenFileNames(self, '选择 APK（可多选）', '', 'APK (*.apk);;所有文件 (*.*)')
+        if self._install_thread and self._install_thread.isRunning():
+            self._toast('info', '提示', '正在安装…')
+            return
+        paths, _ = QFileDialog.getOpenFileNames(
+            self, '选择 APK（可多选）', '', 'APK (*.apk *.apks *.xapk *.apkm);;所有文件 (*.*)'
+        )
         if not paths:
             return
 
@@ -948,98 +1115,162 @@ class SoftwareManagerTab(QWidget):
                 self._toast('warn', '提示', f'检测到多个设备({len(serials)})，请仅保留一个设备后再操作')
             return
 
-        self._install_queue = list(ok_paths)
-        self._install_total = len(self._install_queue)
-        self._install_done = 0
+        downgrade = False
+        replace = False
+        try:
+            downgrade = bool(self.cb_downgrade.isChecked())
+            replace = downgrade or bool(self.cb_reinstall.isChecked())
+        except Exception:
+            pass
 
+        self._install_serial = serial
         self._set_installing(True)
-        self._install_next_in_queue()
+        try:
+            self.install_progress.setRange(0, 0)
+            self.install_progress.setFormat(f"正在准备… ({len(ok_paths)} 个文件)")
+        except Exception:
+            pass
+        self._install_thread = QThread(self)
+        self._install_worker = _BatchInstallWorker(serial, ok_paths, replace, downgrade)
+        self._install_worker.moveToThread(self._install_thread)
+        self._install_thread.started.connect(self._install_worker.run)
+        self._install_worker.progress.connect(self._on_install_progress)
+        self._install_worker.finished.connect(self._on_install_finished)
+        self._install_worker.finished.connect(self._install_thread.quit)
+        self._install_worker.finished.connect(self._install_worker.deleteLater)
+        self._install_thread.finished.connect(self._install_thread.deleteLater)
+        self._install_thread.finished.connect(self._cleanup_install_thread)
+        self._install_thread.start()
+
+    def _on_install_progress(self, info: object):
+        try:
+            info = dict(info or {})
+            total = int(info.get('install_total') or 0)
+            done = int(info.get('installed') or 0)
+            if total:
+                self.install_progress.setRange(0, total)
+                self.install_progress.setValue(done)
+            self.install_progress.setFormat(
+                f"推送 {info.get('files', 0)}/{info.get('total_files', 0)} · 安装 {done}/{total}"
+            )
+        except Exception:
+            pass
 
-    def _install_next_in_queue(self):
-        if not self._install_queue:
-            return
-        if self._thread and self._thread.isRunning():
+    def _on_install_finished(self, results: object, err: str):
+        self._set_installing(False)
+        if err:
+            self._toast('warn', '安装失败', err[:200])
             return
+        results = list(results or [])
+        failed = [r for r in results if not r.get('ok')]
+        for r in results:
+            try:
+                op = f"install {r.get('name', '')} {'ok' if r.get('ok') else 'failed: ' + str(r.get('message', ''))}"
+                self._write_oplog(self._install_serial, r.get('package') or '-', op)
+            except Exception:
+                pass
+        if failed:
+            detail = '\n'.join(f"{r.get('name', '')}：{r.get('message', '')}" for r in failed[:8])
+            if len(failed) > 8:
+                detail += f"\n… 另有 {len(failed) - 8} 项"
+            self._toast('warn', f'安装完成：成功 {len(results) - len(failed)}，失败 {len(failed)}', detail, ms=8000)
+        else:
+            self._toast('ok', '安装完成', f'已安装 {len(results)} 个应用')
+        if len(failed) < len(results):
+            self._refresh_apps()
+
+    def _cleanup_install_thread(self):
+        self._install_worker = None
+        self._install_thread = None
 
-        path = ''
+    def _open_multi_device(self):
+        if self._multi_thread and self._multi_thread.isRunning():
+            self._toast('info', '提示', '多设备任务正在运行中…')
+            return
         try:
-            path = str(self._install_queue.pop(0) or '').strip()
+            serials = adb_service.list_devices()
         except Exception:
-            path = ''
-        if not path:
-            self._install_next_in_queue()
+            serials = []
+        if not serials:
+            self._toast('warn', '提示', '未检测到设备')
+            return
+        dlg = _MultiDeviceDialog(serials, self._pkg(), self)
+        if not dlg.exec():
+            return
+        serials, op, targets = dlg.serials(), dlg.op(), dlg.targets()
+        if not serials:
+            self._toast('warn', '提示', '请至少选择一台设备')
+            return
+        if not targets:
+            self._toast('warn', '提示', '请选择 APK' if op == multi_device.OP_INSTALL else '请输入包名')
+            return
+        if op == multi_device.OP_UNINSTALL and not self._confirm_risky(
+            'software_manager/risk/uninstall', '确认卸载应用',
+            f'将在 {len(serials)} 台设备上卸载 {len(targets)} 个应用。\n如应用包含重要数据，请先备份。\n\n是否继续？',
+        ):
+            return
+        if op == multi_device.OP_FREEZE and not self._confirm_risky(
+            'software_manager/risk/freeze', '确认冻结应用',
+            f'将在 {len(serials)} 台设备上冻结 {len(targets)} 个应用。\n不同系统行为可能不同，部分设备需要更高权限。\n\n是否继续？',
+        ):
             return
 
+        downgrade = False
+        replace = False
         try:
-            if not Path(path).exists():
-                self._install_next_in_queue()
-                return
+            downgrade = bool(self.cb_downgrade.isChecked())
+            replace = downgrade or bool(self.cb_reinstall.isChecked())
         except Exception:
             pass
 
-        try:
-            self._selected_apk = path
-        except Exception:
-            pass
+        self._multi_op = op
+        self._multi_thread = QThread(self)
+        self._multi_worker = _MultiDeviceWorker(serials, op, targets, dlg.parallel(), replace, downgrade)
+        self._multi_worker.moveToThread(self._multi_thread)
+        self._multi_thread.started.connect(self._multi_worker.run)
+        self._multi_worker.cell.connect(self._on_multi_cell)
+        self._multi_worker.finished.connect(self._on_multi_finished)
+        self._multi_worker.finished.connect(self._multi_thread.quit)
+        self._multi_worker.finished.connect(self._multi_worker.deleteLater)
+        self._multi_thread.finished.connect(self._multi_thread.deleteLater)
+        self._multi_thread.finished.connect(self._cleanup_multi_thread)
+        self._multi_thread.start()
 
-        self._install_done += 1
+        title = f"{multi_device.OP_LABELS[op]}：{len(serials)} 台设备"
+        self._multi_dialog = _MultiResultDialog(title, serials, self)
+        stopped = not self._multi_dialog.exec()
+        self._multi_dialog = None
+        if stopped and self._multi_worker is not None:
+            self._multi_worker.stop()
+
+    def _on_multi_cell(self, serial: str, column: str, cell: object):
         try:
-            if hasattr(self, 'install_progress') and self.install_progress is not None:
-                self.install_progress.setFormat(f"正在安装… ({self._install_done}/{self._install_total})")
+            if self._multi_dialog is not None:
+                self._multi_dialog.set_cell(serial, column, cell)
         except Exception:
             pass
 
-        serial = self._get_default_serial()
-        if not serial:
-            try:
-                serials = adb_service.list_devices()
-            except Exception:
-                serials = []
-            if not serials:
-                self._toast('warn', '提示', '未检测到设备')
-            else:
-                self._toast('warn', '提示', f'检测到多个设备({len(serials)})，请仅保留一个设备后再操作')
-            try:
-                self._install_queue = []
-            except Exception:
-                pass
-            return
-
-        try:
-            flags = ''
+    def _on_multi_finished(self, matrix: object, err: str):
+        matrix = dict(matrix or {})
+        ok = failed = 0
+        for serial, cells in matrix.items():
+            for column, cell in (cells or {}).items():
+                good = bool((cell or {}).get('ok'))
+                ok += good
+                failed += not good
+                self._write_oplog(serial, column, f"multi-{self._multi_op} {'ok' if good else 'failed'}")
+        text = err or f"完成：成功 {ok}，失败 {failed}"
+        if self._multi_dialog is not None:
             try:
-                force_r = False
-                if hasattr(self, 'cb_downgrade') and self.cb_downgrade.isChecked():
-                    force_r = True
-                if force_r or self.cb_reinstall.isChecked():
-                    flags += ' -r'
+                self._multi_dialog.set_finished(text)
             except Exception:
                 pass
-            try:
-                if hasattr(self, 'cb_downgrade') and self.cb_downgrade.isChecked():
-                    flags += ' -d'
-            except Exception:
-                pass
-            self._write_oplog(serial, '-', f"install{flags} {Path(path).name}".strip())
-        except Exception:
-            pass
+        else:
+            self._toast('warn' if (err or failed) else 'ok', '多设备操作', text, ms=5000)
 
-        args = ['install']
-        try:
-            force_r = False
-            if hasattr(self, 'cb_downgrade') and self.cb_downgrade.isChecked():
-                force_r = True
-            if force_r or self.cb_reinstall.isChecked():
-                args.append('-r')
-        except Exception:
-            pass
-        try:
-            if hasattr(self, 'cb_downgrade') and self.cb_downgrade.isChecked():
-                args.append('-d')
-        except Exception:
-            pass
-        args.append(path)
-        self._run_adb_cmd(args, op_desc=f"安装APK ({self._install_done}/{self._install_total})")
+    def _cleanup_multi_thread(self):
+        self._multi_worker = None
+        self._multi_thread = None
 
     def _pkg(self) -> str:
         s = (self._selected_pkg or '').strip()
@@ -1077,13 +1308,6 @@ class SoftwareManagerTab(QWidget):
         except Exception:
             pass
 
-        # Lazy load label
-        try:
-            if pkg and pkg not in self._label_cache:
-                self._fetch_label_for_pkg(pkg)
-        except Exception:
-            pass
-
     def _clear_selected_pkg(self):
         self._selected_pkg = ''
         try:
@@ -1143,55 +1367,80 @@ class SoftwareManagerTab(QWidget):
                 self._toast('warn', '提示', f'检测到多个设备({len(serials)})，请仅保留一个设备后再操作')
             return
 
-        adb = self._resolve_adb()
-        show_system = False
-        try:
-            show_system = bool(self.cb_show_system_apps.isChecked())
-        except Exception:
-            show_system = False
+        if serial != self._apps_serial or not self._apps_inventory:
+            # 先显示该设备上次的清单，后台刷新完成后再替换
+            if serial != self._apps_serial:
+                app_meta_cache.cancel_pending()
+                self._app_icons = {}
+            self._apps_serial = serial
+            self._apps_inventory = sorted(package_service.load_cached(serial).values(), key=lambda x: x['package'])
+            self._populate_app_list()
 
-        args = ['shell', 'pm', 'list', 'packages']
-        if not show_system:
-            args.append('-3')
-        cmd = [adb, '-s', serial] + args
-
-        self._apps_out = []
         self._apps_thread = QThread(self)
-        self._apps_worker = _AdbCmdWorker(cmd)
+        self._apps_worker = _InventoryWorker(serial)
         self._apps_worker.moveToThread(self._apps_thread)
         self._apps_thread.started.connect(self._apps_worker.run)
-        self._apps_worker.output.connect(self._on_apps_output)
+        self._apps_worker.finished.connect(self._on_apps_finished)
         self._apps_worker.finished.connect(self._apps_thread.quit)
         self._apps_worker.finished.connect(self._apps_worker.deleteLater)
         self._apps_thread.finished.connect(self._apps_thread.deleteLater)
         self._apps_thread.finished.connect(self._on_apps_thread_finished)
         self._apps_thread.start()
 
-    def _on_apps_output(self, line: str):
-        try:
-            self._apps_out.append(line)
-        except Exception:
-            pass
+    def _on_apps_finished(self, packages: object, err: str):
+        if err:
+            self._toast('warn', '刷新应用列表失败', err[:200])
+            return
+        self._apps_inventory = list(packages or [])
+        self._populate_app_list()
 
     def _on_apps_thread_finished(self):
-        try:
-            out = '\n'.join(self._apps_out)
-            pkgs: list[str] = []
-            for line in out.splitlines():
-                s = (line or '').strip()
-                if s.startswith('package:'):
-                    pkgs.append(s.split(':', 1)[1].strip())
-            pkgs = sorted(set([p for p in pkgs if p]))
+        self._apps_worker = None
+        self._apps_thread = None
 
+    def _on_show_system_changed(self):
+        if self._apps_inventory:
+            self._populate_app_list()
+        else:
+            self._refresh_apps()
+
+    def _app_item_text(self, info: dict) -> tuple[str, str]:
+        pkg = info.get('package', '')
+        label = info.get('label') or ''
+        meta = [pkg] if label else []
+        if info.get('version_name') or info.get('version_code'):
+            meta.append('v' + str(info.get('version_name') or info.get('version_code')))
+        if _fmt_size(int(info.get('size', -1))):
+            meta.append(_fmt_size(int(info.get('size', -1))))
+        if not info.get('enabled', True):
+            meta.append('已冻结')
+        text = (label or pkg) + ('\n' + ' · '.join(meta) if meta else '')
+        tips = [f'包名：{pkg}']
+        for key, name in (('apk', 'APK'), ('installer', '安装来源'), ('first_install', '安装时间'), ('last_update', '更新时间')):
+            if info.get(key):
+                tips.append(f'{name}：{info[key]}')
+        return text, '\n'.join(tips)
+
+    def _populate_app_list(self):
+        show_system = False
+        try:
+            show_system = bool(self.cb_show_system_apps.isChecked())
+        except Exception:
+            show_system = False
+        visible = [x for x in self._apps_inventory if show_system or not x.get('system')]
+        missing = self._apply_app_meta(visible)
+        try:
             cur = self._selected_pkg
             self.list_apps.clear()
-            for p in pkgs:
-                label = self._label_cache.get(p, '')
-                text = f"{label}\n{p}" if label else p
+            for info in visible:
+                text, tip = self._app_item_text(info)
                 it = QListWidgetItem(text)
                 try:
-                    it.setData(Qt.UserRole, p)
-                    it.setToolTip(p)
+                    it.setData(Qt.UserRole, info.get('package', ''))
+                    it.setToolTip(tip)
+                    icon = self._app_icons.get(info.get('package', ''))
+                    if icon is not None:
+                        it.setIcon(icon)
                 except Exception:
                     pass
                 self.list_apps.addItem(it)
@@ -1204,79 +1453,56 @@ class SoftwareManagerTab(QWidget):
                             break
                     except Exception:
                         pass
-                    if self.list_apps.item(i).text() == cur:
-                        self.list_apps.setCurrentRow(i)
-                        break
         except Exception:
             pass
-        self._apps_worker = None
-        self._apps_thread = None
-        self._apps_out = []
+        if missing:
+            # 未缓存的名称与图标在后台解析，逐个回填
+            app_meta_cache.request(
+                self._apps_serial, missing,
+                lambda pkg, label, icon: self._meta_ready.emit(pkg, label, icon or b''),
+            )
 
-    def _fetch_label_for_pkg(self, pkg: str):
-        if not pkg:
+    def _apply_app_meta(self, infos: list[dict]) -> list[dict]:
+        """从持久缓存填入名称与图标，返回尚未缓存的条目"""
+        try:
+            cached = app_meta_cache.lookup(infos)
+        except Exception:
+            return []
+        missing = []
+        for info in infos:
+            pkg = info.get('package', '')
+            hit = cached.get(pkg)
+            if hit is None:
+                missing.append(info)
+                continue
+            info['label'] = hit[0]
+            if hit[1] and pkg not in self._app_icons:
+                self._set_app_icon(pkg, hit[1])
+        return missing
+
+    def _set_app_icon(self, pkg: str, data: bytes):
+        pix = QPixmap()
+        if pix.loadFromData(data):
+            self._app_icons[pkg] = QIcon(pix)
+
+    def _on_app_meta_ready(self, pkg: str, label: str, icon: bytes):
+        info = next((x for x in self._apps_inventory if x.get('package') == pkg), None)
+        if info is None:
             return
-        if self._label_thread and self._label_thread.isRunning():
-            return
-        serial = self._get_default_serial()
-        if not serial:
-            return
-        adb = self._resolve_adb()
-        cmd = [adb, '-s', serial, 'shell', 'dumpsys', 'package', pkg]
-        self._label_pkg = pkg
-        self._label_out = []
-        self._label_thread = QThread(self)
-        self._label_worker = _AdbCmdWorker(cmd)
-        self._label_worker.moveToThread(self._label_thread)
-        self._label_thread.started.connect(self._label_worker.run)
-        self._label_worker.output.connect(self._on_label_output)
-        self._label_worker.finished.connect(self._label_thread.quit)
-        self._label_worker.finished.connect(self._label_worker.deleteLater)
-        self._label_thread.finished.connect(self._label_thread.deleteLater)
-        self._label_thread.finished.connect(self._on_label_thread_finished)
-        self._label_thread.start()
-
-    def _on_label_output(self, line: str):
-        try:
-            self._label_out.append(line)
-        except Exception:
-            pass
-
-    def _on_label_thread_finished(self):
-        pkg = self._label_pkg
-        try:
-            text = '\n'.join(self._label_out)
-            label = ''
-            for raw in text.splitlines():
-                s = (raw or '').strip()
-                # common formats:
-                # application-label:'Chrome'
-                # application-label:Chrome
-                if s.startswith('application-label:'):
-                    label = s.split(':', 1)[1].strip().strip("'")
-                    break
-                if s.startswith('application-label='):
-                    label = s.split('=', 1)[1].strip().strip("'")
+        info['label'] = label
+        if icon:
+            self._set_app_icon(pkg, icon)
+        for i in range(self.list_apps.count()):
+            it = self.list_apps.item(i)
+            try:
+                if str(it.data(Qt.UserRole) or '') == pkg:
+                    it.setText(self._app_item_text(info)[0])
+                    if pkg in self._app_icons:
+                        it.setIcon(self._app_icons[pkg])
                     break
-            if pkg and label:
-                self._label_cache[pkg] = label
-
-            # update visible item if present
-            if pkg and label:
-                for i in range(self.list_apps.count()):
-                    it = self.list_apps.item(i)
-                    try:
-                        if str(it.data(Qt.UserRole) or '') == pkg:
-                            it.setText(f"{label}\n{pkg}")
-                            break
-                    except Exception:
-                        continue
-        except Exception:
-            pass
-        self._label_worker = None
-        self._label_thread = None
-        self._label_out = []
-        self._label_pkg = ''
+            except Exception:
+                continue
+        self._apply_app_filter()
 
     def _open_app_permissions(self):
         pkg = self._pkg()
@@ -1601,7 +1827,6 @@ class SoftwareManagerTab(QWidget):
             self._toast('info', '提示', '任务正在运行中，请稍后…')
             return
 
-        self._pause_foreground_timer()
         self._pending_op_desc = op_desc
         self._thread = QThread(self)
         self._worker = _AdbCmdWorker(cmd)
@@ -1618,21 +1843,14 @@ class SoftwareManagerTab(QWidget):
     def _toggle_auto_refresh(self, state):
         """切换自动刷新状态"""
         self._auto_refresh_enabled = (state == Qt.CheckState.Checked.value or state == 2)
-        
+
         if self._auto_refresh_enabled:
-            # 开启自动刷新
-            if self._timer is None:
-                self._timer = QTimer(self)
-                self._timer.setInterval(3000)
-                self._timer.timeout.connect(self._refresh_foreground_now)
-            if not self._timer.isActive():
-                self._timer.start()
-                # 立即执行一次
-                QTimer.singleShot(100, self._refresh_foreground_now)
+            # 开启自动刷新：常驻事件日志会话，前台切换时立即更新
+            self._start_foreground_stream()
             try:
                 InfoBar.success(
                     "自动刷新",
-                    "已开启自动刷新，每3秒更新一次",
+                    "已开启自动刷新，前台应用切换时立即更新",
                     parent=self,
                     position=InfoBarPosition.TOP,
                     duration=2000
@@ -1641,8 +1859,7 @@ class SoftwareManagerTab(QWidget):
                 pass
         else:
             # 关闭自动刷新
-            if self._timer is not None and self._timer.isActive():
-                self._timer.stop()
+            self._stop_foreground_stream()
             try:
                 InfoBar.info(
                     "自动刷新",
@@ -1653,15 +1870,41 @@ class SoftwareManagerTab(QWidget):
                 )
             except Exception:
                 pass
-    
-    def _start_foreground_timer(self):
-        """仅在用户开启自动刷新时调用"""
-        if self._timer is None:
-            self._timer = QTimer(self)
-            self._timer.setInterval(3000)
-            self._timer.timeout.connect(self._refresh_foreground_now)
-        if not self._timer.isActive():
-            self._timer.start()
+
+    def _start_foreground_stream(self):
+        if self._fg_stream_thread is not None or not self._auto_refresh_enabled:
+            return
+        serial = self._get_default_serial()
+        if not serial:
+            # 没有唯一设备时先显示状态，稍后重试
+            self._refresh_foreground_now()
+            QTimer.singleShot(3000, self._start_foreground_stream)
+            return
+        self.lbl_dev.setText(f"设备：{serial}")
+        self._fg_stream_thread = QThread(self)
+        self._fg_stream_worker = _ForegroundStreamWorker(serial)
+        self._fg_stream_worker.moveToThread(self._fg_stream_thread)
+        self._fg_stream_thread.started.connect(self._fg_stream_worker.run)
+        self._fg_stream_worker.changed.connect(self._on_foreground_result)
+        self._fg_stream_worker.finished.connect(self._fg_stream_thread.quit)
+        self._fg_stream_worker.finished.connect(self._fg_stream_worker.deleteLater)
+        self._fg_stream_thread.finished.connect(self._fg_stream_thread.deleteLater)
+        self._fg_stream_thread.finished.connect(self._cleanup_fg_stream_thread)
+        self._fg_stream_thread.start()
+
+    def _stop_foreground_stream(self):
+        try:
+            if self._fg_stream_worker:
+                self._fg_stream_worker.stop()
+        except Exception:
+            pass
+
+    def _cleanup_fg_stream_thread(self):
+        self._fg_stream_worker = None
+        self._fg_stream_thread = None
+        # 设备断开或更换后，自动刷新仍开启则重新连接
+        if self._auto_refresh_enabled:
+            QTimer.singleShot(3000, self._start_foreground_stream)
 
     def _start_foreground_worker(self):
         if self._fg_thread is not None:
@@ -1700,22 +1943,19 @@ class SoftwareManagerTab(QWidget):
 
         if self._fg_worker is None:
             return
-        adb = self._resolve_adb()
-        self._fg_request.emit(adb, serial)
+        self._fg_request.emit(serial)
 
     def cleanup(self):
-        # 优化清理顺序，先停止定时器，再清理线程
+        # 先停止前台跟踪会话，再清理线程
+        self._auto_refresh_enabled = False
+        self._stop_foreground_stream()
         try:
-            if self._timer is not None:
-                try:
-                    self._timer.stop()
-                    self._timer.deleteLater()
-                    self._timer = None
-                except Exception:
-                    pass
+            if self._fg_stream_thread and self._fg_stream_thread.isRunning():
+                self._fg_stream_thread.quit()
+                self._fg_stream_thread.wait(3000)
         except Exception:
             pass
-        
+
         # 清理前台刷新线程
         try:
             if self._fg_thread and self._fg_thread.isRunning():
@@ -1742,10 +1982,28 @@ class SoftwareManagerTab(QWidget):
             pass
 
         try:
-            if self._apps_worker:
-                self._apps_worker.stop()
+            if self._install_worker:
+                self._install_worker.stop()
         except Exception:
             pass
+        try:
+            if self._multi_worker:
+                self._multi_worker.stop()
+        except Exception:
+            pass
+        try:
+            if self._multi_thread and self._multi_thread.isRunning():
+                self._multi_thread.quit()
+                self._multi_thread.wait(3000)
+        except Exception:
+            pass
+        try:
+            if self._install_thread and self._install_thread.isRunning():
+                self._install_thread.quit()
+                self._install_thread.wait(3000)
+        except Exception:
+            pass
+
         try:
             if self._apps_thread and self._apps_thread.isRunning():
                 self._apps_thread.quit()
@@ -1765,18 +2023,6 @@ class SoftwareManagerTab(QWidget):
         except Exception:
             pass
 
-        try:
-            if self._label_worker:
-                self._label_worker.stop()
-        except Exception:
-            pass
-        try:
-            if self._label_thread and self._label_thread.isRunning():
-                self._label_thread.quit()
-                self._label_thread.wait(1500)
-        except Exception:
-            pass
-
         try:
             if self._fg_thread and self._fg_thread.isRunning():
                 self._fg_thread.quit()